@@ -0,0 +1,172 @@
+"""
+Per-tenant admission control for expensive endpoints.
+
+Every admitted request is checked against a token-bucket rate limit and a
+concurrency cap, first for the user and then for their organization. Users
+without an organization are their own tenant. A request that would exceed
+either limit is rejected with 429 and a Retry-After header. Nothing queues
+at this level, so one tenant's burst cannot pile up work for everyone.
+
+Limits come from the environment as "<count>/<seconds>" rates and plain
+concurrency numbers; 0 disables a limit:
+
+    LEXIBOX_UPLOAD_USER_RATE   (default 60/60)   LEXIBOX_UPLOAD_ORG_RATE   (default 300/60)
+    LEXIBOX_UPLOAD_USER_CONCURRENCY (default 4)  LEXIBOX_UPLOAD_ORG_CONCURRENCY (default 8)
+    LEXIBOX_SEARCH_USER_RATE   (default 120/60)  LEXIBOX_SEARCH_ORG_RATE   (default 600/60)
+    LEXIBOX_SEARCH_USER_CONCURRENCY (default 8)  LEXIBOX_SEARCH_ORG_CONCURRENCY (default 32)
+
+State is kept in memory, so with several worker processes each one enforces
+the limits separately.
+"""
+
+import math
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+from fastapi import Depends, HTTPException, status
+
+from .auth import get_current_user
+from .log import get_logger
+from .metrics import admission_rejections_total
+from .models import User
+
+logger = get_logger("admission")
+
+
+def tenant_key(user: User) -> str:
+    return f"org:{user.organization_id}" if user.organization_id else f"user:{user.id}"
+
+
+def _parse_rate(value: str) -> Tuple[float, float]:
+    """"30/60" -> (30 requests, per 60 seconds)"""
+    count, _, seconds = value.partition("/")
+    return float(count), float(seconds or 1)
+
+
+class TokenBucket:
+    __slots__ = ("capacity", "refill", "tokens", "updated")
+
+    def __init__(self, count: float, seconds: float):
+        self.capacity = count
+        self.refill = count / seconds
+        self.tokens = count
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token; returns 0 on success, else seconds until one is available"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.refill
+
+    def give_back(self) -> None:
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+class Policy:
+    def __init__(self, operation: str, user_rate: str, org_rate: str, user_concurrency: int, org_concurrency: int):
+        prefix = f"LEXIBOX_{operation.upper()}"
+        self.operation = operation
+        self.rates = {
+            "user": _parse_rate(os.getenv(f"{prefix}_USER_RATE", user_rate)),
+            "org": _parse_rate(os.getenv(f"{prefix}_ORG_RATE", org_rate)),
+        }
+        self.concurrency = {
+            "user": int(os.getenv(f"{prefix}_USER_CONCURRENCY", user_concurrency)),
+            "org": int(os.getenv(f"{prefix}_ORG_CONCURRENCY", org_concurrency)),
+        }
+
+
+class AdmissionController:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._in_flight: Dict[Tuple[str, str], int] = defaultdict(int)
+
+    def _keys(self, user: User):
+        yield "user", f"user:{user.id}"
+        if user.organization_id:
+            yield "org", f"org:{user.organization_id}"
+
+    def acquire(self, policy: Policy, user: User) -> Optional[Tuple[str, str, float]]:
+        """Admit the request, or return (scope, reason, retry_after) for the limit that refused it"""
+        with self._lock:
+            taken = []
+            for scope, key in self._keys(user):
+                count, seconds = policy.rates[scope]
+                if count > 0:
+                    bucket = self._buckets.get((policy.operation, key))
+                    if bucket is None:
+                        bucket = self._buckets[(policy.operation, key)] = TokenBucket(count, seconds)
+                    wait = bucket.take()
+                    if wait:
+                        for earlier in taken:
+                            earlier.give_back()
+                        return scope, "rate", wait
+                    taken.append(bucket)
+                limit = policy.concurrency[scope]
+                if limit > 0 and self._in_flight[(policy.operation, key)] >= limit:
+                    for earlier in taken:
+                        earlier.give_back()
+                    return scope, "concurrency", 1.0
+            for scope, key in self._keys(user):
+                self._in_flight[(policy.operation, key)] += 1
+            return None
+
+    def retain(self, policy: Policy, user: User) -> None:
+        """Hold another slot for work an admitted request hands off to the background; release() it when done"""
+        with self._lock:
+            for _scope, key in self._keys(user):
+                self._in_flight[(policy.operation, key)] += 1
+
+    def release(self, policy: Policy, user: User) -> None:
+        with self._lock:
+            for _scope, key in self._keys(user):
+                self._in_flight[(policy.operation, key)] -= 1
+                if not self._in_flight[(policy.operation, key)]:
+                    del self._in_flight[(policy.operation, key)]
+
+    def in_flight(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            result: Dict[str, Dict[str, int]] = defaultdict(dict)
+            for (operation, key), count in self._in_flight.items():
+                result[operation][key] = count
+            return dict(result)
+
+
+controller = AdmissionController()
+
+UPLOAD = Policy("upload", user_rate="60/60", org_rate="300/60", user_concurrency=4, org_concurrency=8)
+SEARCH = Policy("search", user_rate="120/60", org_rate="600/60", user_concurrency=8, org_concurrency=32)
+
+
+def admit(policy: Policy):
+    """Dependency enforcing `policy` for the current user; yields the user"""
+
+    async def dependency(current_user: User = Depends(get_current_user)):
+        refused = controller.acquire(policy, current_user)
+        if refused:
+            scope, reason, retry_after = refused
+            admission_rejections_total.inc(operation=policy.operation, scope=scope, reason=reason)
+            logger.info("request throttled", extra={"operation": policy.operation, "user_id": current_user.id,
+                                                    "scope": scope, "reason": reason})
+            limit = "rate limit" if reason == "rate" else "concurrent request limit"
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"{policy.operation.capitalize()} {limit} reached for this {'organization' if scope == 'org' else 'user'}",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+        # Released after the route returns, when it may have closed the session the user was loaded in
+        holder = User(id=current_user.id, organization_id=current_user.organization_id)
+        try:
+            yield current_user
+        finally:
+            controller.release(policy, holder)
+
+    return dependency
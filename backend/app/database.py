@@ -2,15 +2,20 @@ from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
+from .metrics import instrument_engine
 
 # Create uploads directory if it doesn't exist
 os.makedirs("uploads", exist_ok=True)
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./lexibox.db"
+SQLALCHEMY_DATABASE_URL = os.getenv("LEXIBOX_DATABASE_URL", "sqlite:///./lexibox.db")
+
+# Several worker processes share the file: wait for a lock instead of failing fast
+SQLITE_BUSY_TIMEOUT = float(os.getenv("LEXIBOX_SQLITE_BUSY_TIMEOUT", "30"))
 
 engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
+    SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False, "timeout": SQLITE_BUSY_TIMEOUT}
 )
+instrument_engine(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
@@ -0,0 +1,299 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+A deliberately small registry (counters, gauges and histograms with labels)
+so the API does not need an extra dependency. Values are per process and are
+rendered by `GET /metrics`.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+DB_LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def __init__(self, *args, **kwargs):
+        self._values: Dict[LabelValues, float] = {}
+        super().__init__(*args, **kwargs)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def total(self) -> float:
+        """Sum over all label values"""
+        with self._lock:
+            return sum(self._values.values())
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(Counter):
+    type_name = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = ([0] * (len(self.buckets) + 1), [0.0])
+                self._values[key] = entry
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+# HTTP
+http_requests_total = Counter(
+    "lexibox_http_requests_total", "HTTP requests handled", ("method", "route", "status"))
+http_request_duration_seconds = Histogram(
+    "lexibox_http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+http_requests_in_flight = Gauge(
+    "lexibox_http_requests_in_flight", "HTTP requests currently being served")
+http_response_size_bytes = Histogram(
+    "lexibox_http_response_size_bytes", "HTTP response body size", ("method", "route"), buckets=SIZE_BUCKETS)
+
+# Database
+db_queries_total = Counter(
+    "lexibox_db_queries_total", "SQL statements executed", ("route",))
+db_query_duration_seconds = Histogram(
+    "lexibox_db_query_duration_seconds", "SQL statement latency", ("route",), buckets=DB_LATENCY_BUCKETS)
+db_queries_per_request = Histogram(
+    "lexibox_db_queries_per_request", "SQL statements executed per HTTP request", ("route",), buckets=COUNT_BUCKETS)
+db_time_per_request_seconds = Histogram(
+    "lexibox_db_time_per_request_seconds", "Total SQL time per HTTP request", ("route",))
+
+# PDF extraction
+pdf_extraction_duration_seconds = Histogram(
+    "lexibox_pdf_extraction_duration_seconds", "Time spent extracting text from one PDF")
+pdf_pages_extracted_total = Counter(
+    "lexibox_pdf_pages_extracted_total", "PDF pages run through text extraction")
+pdf_extraction_pages_per_second = Histogram(
+    "lexibox_pdf_extraction_pages_per_second", "Extraction throughput per PDF",
+    buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000))
+
+
+# OCR
+ocr_pages_total = Counter(
+    "lexibox_ocr_pages_total", "Pages sent to OCR by outcome (hit = served from cache)", ("result",))
+ocr_page_duration_seconds = Histogram(
+    "lexibox_ocr_page_duration_seconds", "Time from queueing a page for OCR to its result",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0))
+
+
+# Admission control
+admission_rejections_total = Counter(
+    "lexibox_admission_rejections_total", "Requests refused with 429 by tenant limits",
+    ("operation", "scope", "reason"))
+
+# Database maintenance
+maintenance_task_duration_seconds = Histogram(
+    "lexibox_maintenance_task_duration_seconds", "Time spent per maintenance task in one run", ("task",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0))
+maintenance_reclaimed_bytes_total = Counter(
+    "lexibox_maintenance_reclaimed_bytes_total", "Bytes returned to the filesystem by incremental vacuum")
+
+
+class _RequestDbStats:
+    __slots__ = ("scope", "queries", "seconds")
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.queries = 0
+        self.seconds = 0.0
+
+    @property
+    def route(self) -> str:
+        return _route_label(self.scope)
+
+
+_request_db_stats: ContextVar[Optional[_RequestDbStats]] = ContextVar("request_db_stats", default=None)
+
+
+def instrument_engine(engine) -> None:
+    """Record count and duration of every statement run through `engine`"""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("lexibox_query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("lexibox_query_start")
+        if not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        stats = _request_db_stats.get()
+        route = stats.route if stats is not None else "background"
+        db_queries_total.inc(route=route)
+        db_query_duration_seconds.observe(elapsed, route=route)
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
+
+
+def record_extraction(seconds: float, pages: int) -> None:
+    pdf_extraction_duration_seconds.observe(seconds)
+    pdf_pages_extracted_total.inc(pages)
+    if seconds > 0:
+        pdf_extraction_pages_per_second.observe(pages / seconds)
+
+
+def record_ocr(result: str, seconds: float) -> None:
+    ocr_pages_total.inc(result=result)
+    ocr_page_duration_seconds.observe(seconds)
+
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, size, in-flight and per-request DB stats"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope.get("method", "")
+        stats = _RequestDbStats(scope)
+        token = _request_db_stats.set(stats)
+        status_code = 500
+        response_bytes = 0
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            _request_db_stats.reset(token)
+            route = _route_label(scope)
+            elapsed = time.perf_counter() - start
+            http_requests_total.inc(method=method, route=route, status=str(status_code))
+            http_request_duration_seconds.observe(elapsed, method=method, route=route)
+            http_response_size_bytes.observe(response_bytes, method=method, route=route)
+            db_queries_per_request.observe(stats.queries, route=route)
+            db_time_per_request_seconds.observe(stats.seconds, route=route)
@@ -3,4 +3,12 @@ from ..database import Base
 from .document import Document
 from .user import User
 from .organization import Organization
-from .invitation import UserInvitation 
\ No newline at end of file
+from .invitation import UserInvitation
+from .search_index import SearchTerm, TermTrigram, DocumentTerm, Suggestion
+from .chunk import DocumentChunk
+from .signature import DocumentSignature, LshBucket
+from .job import ReextractionJob
+from .deletion import DeletionJob
+from .stats import StatCounter
+from .upload import UploadJob
+from .maintenance import MaintenanceRun
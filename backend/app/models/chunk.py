@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from ..database import Base
+
+class DocumentChunk(Base):
+    """A window of a document's text; `id` is its row in the on-disk vector file"""
+    __tablename__ = "document_chunks"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    document_id = Column(Integer, ForeignKey("documents.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)
+    char_start = Column(Integer, nullable=False)
+    char_end = Column(Integer, nullable=False)
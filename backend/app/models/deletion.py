@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from ..database import Base
+
+class DeletionJob(Base):
+    """A user or organization being deleted in batches, with its documents and files"""
+    __tablename__ = "deletion_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # user, organization
+    target_id = Column(Integer, nullable=False)
+    target_name = Column(String, nullable=True)
+    status = Column(String, nullable=False, default="pending", index=True)  # pending, running, completed, failed
+    documents_deleted = Column(Integer, nullable=False, default=0)
+    files_deleted = Column(Integer, nullable=False, default=0)
+    users_deleted = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    requested_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
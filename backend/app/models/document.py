@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Index
 from sqlalchemy.sql import func
 from ..database import Base
 
@@ -10,4 +10,16 @@ class Document(Base):
     file_path = Column(String, nullable=False)
     content = Column(Text, nullable=False)
     upload_date = Column(DateTime(timezone=True), server_default=func.now())
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False) 
\ No newline at end of file
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    extractor_version = Column(String, nullable=True, index=True)
+    size_bytes = Column(Integer, nullable=True)
+    page_count = Column(Integer, nullable=True)
+
+    __table_args__ = (
+        # Covering index for filtered lists and facet counts (see services/facets.py)
+        Index("ix_documents_user_facets", "user_id", "upload_date", "size_bytes", "page_count",
+              "extractor_version", "filename"),
+        Index("ix_documents_user_size", "user_id", "size_bytes"),
+        Index("ix_documents_user_pages", "user_id", "page_count"),
+        Index("ix_documents_user_filename", "user_id", "filename"),
+    )
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from ..database import Base
+
+class ReextractionJob(Base):
+    """A throttled pass re-extracting documents whose extractor version is outdated"""
+    __tablename__ = "reextraction_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, nullable=False, default="running")  # running, paused, completed, failed
+    extractor = Column(String, nullable=True)
+    target_version = Column(String, nullable=False)
+    cpu_budget = Column(Float, nullable=False)
+    io_budget_mb = Column(Float, nullable=False)
+    batch_size = Column(Integer, nullable=False)
+    total = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    last_document_id = Column(Integer, nullable=False, default=0)
+    error = Column(String, nullable=True)
+    started_by_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, DateTime, Float, JSON
+from sqlalchemy.sql import func
+from ..database import Base
+
+class MaintenanceRun(Base):
+    """One pass of scheduled database maintenance, with what each task did"""
+    __tablename__ = "maintenance_runs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    status = Column(String, nullable=False, default="running")  # running, completed, partial, failed
+    tasks = Column(JSON, nullable=True)
+    seconds = Column(Float, nullable=True)
+    # Database and WAL file sizes in bytes, and free pages, before and after
+    database_bytes_before = Column(Integer, nullable=True)
+    database_bytes_after = Column(Integer, nullable=True)
+    wal_bytes_before = Column(Integer, nullable=True)
+    wal_bytes_after = Column(Integer, nullable=True)
+    free_pages_before = Column(Integer, nullable=True)
+    free_pages_after = Column(Integer, nullable=True)
+    reclaimed_bytes = Column(Integer, nullable=True)
+    integrity = Column(String, nullable=True)  # "ok", or the first problems found; NULL when not checked
+    error = Column(String, nullable=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    finished_at = Column(DateTime(timezone=True), nullable=True)
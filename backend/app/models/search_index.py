@@ -0,0 +1,42 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
+from ..database import Base
+
+class SearchTerm(Base):
+    """Dictionary of every normalized term seen in document content or filenames"""
+    __tablename__ = "search_terms"
+
+    id = Column(Integer, primary_key=True)
+    term = Column(String, unique=True, nullable=False)
+    length = Column(Integer, nullable=False)
+
+class TermTrigram(Base):
+    """Character trigram postings used to find candidate terms for fuzzy matching"""
+    __tablename__ = "term_trigrams"
+
+    trigram = Column(String(3), primary_key=True)
+    term_id = Column(Integer, ForeignKey("search_terms.id"), primary_key=True)
+
+class DocumentTerm(Base):
+    """Which documents contain which terms, and how often"""
+    __tablename__ = "document_terms"
+
+    term_id = Column(Integer, ForeignKey("search_terms.id"), primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), primary_key=True)
+    frequency = Column(Integer, nullable=False, default=1)
+
+    __table_args__ = (
+        Index("ix_document_terms_document_id", "document_id"),
+    )
+
+class Suggestion(Base):
+    """Per-user prefix dictionary of terms and filenames, with the number of documents containing each"""
+    __tablename__ = "suggestions"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    kind = Column(String, primary_key=True)  # term or filename
+    key = Column(String, primary_key=True)  # normalized; prefix lookups are range scans on it
+    text = Column(String, nullable=False)  # as shown to the user
+    document_count = Column(Integer, nullable=False, default=0)
+
+    # Rows live in the primary key B-tree, so a prefix lookup reads one contiguous range
+    __table_args__ = {"sqlite_with_rowid": False}
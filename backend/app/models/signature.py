@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, LargeBinary, ForeignKey, Index
+from ..database import Base
+
+class DocumentSignature(Base):
+    """MinHash signature of a document's shingles, used for near-duplicate detection"""
+    __tablename__ = "document_signatures"
+
+    document_id = Column(Integer, ForeignKey("documents.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    minhash = Column(LargeBinary, nullable=False)
+
+class LshBucket(Base):
+    """One LSH band of a signature; documents sharing a bucket are duplicate candidates"""
+    __tablename__ = "lsh_buckets"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    band = Column(Integer, primary_key=True)
+    bucket = Column(Integer, primary_key=True)
+    document_id = Column(Integer, ForeignKey("documents.id"), primary_key=True)
+
+    __table_args__ = (
+        Index("ix_lsh_buckets_document_id", "document_id"),
+    )
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, String
+from ..database import Base
+
+class StatCounter(Base):
+    """An incrementally maintained count, e.g. documents of one organization or uploads on one day"""
+    __tablename__ = "stat_counters"
+
+    scope = Column(String, primary_key=True)  # all, org:<id>, user:<id>
+    day = Column(String, primary_key=True, default="")  # YYYY-MM-DD, or "" for the running total
+    name = Column(String, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
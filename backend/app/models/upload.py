@@ -0,0 +1,26 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, JSON
+from sqlalchemy.sql import func
+from ..database import Base
+
+class UploadJob(Base):
+    """An upload being extracted and indexed, with progress streamed to its owner"""
+    __tablename__ = "upload_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    filename = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued, extracting, ocr, indexing, completed, failed
+    pages_done = Column(Integer, nullable=False, default=0)
+    pages_total = Column(Integer, nullable=True)
+    size_bytes = Column(Integer, nullable=True)
+    document_id = Column(Integer, nullable=True)
+    near_duplicates = Column(JSON, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Set by the application with microseconds: event streams read changes since a point in time
+    updated_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_upload_jobs_user_updated", "user_id", "updated_at"),
+    )
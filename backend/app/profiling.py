@@ -0,0 +1,247 @@
+"""
+Opt-in request profiling.
+
+A statistical stack sampler runs while a profiled request is in flight and
+records the Python stacks of every busy thread (the event loop and the
+threadpool that runs sync endpoints). Profiles are kept when the request was
+picked by sampling or took longer than the slow threshold, and are written as
+folded stacks that flamegraph.pl, speedscope or inferno read directly.
+
+Configured from the environment (profiling is off unless one is set):
+
+    LEXIBOX_PROFILE_SAMPLE_RATE  fraction of requests to keep, 0.0-1.0 (default 0)
+    LEXIBOX_PROFILE_SLOW_MS      keep any request slower than this (default 0 = off)
+    LEXIBOX_PROFILE_INTERVAL_MS  stack sampling interval (default 10)
+    LEXIBOX_PROFILE_DIR          where profiles are stored (default "profiles")
+    LEXIBOX_PROFILE_MAX_FILES    oldest profiles are pruned past this (default 200)
+
+Samples are taken across all threads, so a profile captured while other
+requests were running also contains their stacks.
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from .log import get_logger, request_id_var
+
+logger = get_logger("profiling")
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}T[0-9]{6}_[0-9a-f]{8,32}$")
+
+# Frames at the top of a stack that mean the thread is idle
+_IDLE_FUNCTIONS = {
+    ("threading.py", "wait"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("base_events.py", "_run_once"),
+}
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class ProfilerConfig:
+    def __init__(self):
+        self.sample_rate = max(0.0, min(1.0, _env_float("LEXIBOX_PROFILE_SAMPLE_RATE", 0.0)))
+        self.slow_ms = _env_float("LEXIBOX_PROFILE_SLOW_MS", 0.0)
+        self.interval = max(1.0, _env_float("LEXIBOX_PROFILE_INTERVAL_MS", 10.0)) / 1000
+        self.directory = os.getenv("LEXIBOX_PROFILE_DIR", "profiles")
+        self.max_files = int(_env_float("LEXIBOX_PROFILE_MAX_FILES", 200))
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0 or self.slow_ms > 0
+
+
+class _Session:
+    def __init__(self):
+        self.stacks: Counter = Counter()
+        self.samples = 0
+
+
+class StackSampler:
+    """Background thread that samples stacks while at least one session is active"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._sessions: List[_Session] = []
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start_session(self) -> _Session:
+        session = _Session()
+        with self._lock:
+            self._sessions.append(session)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="lexibox-profiler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+        return session
+
+    def stop_session(self, session: _Session) -> None:
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+
+    def _run(self) -> None:
+        own_ident = threading.get_ident()
+        while True:
+            with self._lock:
+                sessions = list(self._sessions)
+            if not sessions:
+                self._wakeup.clear()
+                self._wakeup.wait(timeout=5)
+                with self._lock:
+                    if not self._sessions:
+                        self._thread = None
+                        return
+                continue
+
+            stacks = self._sample(own_ident)
+            with self._lock:
+                for session in self._sessions:
+                    session.samples += 1
+                    session.stacks.update(stacks)
+            time.sleep(self.interval)
+
+    @staticmethod
+    def _sample(own_ident: int) -> List[str]:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FUNCTIONS:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                frame = frame.f_back
+            frames.append(names.get(ident, str(ident)))
+            stacks.append(";".join(reversed(frames)))
+        return stacks
+
+
+class ProfileStore:
+    """Profiles on local disk: `<id>.folded` stacks plus `<id>.json` metadata"""
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+
+    def save(self, metadata: Dict, stacks: Counter) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S")
+        # Never derived from the client's X-Request-ID, which stays in the metadata only
+        profile_id = f"{stamp}_{os.urandom(8).hex()}"
+        metadata = dict(metadata, id=profile_id, captured_at=datetime.now(timezone.utc).isoformat())
+
+        with open(os.path.join(self.directory, f"{profile_id}.folded"), "w") as f:
+            for stack, count in stacks.most_common():
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as f:
+            json.dump(metadata, f)
+
+        self._prune()
+        return profile_id
+
+    def _prune(self) -> None:
+        profiles = sorted(p[:-5] for p in os.listdir(self.directory) if p.endswith(".json"))
+        for profile_id in profiles[:max(0, len(profiles) - self.max_files)]:
+            for ext in (".json", ".folded"):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + ext))
+                except FileNotFoundError:
+                    pass
+
+    def list(self) -> List[Dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def path_for(self, profile_id: str) -> Optional[str]:
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.folded")
+        return path if os.path.exists(path) else None
+
+
+config = ProfilerConfig()
+store = ProfileStore(config.directory, config.max_files)
+_sampler = StackSampler(config.interval)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that captures stack profiles for sampled or slow requests"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not config.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        sampled = random.random() < config.sample_rate
+        if not sampled and config.slow_ms <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        session = _sampler.start_session()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _sampler.stop_session(session)
+            duration_ms = (time.perf_counter() - start) * 1000
+            slow = config.slow_ms > 0 and duration_ms >= config.slow_ms
+            if (sampled or slow) and session.samples:
+                route = scope.get("route")
+                metadata = {
+                    "request_id": request_id_var.get(),
+                    "method": scope.get("method"),
+                    "path": scope.get("path"),
+                    "route": getattr(route, "path_format", None) or scope.get("path"),
+                    "status": status_code,
+                    "duration_ms": round(duration_ms, 2),
+                    "samples": session.samples,
+                    "interval_ms": config.interval * 1000,
+                    "reason": "slow" if slow else "sampled",
+                }
+                try:
+                    profile_id = store.save(metadata, session.stacks)
+                    logger.info("profile captured", extra={"profile_id": profile_id, "duration_ms": metadata["duration_ms"]})
+                except OSError:
+                    logger.exception("failed to store profile")
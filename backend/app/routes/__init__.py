@@ -4,4 +4,6 @@ from .search import router as search_router
 from .upload import router as upload_router
 from .auth import router as auth_router
 from .admin import router as admin_router
-from .organization import router as organization_router 
\ No newline at end of file
+from .organization import router as organization_router
+from .metrics import router as metrics_router
+from .health import router as health_router
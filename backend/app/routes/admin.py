@@ -1,12 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import FileResponse, StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime
+from typing import List, Optional
 from ..database import get_db
-from ..models import User, Document, Organization, UserInvitation
+from ..models import User, Document, Organization, ReextractionJob, DeletionJob
 from ..schemas.user import UserResponse
 from ..auth import get_current_user
 from ..schemas.document import DocumentResponse
 from ..schemas.organization import OrganizationResponse
+from ..schemas.job import ReextractionRequest, ReextractionJobResponse, DeletionJobResponse
+from ..profiling import store as profile_store
+from ..serialization import documents_response
+from ..services import deletion, export, maintenance, quotas, reextraction, stats
+from ..services.extractors import ExtractorUnavailable
+from ..services.storage import get_storage
+from ..services.extraction_pool import pool as extraction_pool
+from ..admission import controller as admission_controller
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
@@ -46,33 +56,86 @@ def get_all_documents(
 ):
     """Get all documents from all users (admin only)"""
     documents = db.query(Document).all()
-    return [
-        DocumentResponse(
-            id=doc.id,
-            filename=doc.filename,
-            content=doc.content,
-            upload_date=doc.upload_date,
-            user_id=doc.user_id
-        ) for doc in documents
-    ]
+    return documents_response(documents)
+
+@router.get("/documents/export")
+def export_all_documents(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns, e.g. id,user_id,filename"),
+    organization_id: Optional[int] = Query(None, description="Only documents of this organization's members"),
+    user_id: Optional[int] = Query(None, description="Only documents of this user"),
+    since: Optional[datetime] = Query(None, description="Only documents uploaded at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only documents uploaded before this time"),
+    q: Optional[str] = Query(None, description="Only documents whose filename or content contains this text"),
+    current_user: User = Depends(require_admin)
+):
+    """Stream documents from all users, optionally filtered, in constant memory (admin only)"""
+    try:
+        columns = export.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    query = export.build_query(columns, user_id=user_id, organization_id=organization_id, since=since, until=until, q=q)
+    return StreamingResponse(
+        export.stream(query, columns, format),
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="documents.{format}"'}
+    )
 
 @router.get("/stats")
 def get_system_stats(
+    days: int = Query(30, ge=1, le=366, description="Days of per-day activity to include"),
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """Get system statistics (admin only)"""
-    total_users = db.query(User).count()
-    total_documents = db.query(Document).count()
-    admin_users = db.query(User).filter(User.is_admin == True).count()
+    # Maintained incrementally on every write, so no table scans here
+    totals = stats.totals(db)
+    total_users = totals["users"]
+    total_documents = totals["documents"]
     
     return {
         "total_users": total_users,
         "total_documents": total_documents,
-        "admin_users": admin_users,
-        "average_documents_per_user": total_documents / total_users if total_users > 0 else 0
+        "admin_users": totals["admin_users"],
+        "average_documents_per_user": total_documents / total_users if total_users > 0 else 0,
+        "total_bytes": totals["bytes"],
+        "total_pages": totals["pages"],
+        "organizations": stats.organization_totals(db),
+        "daily": stats.daily(db, days=days),
+        "reextraction": reextraction.progress(db),
+        "deletion": deletion.progress(db),
+        "storage": get_storage().describe(),
+        "quotas": quotas.summary(db),
+        "maintenance": maintenance.progress(db),
+        "admission": {
+            "in_flight": admission_controller.in_flight(),
+            "extraction_queue": {**extraction_pool.status(), "tenants": extraction_pool.queue_depths()}
+        }
     }
 
+@router.get("/stats/organizations/{org_id}")
+def get_organization_stats(
+    org_id: int,
+    days: int = Query(30, ge=1, le=366, description="Days of per-day activity to include"),
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Totals and per-day activity of one organization (admin only)"""
+    org = db.query(Organization).filter(Organization.id == org_id).first()
+    if not org:
+        raise HTTPException(status_code=404, detail="Organization not found")
+    scope = stats.org_scope(org_id)
+    return {"organization_id": org.id, "name": org.name, **stats.totals(db, scope),
+            "quota": quotas.usage(db, scope), "daily": stats.daily(db, scope, days=days)}
+
+@router.post("/stats/reconcile")
+def reconcile_stats(
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Recount users and documents and correct drifted counters (admin only)"""
+    return stats.reconcile(db)
+
 @router.put("/users/{user_id}/admin")
 def toggle_admin_status(
     user_id: int,
@@ -94,6 +157,7 @@ def toggle_admin_status(
         )
     
     user.is_admin = not user.is_admin
+    stats.admin_changed(db, 1 if user.is_admin else -1)
     db.commit()
     db.refresh(user)
     
@@ -111,7 +175,7 @@ def toggle_admin_status(
         )
     }
 
-@router.delete("/users/{user_id}")
+@router.delete("/users/{user_id}", status_code=status.HTTP_202_ACCEPTED)
 def delete_user(
     user_id: int,
     current_user: User = Depends(require_admin),
@@ -131,14 +195,10 @@ def delete_user(
             detail="User not found"
         )
     
-    # Delete all user's documents
-    db.query(Document).filter(Document.user_id == user_id).delete()
-    
-    # Delete the user
-    db.delete(user)
-    db.commit()
-    
-    return {"message": f"User {user.email} and all their documents have been deleted"}
+    # Documents, files and the account are removed in batches in the background
+    job = deletion.start_job(db, "user", user.id, target_name=user.email, user_id=current_user.id)
+    return {"message": f"Deletion of user {user.email} and all their documents has been scheduled",
+            "job": deletion.job_summary(job)}
 
 @router.get("/organizations", response_model=List[OrganizationResponse])
 def get_all_organizations(
@@ -164,7 +224,7 @@ def get_all_organizations(
         )
     return org_responses
 
-@router.delete("/organizations/{org_id}")
+@router.delete("/organizations/{org_id}", status_code=status.HTTP_202_ACCEPTED)
 def delete_organization(
     org_id: int,
     current_user: User = Depends(require_admin),
@@ -173,11 +233,92 @@ def delete_organization(
     org = db.query(Organization).filter(Organization.id == org_id).first()
     if not org:
         raise HTTPException(status_code=404, detail="Organization not found")
-    # Delete all users in the org
-    db.query(User).filter(User.organization_id == org_id).delete()
-    # Delete all invitations for the org
-    db.query(UserInvitation).filter(UserInvitation.organization_id == org_id).delete()
-    # Delete the org
-    db.delete(org)
-    db.commit()
-    return {"message": f"Organization {org.name} and all related users/invitations have been deleted"} 
\ No newline at end of file
+    # Members' documents and files, the members, invitations and the org are removed in the background
+    job = deletion.start_job(db, "organization", org.id, target_name=org.name, user_id=current_user.id)
+    return {"message": f"Deletion of organization {org.name} and all related users/invitations/documents has been scheduled",
+            "job": deletion.job_summary(job)}
+
+@router.get("/profiles")
+def list_profiles(current_user: User = Depends(require_admin)):
+    """List captured request profiles, newest first (admin only)"""
+    return profile_store.list()
+
+@router.get("/profiles/{profile_id}")
+def download_profile(profile_id: str, current_user: User = Depends(require_admin)):
+    """Download a profile as folded stacks for flamegraph tools (admin only)"""
+    path = profile_store.path_for(profile_id)
+    if not path:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
+
+@router.get("/reextraction", response_model=List[ReextractionJobResponse])
+def list_reextraction_jobs(
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """List re-extraction jobs, newest first (admin only)"""
+    jobs = db.query(ReextractionJob).order_by(ReextractionJob.id.desc()).limit(20).all()
+    return [reextraction.job_summary(job) for job in jobs]
+
+@router.post("/reextraction", response_model=ReextractionJobResponse)
+def start_reextraction(
+    request: ReextractionRequest,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Re-extract documents produced by an outdated extractor version (admin only)"""
+    options = {key: value for key, value in request.model_dump().items() if value is not None}
+    try:
+        job = reextraction.start_job(db, user_id=current_user.id, **options)
+    except ExtractorUnavailable as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except reextraction.JobStateError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    reextraction.runner.ensure_running()
+    return reextraction.job_summary(job)
+
+@router.post("/reextraction/{job_id}/pause", response_model=ReextractionJobResponse)
+def pause_reextraction(
+    job_id: int,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Pause a running re-extraction job (admin only)"""
+    return reextraction.job_summary(_set_job_status(db, job_id, "paused"))
+
+@router.post("/reextraction/{job_id}/resume", response_model=ReextractionJobResponse)
+def resume_reextraction(
+    job_id: int,
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Resume a paused re-extraction job (admin only)"""
+    job = _set_job_status(db, job_id, "running")
+    reextraction.runner.ensure_running()
+    return reextraction.job_summary(job)
+
+def _set_job_status(db: Session, job_id: int, new_status: str) -> ReextractionJob:
+    try:
+        return reextraction.set_status(db, job_id, new_status)
+    except LookupError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Job not found")
+    except reextraction.JobStateError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+@router.get("/deletions", response_model=List[DeletionJobResponse])
+def list_deletion_jobs(
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """List user and organization deletion jobs, newest first (admin only)"""
+    jobs = db.query(DeletionJob).order_by(DeletionJob.id.desc()).limit(20).all()
+    return [deletion.job_summary(job) for job in jobs]
+
+@router.get("/maintenance/runs")
+def list_maintenance_runs(
+    limit: int = Query(20, ge=1, le=200),
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """Recent database maintenance runs with their duration and reclaimed space, newest first (admin only)"""
+    return maintenance.recent_runs(db, limit)
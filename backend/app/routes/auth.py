@@ -9,6 +9,7 @@ from ..database import get_db
 from ..models import User
 from ..schemas.auth import UserSignup, UserLogin, Token, UserResponse
 from ..schemas.user import UserUpdate, PasswordUpdate
+from ..services import stats
 from ..auth import get_current_user, get_user_by_email, create_user, verify_password, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
@@ -62,6 +63,7 @@ def signup(user_data: UserSignup, db: Session = Depends(get_db)):
     # Make cmcginley@gmail.com an admin (legacy global admin)
     if user.email == "cmcginley@gmail.com":
         user.is_admin = True
+    stats.user_added(db, user)
     db.commit()
     db.refresh(user)
     
@@ -1,34 +1,62 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime
+from typing import List, Optional, Union
 from ..database import get_db
 from ..models import Document, User
-from ..schemas.document import DocumentResponse
+from ..schemas.document import DocumentResponse, FacetedDocuments, SimilarDocument
 from ..auth import get_current_user
+from ..services.deletion import purge_documents
+from ..services import export
+from ..services.near_duplicates import find_similar, DEFAULT_THRESHOLD
+from ..services.facets import DocumentFilters, SCOPE_PATTERN, SORT_PATTERN, facet_counts, filter_params, scope_condition, sort_order
+from ..serialization import document_response, documents_response, faceted_response
+from ..log import get_logger
 
 router = APIRouter(prefix="/documents", tags=["documents"])
+logger = get_logger("documents")
 
-@router.get("/", response_model=List[DocumentResponse])
+USER_EXPORT_FIELDS = tuple(field for field in export.FIELDS if field not in ("user_id", "organization_id"))
+
+@router.get("/", response_model=Union[List[DocumentResponse], FacetedDocuments])
 def get_documents(
+    filters: DocumentFilters = Depends(filter_params),
+    sort: Optional[str] = Query(None, pattern=SORT_PATTERN, description="upload_date, filename, size or pages; prefix with - for descending"),
+    scope: str = Query("mine", pattern=SCOPE_PATTERN, description="Your documents, or your organization's (org admins)"),
+    facets: bool = Query(False, description="Return {documents, total, facets} with counts by month, owner and file type"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    documents = db.query(Document).filter(Document.user_id == current_user.id).all()
-    
-    # Debug: Print document count and content preview
-    print(f"User {current_user.id} has {len(documents)} documents")
-    for doc in documents:
-        content_preview = doc.content[:100] if doc.content else "No content"
-        print(f"Document {doc.id}: {doc.filename} - Content preview: {content_preview}")
+    conditions = [scope_condition(current_user, scope), *filters.conditions()]
+    documents = db.query(Document).filter(*conditions).order_by(*sort_order(sort)).all()
+    logger.debug("listed documents", extra={"user_id": current_user.id, "count": len(documents)})
     
-    return [
-        DocumentResponse(
-            id=doc.id,
-            filename=doc.filename,
-            content=doc.content,
-            upload_date=doc.upload_date
-        ) for doc in documents
-    ]
+    if facets:
+        return faceted_response(documents, facet_counts(db, conditions))
+    return documents_response(documents)
+
+@router.get("/export")
+def export_documents(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$", description="ndjson (one JSON object per line) or csv"),
+    fields: Optional[str] = Query(None, description="Comma-separated columns, e.g. id,filename,upload_date"),
+    since: Optional[datetime] = Query(None, description="Only documents uploaded at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only documents uploaded before this time"),
+    q: Optional[str] = Query(None, description="Only documents whose filename or content contains this text"),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream the current user's documents without loading them all into memory"""
+    try:
+        columns = export.parse_fields(fields, allowed=USER_EXPORT_FIELDS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    query = export.build_query(columns, user_id=current_user.id, since=since, until=until, q=q)
+    logger.info("export started", extra={"user_id": current_user.id, "format": format, "fields": columns})
+    return StreamingResponse(
+        export.stream(query, columns, format),
+        media_type=export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="documents.{format}"'}
+    )
 
 @router.get("/{document_id}", response_model=DocumentResponse)
 def get_document(
@@ -44,12 +72,33 @@ def get_document(
     if not document:
         raise HTTPException(status_code=404, detail="Document not found")
     
-    return DocumentResponse(
-        id=document.id,
-        filename=document.filename,
-        content=document.content,
-        upload_date=document.upload_date
-    )
+    return document_response(document)
+
+@router.get("/{document_id}/similar", response_model=List[SimilarDocument])
+def get_similar_documents(
+    document_id: int,
+    threshold: float = Query(DEFAULT_THRESHOLD, ge=0.1, le=1.0),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Near-duplicates of a document, by estimated shingle overlap"""
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.user_id == current_user.id
+    ).first()
+    
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
+    
+    return [
+        SimilarDocument(
+            id=doc.id,
+            filename=doc.filename,
+            upload_date=doc.upload_date,
+            similarity=score
+        ) for doc, score in find_similar(db, document, threshold=threshold, limit=limit)
+    ]
 
 @router.delete("/{document_id}")
 def delete_document(
@@ -57,53 +106,20 @@ def delete_document(
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    print(f"=== DELETE DEBUG ===")
-    print(f"Attempting to delete document ID: {document_id} for user: {current_user.id}")
+    document = db.query(Document).filter(
+        Document.id == document_id,
+        Document.user_id == current_user.id
+    ).first()
+    
+    if not document:
+        raise HTTPException(status_code=404, detail="Document not found")
     
     try:
-        document = db.query(Document).filter(
-            Document.id == document_id,
-            Document.user_id == current_user.id
-        ).first()
-        
-        if not document:
-            print(f"Document {document_id} not found for user {current_user.id}")
-            print(f"=== END DELETE DEBUG ===")
-            raise HTTPException(status_code=404, detail="Document not found")
-        
-        print(f"Found document: {document.filename} (ID: {document.id})")
-        
-        # Check how many documents user has before deletion
-        docs_before = db.query(Document).filter(Document.user_id == current_user.id).count()
-        print(f"User has {docs_before} documents before deletion")
-        
-        # Delete the document
-        db.delete(document)
-        
-        # Commit the transaction
-        db.commit()
-        
-        # Verify the deletion by checking the database again
-        deleted_doc = db.query(Document).filter(
-            Document.id == document_id,
-            Document.user_id == current_user.id
-        ).first()
-        
-        if deleted_doc:
-            print(f"ERROR: Document {document_id} still exists after deletion!")
-            print(f"=== END DELETE DEBUG ===")
-            raise HTTPException(status_code=500, detail="Failed to delete document")
-        
-        # Check how many documents user has after deletion
-        docs_after = db.query(Document).filter(Document.user_id == current_user.id).count()
-        print(f"User has {docs_after} documents after deletion")
-        print(f"Document {document_id} successfully deleted")
-        print(f"=== END DELETE DEBUG ===")
-        
-        return {"message": "Document deleted successfully"}
-        
+        purge_documents(db, [document.id])
     except Exception as e:
-        print(f"ERROR during deletion: {str(e)}")
         db.rollback()
-        print(f"=== END DELETE DEBUG ===")
-        raise HTTPException(status_code=500, detail=f"Failed to delete document: {str(e)}") 
\ No newline at end of file
+        logger.exception("document delete failed", extra={"document_id": document_id, "user_id": current_user.id})
+        raise HTTPException(status_code=500, detail=f"Failed to delete document: {str(e)}")
+    
+    logger.info("document deleted", extra={"document_id": document_id, "user_id": current_user.id})
+    return {"message": "Document deleted successfully"}
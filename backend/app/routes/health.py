@@ -1,8 +1,34 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+from sqlalchemy import text
+from ..database import engine
+from ..services.extraction_pool import pool as extraction_pool
+from ..log import get_logger
 
 router = APIRouter(tags=["health"])
+logger = get_logger("health")
 
 @router.get("/health")
 def health_check():
-    """Health check endpoint for Docker and monitoring"""
-    return {"status": "healthy", "service": "lexibox-backend"} 
\ No newline at end of file
+    """Liveness: the process is up and serving requests"""
+    return {"status": "healthy", "service": "lexibox-backend"}
+
+@router.get("/ready")
+def readiness_check():
+    """Readiness: the database is reachable and migrated, and extraction has capacity"""
+    checks = {}
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1 FROM documents LIMIT 1"))
+        checks["database"] = {"ready": True}
+    except Exception as e:
+        logger.warning("readiness: database check failed", extra={"error": str(e)})
+        checks["database"] = {"ready": False, "error": str(e)}
+
+    checks["extraction_pool"] = extraction_pool.status()
+
+    ready = all(check["ready"] for check in checks.values())
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"status": "ready" if ready else "not ready", "checks": checks},
+    )
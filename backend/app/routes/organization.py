@@ -6,6 +6,7 @@ from ..models import User, Organization, UserInvitation
 from ..schemas.organization import OrganizationResponse, UserInvitationCreate, UserInvitationResponse
 from ..schemas.user import UserResponse
 from ..auth import get_current_user
+from ..services import deletion, quotas, stats
 
 router = APIRouter(prefix="/org", tags=["organization"])
 
@@ -21,7 +22,11 @@ def get_my_org(current_user: User = Depends(get_current_user), db: Session = Dep
     org = db.query(Organization).filter(Organization.id == current_user.organization_id).first()
     if not org:
         raise HTTPException(status_code=404, detail="Organization not found")
-    return org
+    return {
+        **OrganizationResponse.model_validate(org).model_dump(),
+        "usage": quotas.usage(db, stats.org_scope(org.id)),
+        "user_usage": quotas.usage(db, stats.user_scope(current_user.id)),
+    }
 
 @router.get("/users", response_model=List[UserResponse])
 def list_org_users(current_user: User = Depends(require_org_admin), db: Session = Depends(get_db)):
@@ -68,6 +73,7 @@ def accept_invite(invite_id: int, current_user: User = Depends(get_current_user)
     from datetime import datetime
     invite.accepted_at = datetime.utcnow()
     # Add user to org
+    stats.user_moved(db, current_user.id, current_user.organization_id, invite.organization_id)
     current_user.organization_id = invite.organization_id
     current_user.is_org_admin = False
     db.commit()
@@ -81,9 +87,9 @@ def remove_user(user_id: int, current_user: User = Depends(require_org_admin), d
         raise HTTPException(status_code=404, detail="User not found in your organization")
     if user.id == current_user.id:
         raise HTTPException(status_code=400, detail="Cannot remove yourself")
-    db.delete(user)
-    db.commit()
-    return {"message": f"User {user.email} removed from organization"}
+    # The account goes with its documents, in the background
+    job = deletion.start_job(db, "user", user.id, target_name=user.email, user_id=current_user.id)
+    return {"message": f"User {user.email} removed from organization", "job": deletion.job_summary(job)}
 
 @router.put("/users/{user_id}/admin")
 def toggle_org_admin(user_id: int, current_user: User = Depends(require_org_admin), db: Session = Depends(get_db)):
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
-from typing import List
+from typing import List, Optional, Union
 from ..database import get_db
 from ..models import Document, User
-from ..schemas.document import DocumentResponse
+from ..schemas.document import DocumentResponse, FacetedDocuments
 from ..auth import get_current_user
+from ..admission import admit, SEARCH
+from ..services.search_index import fuzzy_search, DEFAULT_MAX_DISTANCE
+from ..services.query_parser import compile_query, QuerySyntaxError
+from ..services.vector_index import semantic_search
+from ..services.suggest import suggest, MAX_LIMIT
+from ..services.facets import DocumentFilters, SCOPE_PATTERN, SORT_PATTERN, facet_counts, filter_params, scope_condition, sort_order
+from ..serialization import documents_response, faceted_response
+from ..log import get_logger
 
 router = APIRouter(prefix="/search", tags=["search"])
+logger = get_logger("search")
 
 @router.get("/test")
 def test_search(
@@ -33,44 +42,76 @@ def test_search(
     
     return result
 
-@router.get("/", response_model=List[DocumentResponse])
+@router.get("/suggest")
+def suggest_terms(
+    q: str = Query(..., min_length=1, max_length=200, description="What the user has typed so far"),
+    limit: int = Query(8, ge=1, le=MAX_LIMIT, description="Suggestions of each kind"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Terms and filenames from the user's documents starting with the typed prefix, most frequent first"""
+    return suggest(db, current_user.id, q, limit)
+
+def _narrow(db: Session, ranked: List[Document], conditions: List, order: List) -> List[Document]:
+    """Ranked results that also meet the filters: in rank order, or re-sorted when a sort was asked for"""
+    if not ranked:
+        return []
+    query = db.query(Document).filter(Document.id.in_([doc.id for doc in ranked]), *conditions)
+    if order:
+        return query.order_by(*order).all()
+    kept = {doc.id for doc in query.with_entities(Document.id)}
+    return [doc for doc in ranked if doc.id in kept]
+
+@router.get("/", response_model=Union[List[DocumentResponse], FacetedDocuments])
 def search_documents(
     q: str = Query(..., description="Search query"),
+    mode: str = Query("substring", pattern="^(substring|fuzzy|query|semantic)$", description="substring, typo-tolerant fuzzy matching, the boolean query language, or semantic similarity"),
+    max_distance: int = Query(DEFAULT_MAX_DISTANCE, ge=0, le=3, description="Edits allowed per word in fuzzy mode"),
+    limit: int = Query(10, ge=1, le=100, description="Number of documents returned in semantic mode"),
+    filters: DocumentFilters = Depends(filter_params),
+    sort: Optional[str] = Query(None, pattern=SORT_PATTERN, description="upload_date, filename, size or pages; prefix with - for descending. Ranked modes keep rank order without it"),
+    scope: str = Query("mine", pattern=SCOPE_PATTERN, description="Your documents, or your organization's (org admins; substring and query modes)"),
+    facets: bool = Query(False, description="Return {documents, total, facets} with counts by month, owner and file type"),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(admit(SEARCH))
 ):
-    # Debug: Print search query and user info
-    print(f"=== SEARCH DEBUG ===")
-    print(f"Search query: '{q}'")
-    print(f"Searching for user: {current_user.id}")
-    
-    # First, get all documents for the user to debug
-    all_docs = db.query(Document).filter(Document.user_id == current_user.id).all()
-    print(f"User has {len(all_docs)} total documents in database:")
-    for doc in all_docs:
-        print(f"  - ID: {doc.id}, Filename: {doc.filename}")
+    conditions = [scope_condition(current_user, scope), *filters.conditions()]
+    order = sort_order(sort)
+
+    if mode in ("fuzzy", "semantic"):
+        # Both rank from the user's own index; filters then narrow the ranked list
+        if scope != "mine":
+            raise HTTPException(status_code=400, detail=f"scope=organization is not supported in {mode} mode")
+        if mode == "fuzzy":
+            results = fuzzy_search(db, current_user.id, q, max_distance)
+        else:
+            results = semantic_search(db, current_user.id, q, limit)
+        documents = _narrow(db, [doc for doc, _score in results], conditions, order)
+        logger.debug(f"{mode} search", extra={"user_id": current_user.id, "query": q, "matches": len(documents)})
+        if facets:
+            return faceted_response(documents, facet_counts(db, [Document.id.in_([doc.id for doc in documents])]))
+        return documents_response(documents)
     
-    # Search in documents belonging to the current user
-    # Use case-insensitive search and search in both filename and content
-    documents = db.query(Document).filter(
-        Document.user_id == current_user.id,
-        or_(
+    if mode == "query":
+        try:
+            condition = compile_query(db, q)
+        except QuerySyntaxError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid query: {str(e)}")
+        conditions.append(condition)
+        documents = db.query(Document).filter(*conditions) \
+            .order_by(*(order or [Document.upload_date.desc(), Document.id.desc()])).all()
+        logger.debug("query search", extra={"user_id": current_user.id, "query": q, "matches": len(documents)})
+    else:
+        # Search in documents belonging to the current user
+        # Use case-insensitive search and search in both filename and content
+        conditions.append(or_(
             Document.content.ilike(f"%{q}%"),
             Document.filename.ilike(f"%{q}%")
-        )
-    ).all()
-    
-    # Debug: Print results
-    print(f"Found {len(documents)} matching documents:")
-    for doc in documents:
-        print(f"  - Match: {doc.filename} (ID: {doc.id})")
-    print(f"=== END SEARCH DEBUG ===")
+        ))
+        # Unsorted results in upload order; the id keeps it stable across query plans
+        documents = db.query(Document).filter(*conditions).order_by(*(order or [Document.id.asc()])).all()
+        logger.debug("search", extra={"user_id": current_user.id, "query": q, "matches": len(documents)})
     
-    return [
-        DocumentResponse(
-            id=doc.id,
-            filename=doc.filename,
-            content=doc.content,
-            upload_date=doc.upload_date
-        ) for doc in documents
-    ] 
\ No newline at end of file
+    if facets:
+        return faceted_response(documents, facet_counts(db, conditions))
+    return documents_response(documents)
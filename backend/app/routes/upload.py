@@ -1,61 +1,187 @@
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from ..database import get_db
-from ..models import Document, User
-from ..schemas.document import DocumentResponse
-from ..services.pdf_service import extract_text_from_pdf
+from ..database import get_db, SessionLocal
+from ..models import Document, UploadJob, User
+from ..schemas.document import SimilarDocument, UploadResponse
+from ..schemas.job import UploadJobResponse
+from ..serialization import ORJSONResponse
+from ..services.pdf_service import extract_document
+from ..services.extractors import ExtractorUnavailable, get_extractor
+from ..services.extraction_pool import pool as extraction_pool
+from ..services.indexing import index_document
+from ..services.near_duplicates import find_similar
+from ..services import quotas, stats, upload_jobs
+from ..services.storage import discard, get_storage, new_key
+from ..admission import admit, controller as admission_controller, tenant_key, UPLOAD
 from ..auth import get_current_user
-import os
+from ..log import get_logger
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
+from typing import List, Optional
 
 router = APIRouter(prefix="/upload", tags=["upload"])
+logger = get_logger("upload")
 
-@router.post("/", response_model=DocumentResponse)
-async def upload_pdf(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    # Validate file type
-    if not file.filename.lower().endswith('.pdf'):
-        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
-    
-    # Create uploads directory if it doesn't exist
-    upload_dir = "uploads"
-    if not os.path.exists(upload_dir):
-        os.makedirs(upload_dir)
-    
-    # Save file
-    file_path = os.path.join(upload_dir, file.filename)
-    with open(file_path, "wb") as buffer:
-        content = await file.read()
-        buffer.write(content)
-    
+async def process_upload(job_id: int, owner: User, filename: str, spool_path: str, size: int,
+                         extractor: Optional[str], check_duplicates: bool):
+    """Extract, store and index a spooled upload, reporting progress on its job; returns (document, near-duplicates)"""
+    storage = get_storage()
+    tracker = upload_jobs.Tracker(job_id, owner.id)
+    file_key = None
+    db = SessionLocal()
     try:
         # Extract text from PDF
-        extracted_text = extract_text_from_pdf(file_path)
-        
+        # Off the event loop: extraction and any OCR fallback can take seconds.
+        # Queued per tenant so one tenant's bulk upload does not starve others.
+        extraction = await extraction_pool.run(extract_document, spool_path, extractor,
+                                               tracker.pages("extracting"), tracker.pages("ocr"),
+                                               tenant=tenant_key(owner))
+        tracker.stage("indexing")
+
+        # Move into storage under a new sharded key (an upload to S3 may take a while)
+        file_key = new_key(filename)
+        await run_in_threadpool(storage.put, spool_path, file_key)
+
         # Save to database
         db_document = Document(
-            filename=file.filename,
-            file_path=file_path,
-            content=extracted_text,
+            filename=filename,
+            file_path=file_key,
+            content=extraction.text,
+            extractor_version=extraction.extractor_version,
+            size_bytes=size,
+            page_count=len(extraction.pages),
             upload_date=datetime.utcnow(),
-            user_id=current_user.id
+            user_id=owner.id
         )
         db.add(db_document)
+        db.flush()
+        # Final quota check, now that the page count is known. The insert above took the
+        # write lock, so concurrent uploads are checked one at a time against committed usage.
+        quotas.check_document(db, owner, size, len(extraction.pages))
+        index_document(db, db_document)
+        stats.document_added(db, db_document, owner.organization_id)
         db.commit()
         db.refresh(db_document)
-        
-        return DocumentResponse(
-            id=db_document.id,
-            filename=db_document.filename,
-            content=db_document.content,
-            upload_date=db_document.upload_date
-        )
-        
+        logger.info("document uploaded", extra={"document_id": db_document.id, "user_id": owner.id, "bytes": size})
+
+        near_duplicates = []
+        if check_duplicates:
+            near_duplicates = [
+                SimilarDocument(id=doc.id, filename=doc.filename, upload_date=doc.upload_date, similarity=score)
+                for doc, score in find_similar(db, db_document, limit=5)
+            ]
+            if near_duplicates:
+                logger.info("near-duplicate upload", extra={"document_id": db_document.id,
+                                                            "duplicate_of": [d.id for d in near_duplicates]})
+        upload_jobs.finish(job_id, owner.id, db_document.id, [d.model_dump(mode="json") for d in near_duplicates])
+        return db_document, near_duplicates
+
     except Exception as e:
+        logger.warning("upload failed", extra={"user_id": owner.id, "upload_filename": filename, "error": str(e)})
+        upload_jobs.fail(job_id, owner.id, str(e))
         # Clean up file if processing fails
-        if os.path.exists(file_path):
-            os.remove(file_path)
-        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}") 
\ No newline at end of file
+        discard(spool_path)
+        if file_key is not None:
+            try:
+                storage.delete(file_key)
+            except Exception:
+                pass  # left for the garbage collector
+        raise
+    finally:
+        db.close()
+
+async def _process_in_background(job_id: int, owner: User, *args):
+    try:
+        await process_upload(job_id, owner, *args)
+    finally:
+        admission_controller.release(UPLOAD, owner)
+
+@router.post("/", response_model=UploadResponse, responses={202: {"model": UploadJobResponse}})
+async def upload_pdf(
+    file: UploadFile = File(...),
+    check_duplicates: bool = Query(True, description="Report near-duplicates of the upload already stored"),
+    extractor: Optional[str] = Query(None, description="Text extraction backend for this file"),
+    wait: bool = Query(True, description="Wait for extraction; with false, returns 202 and the upload job once the file is received, and progress is streamed from /upload/events"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(admit(UPLOAD))
+):
+    # Validate file type
+    if not file.filename.lower().endswith('.pdf'):
+        raise HTTPException(status_code=400, detail="Only PDF files are allowed")
+    try:
+        get_extractor(extractor)
+    except ExtractorUnavailable as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    try:
+        allowance = quotas.check_upload(db, current_user)
+        if file.size is not None:
+            allowance.check_bytes(file.size)
+        # Stream to a local spool file: extraction needs a seekable file.
+        # The quota is checked per chunk too, since the size is not always known up front.
+        spool_path, size = await get_storage().spool(file, allowance.check_bytes)
+    except quotas.QuotaExceeded as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    # Processing outlives this request's session when it runs in the background
+    owner = User(id=current_user.id, organization_id=current_user.organization_id)
+    job = upload_jobs.create_job(db, owner.id, file.filename, size)
+    args = (file.filename, spool_path, size, extractor, check_duplicates)
+
+    if not wait:
+        # The job keeps the upload's concurrency slot until it finishes
+        admission_controller.retain(UPLOAD, owner)
+        upload_jobs.run_in_background(_process_in_background(job.id, owner, *args))
+        return ORJSONResponse(upload_jobs.job_summary(job), status_code=202)
+
+    # Processing has its own session; don't hold this one's connection for the seconds it takes
+    db.close()
+    try:
+        db_document, near_duplicates = await process_upload(job.id, owner, *args)
+    except quotas.QuotaExceeded as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing PDF: {str(e)}")
+    return UploadResponse(
+        id=db_document.id,
+        filename=db_document.filename,
+        content=db_document.content,
+        upload_date=db_document.upload_date,
+        near_duplicates=near_duplicates
+    )
+
+@router.get("/events")
+async def upload_events(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Server-Sent Events: an `upload` event whenever one of the user's uploads makes progress"""
+    return StreamingResponse(
+        upload_jobs.stream(current_user.id, request.headers.get("last-event-id")),
+        media_type="text/event-stream",
+        # No caching, and no buffering in nginx-style proxies
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/jobs", response_model=List[UploadJobResponse])
+def list_upload_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """The user's recent uploads, newest first"""
+    jobs = db.query(UploadJob).filter(UploadJob.user_id == current_user.id) \
+        .order_by(UploadJob.id.desc()).limit(limit).all()
+    return [upload_jobs.job_summary(job) for job in jobs]
+
+@router.get("/jobs/{job_id}", response_model=UploadJobResponse)
+def get_upload_job(
+    job_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """One upload's current status"""
+    job = db.query(UploadJob).filter(UploadJob.id == job_id, UploadJob.user_id == current_user.id).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return upload_jobs.job_summary(job)
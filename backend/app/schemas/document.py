@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional, Union
 
 class DocumentBase(BaseModel):
     filename: str
@@ -16,6 +16,31 @@ class DocumentResponse(DocumentBase):
     class Config:
         from_attributes = True
 
+class SimilarDocument(BaseModel):
+    id: int
+    filename: str
+    upload_date: datetime
+    similarity: float
+
+class UploadResponse(DocumentResponse):
+    near_duplicates: List[SimilarDocument] = []
+
+class FacetValue(BaseModel):
+    value: Optional[Union[str, int]] = None  # month (YYYY-MM), owner id or file type
+    documents: int
+    name: Optional[str] = None  # owner facet only
+
+class DocumentFacets(BaseModel):
+    month: List[FacetValue]
+    owner: List[FacetValue]
+    file_type: List[FacetValue]
+
+class FacetedDocuments(BaseModel):
+    """A document list requested with facets=true"""
+    documents: List[DocumentResponse]
+    total: int
+    facets: DocumentFacets
+
 class Document(DocumentResponse):
     file_path: str
     user_id: int
@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+
+class ReextractionRequest(BaseModel):
+    extractor: Optional[str] = None
+    cpu_budget: Optional[float] = Field(None, gt=0, le=16)
+    io_budget_mb: Optional[float] = Field(None, ge=0)
+    batch_size: Optional[int] = Field(None, ge=1, le=1000)
+
+class ReextractionJobResponse(BaseModel):
+    id: int
+    status: str
+    target_version: str
+    total: int
+    processed: int
+    failed: int
+    percent: float
+    cpu_budget: float
+    io_budget_mb: float
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class DeletionJobResponse(BaseModel):
+    id: int
+    kind: str
+    target_id: int
+    target_name: Optional[str] = None
+    status: str
+    documents_deleted: int
+    files_deleted: int
+    users_deleted: int
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class UploadJobResponse(BaseModel):
+    id: int
+    filename: str
+    status: str
+    pages_done: int
+    pages_total: Optional[int] = None
+    size_bytes: Optional[int] = None
+    document_id: Optional[int] = None
+    near_duplicates: Optional[List[dict]] = None
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 from .user import UserResponse
 
@@ -9,11 +9,18 @@ class OrganizationBase(BaseModel):
 class OrganizationCreate(OrganizationBase):
     pass
 
+class ResourceUsage(BaseModel):
+    used: int
+    limit: Optional[int] = None  # None: unlimited
+
 class OrganizationResponse(OrganizationBase):
     id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
     owner: Optional[UserResponse] = None
+    # documents, bytes and pages against their quotas, for the organization and the caller
+    usage: Optional[Dict[str, ResourceUsage]] = None
+    user_usage: Optional[Dict[str, ResourceUsage]] = None
 
     class Config:
         from_attributes = True
@@ -0,0 +1,351 @@
+"""
+Background deletion of users and organizations, and garbage collection of
+uploaded files.
+
+Deleting a user or an organization queues a `DeletionJob`. The runner removes
+the documents of every affected user in batches of LEXIBOX_DELETE_BATCH_SIZE.
+Each batch is one short transaction: the search structures, then the document
+rows. The PDFs are unlinked after the commit. Users, invitations and the
+organization are deleted last. Every step is idempotent, so a job interrupted
+by a restart is simply run again.
+
+The garbage collector runs every LEXIBOX_GC_INTERVAL seconds. It reconciles
+the file storage (see storage.py) against the database in chunks of
+LEXIBOX_GC_CHUNK_SIZE:
+  - documents whose owner no longer exists are removed, with their files
+  - files no document refers to are deleted, once they are older than
+    LEXIBOX_GC_GRACE_SECONDS (an upload writes its file before its row)
+
+The same schedule reconciles the admin stat counters (see stats.py). It also
+fails upload jobs whose process died and deletes old finished ones (see
+upload_jobs.py). One process at a time runs deletions and collections: the
+runner holds an flock on `deletion.lock`.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..log import get_logger
+from ..models import DeletionJob, Document, Organization, User, UserInvitation
+from . import stats, upload_jobs
+from .indexing import remove_documents
+from .reextraction import exclusive
+from .storage import Storage, get_storage
+
+logger = get_logger("deletion")
+
+BATCH_SIZE = int(os.getenv("LEXIBOX_DELETE_BATCH_SIZE", "200"))
+GC_INTERVAL = float(os.getenv("LEXIBOX_GC_INTERVAL", "3600"))
+GC_CHUNK_SIZE = int(os.getenv("LEXIBOX_GC_CHUNK_SIZE", "500"))
+GC_GRACE_SECONDS = float(os.getenv("LEXIBOX_GC_GRACE_SECONDS", "3600"))
+# Pause between batches so other writers get the SQLite write lock
+BATCH_PAUSE = float(os.getenv("LEXIBOX_DELETE_BATCH_PAUSE", "0.05"))
+POLL_INTERVAL = 5.0
+LOCK_PATH = os.getenv("LEXIBOX_DELETE_LOCK", "deletion.lock")
+
+ACTIVE = ("pending", "running")
+
+
+def remove_files(db: Session, paths: Iterable[str]) -> int:
+    """Delete stored files no remaining document refers to; returns how many were removed"""
+    paths = sorted(set(paths))
+    if not paths:
+        return 0
+    # Uploads from before sharding were stored by filename, so another document may share the key
+    referenced = set(db.execute(select(Document.file_path).where(Document.file_path.in_(paths))).scalars())
+    storage = get_storage()
+    removed = 0
+    for path in paths:
+        if path in referenced:
+            continue
+        try:
+            removed += storage.delete(path)
+        except Exception as e:
+            # Left for the garbage collector
+            logger.warning("file delete failed", extra={"path": path, "error": str(e)})
+    return removed
+
+
+def purge_documents(db: Session, document_ids: Sequence[int]) -> int:
+    """Delete documents, their search structures and files in one transaction; returns files removed"""
+    if not document_ids:
+        return 0
+    rows = db.execute(
+        select(Document.file_path, Document.user_id, User.organization_id, Document.size_bytes, Document.page_count,
+               Document.extractor_version)
+        .outerjoin(User, User.id == Document.user_id)
+        .where(Document.id.in_(document_ids))
+    ).all()
+    paths = [row[0] for row in rows]
+    remove_documents(db, document_ids)
+    stats.documents_removed(db, [tuple(row[1:]) for row in rows])
+    db.query(Document).filter(Document.id.in_(document_ids)).delete(synchronize_session=False)
+    db.commit()
+    return remove_files(db, paths)
+
+
+def active_job(db: Session, kind: str, target_id: int) -> Optional[DeletionJob]:
+    return db.query(DeletionJob).filter(
+        DeletionJob.kind == kind, DeletionJob.target_id == target_id, DeletionJob.status.in_(ACTIVE)
+    ).first()
+
+
+def start_job(db: Session, kind: str, target_id: int, target_name: Optional[str] = None,
+              user_id: Optional[int] = None) -> DeletionJob:
+    """Queue the deletion of a user or organization; returns the existing job if one is queued"""
+    job = active_job(db, kind, target_id)
+    if job is None:
+        job = DeletionJob(kind=kind, target_id=target_id, target_name=target_name, status="pending",
+                          requested_by_user_id=user_id)
+        db.add(job)
+        db.commit()
+        db.refresh(job)
+        logger.info("deletion queued", extra={"job_id": job.id, "kind": kind, "target_id": target_id})
+    runner.wake()
+    return job
+
+
+def job_summary(job: DeletionJob) -> dict:
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "target_id": job.target_id,
+        "target_name": job.target_name,
+        "status": job.status,
+        "documents_deleted": job.documents_deleted,
+        "files_deleted": job.files_deleted,
+        "users_deleted": job.users_deleted,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def progress(db: Session) -> dict:
+    """Queued deletions and the last garbage collection, for admin stats"""
+    return {
+        "queued_jobs": db.query(DeletionJob).filter(DeletionJob.status.in_(ACTIVE)).count(),
+        "last_collection": runner.last_collection,
+    }
+
+
+def _purge_user(db: Session, job: DeletionJob, user_id: int, stop: threading.Event) -> bool:
+    """Delete a user's documents batch by batch, then the user; False if stopped first"""
+    while True:
+        if stop.is_set():
+            return False
+        ids = list(db.execute(
+            select(Document.id).where(Document.user_id == user_id).order_by(Document.id).limit(BATCH_SIZE)
+        ).scalars())
+        if not ids:
+            break
+        files = purge_documents(db, ids)
+        job.documents_deleted += len(ids)
+        job.files_deleted += files
+        db.commit()
+        time.sleep(BATCH_PAUSE)
+    # Documents uploaded between the last batch and this delete are left to the collector
+    user = db.get(User, user_id)
+    if user is not None:
+        stats.user_removed(db, user)
+        db.delete(user)
+        job.users_deleted += 1
+    db.commit()
+    return True
+
+
+def run_job(job_id: int, stop: Optional[threading.Event] = None) -> str:
+    """Run a deletion to completion unless `stop` is set; returns its status"""
+    stop = stop or threading.Event()
+    db = SessionLocal()
+    try:
+        db.execute(update(DeletionJob).where(DeletionJob.id == job_id, DeletionJob.status == "pending")
+                   .values(status="running"))
+        db.commit()
+        job = db.get(DeletionJob, job_id)
+        if job.status != "running":
+            return job.status
+        try:
+            if job.kind == "user":
+                user_ids = [job.target_id]
+            else:
+                user_ids = list(db.execute(
+                    select(User.id).where(User.organization_id == job.target_id).order_by(User.id)
+                ).scalars())
+            for user_id in user_ids:
+                if not _purge_user(db, job, user_id, stop):
+                    return "interrupted"
+            if job.kind == "organization":
+                db.query(UserInvitation).filter(UserInvitation.organization_id == job.target_id) \
+                    .delete(synchronize_session=False)
+                # Anyone who joined while the job ran keeps their account
+                for user in db.query(User).filter(User.organization_id == job.target_id):
+                    stats.user_moved(db, user.id, job.target_id, None)
+                    user.organization_id = None
+                    user.is_org_admin = False
+                stats.organization_removed(db, job.target_id)
+                db.query(Organization).filter(Organization.id == job.target_id).delete(synchronize_session=False)
+            job.status = "completed"
+            job.finished_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            db.execute(update(DeletionJob).where(DeletionJob.id == job_id)
+                       .values(status="failed", error=str(e), finished_at=datetime.utcnow()))
+            db.commit()
+            logger.exception("deletion failed", extra={"job_id": job_id})
+            return "failed"
+        logger.info("deletion completed", extra={"job_id": job_id, "kind": job.kind, "target_id": job.target_id,
+                                                 "documents": job.documents_deleted, "files": job.files_deleted})
+        return "completed"
+    finally:
+        db.close()
+
+
+def _remove_orphaned_files(db: Session, storage: Storage, candidates: List[Tuple[str, int]], result: Dict) -> None:
+    sizes = dict(candidates)
+    referenced = set(db.execute(select(Document.file_path).where(Document.file_path.in_(sizes))).scalars())
+    db.rollback()  # end the read transaction between chunks
+    for path, size in sizes.items():
+        if path in referenced:
+            continue
+        try:
+            if not storage.delete(path):
+                continue
+        except Exception as e:
+            logger.warning("file delete failed", extra={"path": path, "error": str(e)})
+            continue
+        result["orphaned_files"] += 1
+        result["bytes_freed"] += size
+
+
+def collect_garbage(storage: Optional[Storage] = None, chunk_size: int = GC_CHUNK_SIZE,
+                    grace_seconds: float = GC_GRACE_SECONDS, stop: Optional[threading.Event] = None) -> Dict:
+    """Remove documents without an owner and files without a document, chunk by chunk"""
+    storage = storage or get_storage()
+    stop = stop or threading.Event()
+    started = time.perf_counter()
+    result = {"orphaned_documents": 0, "orphaned_files": 0, "bytes_freed": 0}
+    db = SessionLocal()
+    try:
+        last_id = 0
+        while not stop.is_set():
+            ids = list(db.execute(
+                select(Document.id)
+                .where(Document.id > last_id, Document.user_id.not_in(select(User.id)))
+                .order_by(Document.id).limit(chunk_size)
+            ).scalars())
+            if not ids:
+                break
+            purge_documents(db, ids)
+            result["orphaned_documents"] += len(ids)
+            last_id = ids[-1]
+            time.sleep(BATCH_PAUSE)
+
+        cutoff = time.time() - grace_seconds
+        candidates: List[Tuple[str, int]] = []
+        for stored in storage.list():
+            if stop.is_set():
+                break
+            if stored.modified > cutoff:
+                continue
+            candidates.append((stored.key, stored.size))
+            if len(candidates) >= chunk_size:
+                _remove_orphaned_files(db, storage, candidates, result)
+                candidates = []
+        if candidates and not stop.is_set():
+            _remove_orphaned_files(db, storage, candidates, result)
+    finally:
+        db.close()
+    result["seconds"] = round(time.perf_counter() - started, 3)
+    result["finished_at"] = datetime.utcnow()
+    logger.info("garbage collection finished", extra=result)
+    return result
+
+
+class Runner:
+    """Runs queued deletions, and the periodic garbage collection and counter reconciliation, on a daemon thread"""
+
+    def __init__(self, lock_path: str = LOCK_PATH, interval: float = GC_INTERVAL):
+        self.lock_path = lock_path
+        self.interval = interval
+        self.last_collection: Optional[Dict] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._guard = threading.Lock()
+
+    def ensure_running(self) -> None:
+        with self._guard:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="deletion", daemon=True)
+            self._thread.start()
+
+    def wake(self) -> None:
+        self._wake.set()
+        self.ensure_running()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _next_job(self) -> Optional[int]:
+        db = SessionLocal()
+        try:
+            job = db.query(DeletionJob).filter(DeletionJob.status.in_(ACTIVE)).order_by(DeletionJob.id).first()
+            return job.id if job else None
+        finally:
+            db.close()
+
+    def _housekeeping(self) -> None:
+        try:
+            self.last_collection = collect_garbage(stop=self._stop)
+        except Exception:
+            logger.exception("garbage collection failed")
+        # Counters drift if a process dies between two commits; correct them on the same schedule
+        db = SessionLocal()
+        try:
+            stats.reconcile(db)
+        except Exception:
+            logger.exception("stat counter reconciliation failed")
+        finally:
+            db.close()
+        # Upload jobs orphaned by a crashed worker, and finished ones past retention
+        db = SessionLocal()
+        try:
+            upload_jobs.expire_stale(db)
+            upload_jobs.prune(db)
+        except Exception:
+            logger.exception("upload job cleanup failed")
+        finally:
+            db.close()
+
+    def _run(self) -> None:
+        # Another process holding the lock runs the jobs; it polls for new ones
+        with exclusive(self.lock_path) as acquired:
+            next_collection = time.monotonic() + min(self.interval, 60.0)
+            while acquired and not self._stop.is_set():
+                self._wake.clear()
+                job_id = self._next_job()
+                if job_id is not None:
+                    run_job(job_id, self._stop)
+                    continue
+                if self.interval > 0 and time.monotonic() >= next_collection:
+                    self._housekeeping()
+                    next_collection = time.monotonic() + self.interval
+                self._wake.wait(POLL_INTERVAL)
+
+
+runner = Runner()
@@ -0,0 +1,182 @@
+"""
+Text chunking and CPU embeddings for semantic search.
+
+The default embedder needs nothing but NumPy: chunk terms (and bigrams) are
+feature-hashed into a sparse TF-IDF vector and projected to `dim` dimensions.
+Until `build_semantic_index.py --fit` has run, the projection is a seeded
+random Gaussian matrix (a Johnson-Lindenstrauss projection). After a fit it is
+an LSA basis learned with a truncated SVD of the corpus, which places
+co-occurring terms close together.
+
+Setting LEXIBOX_EMBEDDING_MODEL to a sentence-transformers model name uses
+that model on CPU instead, if the package is installed.
+"""
+
+import math
+import os
+import re
+import zlib
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from ..log import get_logger
+from .search_index import tokenize
+
+logger = get_logger("embeddings")
+
+CHUNK_WORDS = int(os.getenv("LEXIBOX_CHUNK_WORDS", "200"))
+CHUNK_OVERLAP = int(os.getenv("LEXIBOX_CHUNK_OVERLAP", "40"))
+
+HASH_BUCKETS = 4096
+DEFAULT_DIM = 256
+
+_WORD = re.compile(r"\S+")
+
+
+def chunk_text(text: str, words: int = CHUNK_WORDS, overlap: int = CHUNK_OVERLAP) -> List[Tuple[int, int, str]]:
+    """Split text into overlapping word windows as (char_start, char_end, text)"""
+    spans = [(m.start(), m.end()) for m in _WORD.finditer(text or "")]
+    if not spans:
+        return []
+    step = max(1, words - overlap)
+    chunks = []
+    for start in range(0, len(spans), step):
+        window = spans[start:start + words]
+        char_start, char_end = window[0][0], window[-1][1]
+        chunks.append((char_start, char_end, text[char_start:char_end]))
+        if start + words >= len(spans):
+            break
+    return chunks
+
+
+def _features(text: str) -> List[str]:
+    tokens = tokenize(text)
+    return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+
+def _bucket(feature: str) -> Tuple[int, float]:
+    digest = zlib.crc32(feature.encode("utf-8"))
+    return digest % HASH_BUCKETS, 1.0 if (digest >> 31) & 1 else -1.0
+
+
+class HashedEmbedder:
+    """Feature-hashed TF-IDF projected by a random or LSA basis"""
+
+    name = "hashed-tfidf"
+
+    def __init__(self, directory: str, dim: int = DEFAULT_DIM):
+        self.directory = directory
+        self.dim = dim
+        self.basis, self.idf, self.fitted = self._load()
+
+    @property
+    def version(self) -> str:
+        return f"{self.name}-{'lsa' if self.fitted else 'jl'}-{self.dim}"
+
+    def _paths(self):
+        return os.path.join(self.directory, "lsa_basis.npy"), os.path.join(self.directory, "lsa_idf.npy")
+
+    def _load(self):
+        basis_path, idf_path = self._paths()
+        if os.path.exists(basis_path) and os.path.exists(idf_path):
+            basis = np.load(basis_path)
+            if basis.shape == (HASH_BUCKETS, self.dim):
+                return basis.astype(np.float32), np.load(idf_path).astype(np.float32), True
+        rng = np.random.default_rng(20240601)
+        basis = rng.standard_normal((HASH_BUCKETS, self.dim)).astype(np.float32) / math.sqrt(self.dim)
+        return basis, np.ones(HASH_BUCKETS, dtype=np.float32), False
+
+    def sparse(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Hashed, sublinear-tf feature vector as (bucket indices, signed weights)"""
+        counts = {}
+        for feature in _features(text):
+            bucket, sign = _bucket(feature)
+            counts[bucket] = counts.get(bucket, 0.0) + sign
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        index = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        raw = np.fromiter(counts.values(), dtype=np.float32, count=len(counts))
+        weights = np.sign(raw) * (1.0 + np.log(np.abs(raw) + 1e-9)) * self.idf[index]
+        weights[raw == 0] = 0.0
+        return index, weights.astype(np.float32)
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            index, weights = self.sparse(text)
+            if index.size:
+                out[row] = weights @ self.basis[index]
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        np.divide(out, norms, out=out, where=norms > 0)
+        return out
+
+    def fit(self, texts: List[str], oversample: int = 10, power_iterations: int = 2) -> None:
+        """Learn IDF weights and an LSA basis from a sample of chunk texts (randomized SVD)"""
+        if not texts:
+            return
+        document_frequency = np.zeros(HASH_BUCKETS, dtype=np.float64)
+        matrix = np.zeros((len(texts), HASH_BUCKETS), dtype=np.float32)
+        self.idf = np.ones(HASH_BUCKETS, dtype=np.float32)
+        for row, text in enumerate(texts):
+            index, weights = self.sparse(text)
+            matrix[row, index] = weights
+            document_frequency[index] += 1
+        idf = np.log((1 + len(texts)) / (1 + document_frequency)) + 1.0
+        matrix *= idf.astype(np.float32)
+
+        rank = min(self.dim, min(matrix.shape))
+        rng = np.random.default_rng(0)
+        sketch = matrix.T @ rng.standard_normal((matrix.shape[0], rank + oversample)).astype(np.float32)
+        for _ in range(power_iterations):
+            sketch, _ = np.linalg.qr(sketch)
+            sketch = matrix.T @ (matrix @ sketch)
+        q, _ = np.linalg.qr(sketch)
+        _, _, vt = np.linalg.svd(matrix @ q, full_matrices=False)
+        components = (q @ vt.T)[:, :rank]
+
+        basis = np.zeros((HASH_BUCKETS, self.dim), dtype=np.float32)
+        basis[:, :rank] = components
+        os.makedirs(self.directory, exist_ok=True)
+        basis_path, idf_path = self._paths()
+        np.save(basis_path, basis)
+        np.save(idf_path, idf.astype(np.float32))
+        self.basis, self.idf, self.fitted = basis, idf.astype(np.float32), True
+
+
+class SentenceTransformerEmbedder:
+    """A local sentence-transformers model running on CPU"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.version = f"st-{model_name}-{self.dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, batch_size=32, normalize_embeddings=True,
+                                 convert_to_numpy=True).astype(np.float32)
+
+
+_embedder = None
+
+
+def get_embedder(directory: str):
+    global _embedder
+    if _embedder is None:
+        model_name: Optional[str] = os.getenv("LEXIBOX_EMBEDDING_MODEL")
+        if model_name:
+            try:
+                _embedder = SentenceTransformerEmbedder(model_name)
+            except Exception as e:
+                logger.warning("embedding model unavailable, using hashed TF-IDF",
+                               extra={"model": model_name, "error": str(e)})
+        if _embedder is None:
+            _embedder = HashedEmbedder(directory)
+    return _embedder
+
+
+def reset_embedder() -> None:
+    """Drop the cached embedder, e.g. after a new LSA basis was fitted"""
+    global _embedder
+    _embedder = None
@@ -0,0 +1,134 @@
+"""
+Streaming export of documents as newline-delimited JSON or CSV.
+
+Rows are read with `yield_per`, so only one batch of LEXIBOX_EXPORT_BATCH_SIZE
+rows is in memory at a time, and are written out in chunks of about
+CHUNK_BYTES. Memory use does not grow with the number of documents exported.
+Only the requested columns are selected; leaving out `content` makes an export
+of metadata cheap.
+
+The generator opens its own session. The response is still streaming after
+the request's dependencies have been cleaned up.
+"""
+
+import csv
+import io
+import json
+import os
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import Select, or_, select
+
+from ..database import SessionLocal
+from ..log import get_logger
+from ..models import Document, User
+
+logger = get_logger("export")
+
+BATCH_SIZE = int(os.getenv("LEXIBOX_EXPORT_BATCH_SIZE", "500"))
+CHUNK_BYTES = 64 * 1024
+
+FIELDS = {
+    "id": Document.id,
+    "filename": Document.filename,
+    "upload_date": Document.upload_date,
+    "content": Document.content,
+    "user_id": Document.user_id,
+    "organization_id": User.organization_id,
+    "extractor_version": Document.extractor_version,
+    "size_bytes": Document.size_bytes,
+    "page_count": Document.page_count,
+}
+DEFAULT_FIELDS = ("id", "filename", "upload_date", "content")
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def parse_fields(value: Optional[str], allowed: Sequence[str] = tuple(FIELDS)) -> List[str]:
+    """"id,filename" -> ["id", "filename"]; raises ValueError for unknown fields"""
+    if not value:
+        return [field for field in DEFAULT_FIELDS if field in allowed]
+    fields = list(dict.fromkeys(field.strip() for field in value.split(",") if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown or not fields:
+        raise ValueError(f"Unknown export fields: {', '.join(unknown) or '(none)'}. Choose from: {', '.join(allowed)}")
+    return fields
+
+
+def build_query(fields: Sequence[str], user_id: Optional[int] = None, organization_id: Optional[int] = None,
+                since: Optional[datetime] = None, until: Optional[datetime] = None,
+                q: Optional[str] = None) -> Select:
+    query = select(*(FIELDS[field].label(field) for field in fields)).select_from(Document)
+    if "organization_id" in fields or organization_id is not None:
+        query = query.outerjoin(User, User.id == Document.user_id)
+    if user_id is not None:
+        query = query.where(Document.user_id == user_id)
+    if organization_id is not None:
+        query = query.where(User.organization_id == organization_id)
+    if since is not None:
+        query = query.where(Document.upload_date >= since)
+    if until is not None:
+        query = query.where(Document.upload_date < until)
+    if q:
+        pattern = f"%{q}%"
+        query = query.where(or_(Document.filename.ilike(pattern), Document.content.ilike(pattern)))
+    return query.order_by(Document.id)
+
+
+def _rows(query: Select, batch_size: int) -> Iterator[Dict]:
+    db = SessionLocal()
+    try:
+        result = db.execute(query.execution_options(yield_per=batch_size))
+        for row in result.mappings():
+            yield row
+    finally:
+        db.close()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _chunked(lines: Iterator[str]) -> Iterator[bytes]:
+    buffer: List[str] = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield "".join(buffer).encode("utf-8")
+            buffer, size = [], 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def _ndjson_lines(rows: Iterator[Dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(dict(row), default=_json_default, ensure_ascii=False) + "\n"
+
+
+def _csv_lines(rows: Iterator[Dict], fields: Sequence[str]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow(row[field].isoformat() if isinstance(row[field], datetime) else row[field] for field in fields)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def stream(query: Select, fields: Sequence[str], format: str = "ndjson",
+           batch_size: int = BATCH_SIZE) -> Iterator[bytes]:
+    """Encoded export body, produced batch by batch"""
+    rows = _rows(query, batch_size)
+    lines = _csv_lines(rows, fields) if format == "csv" else _ndjson_lines(rows)
+    sent = 0
+    for chunk in _chunked(lines):
+        sent += len(chunk)
+        yield chunk
+    logger.info("export finished", extra={"format": format, "fields": list(fields), "bytes": sent})
@@ -0,0 +1,144 @@
+"""
+Bounded pool that runs PDF text extraction off the event loop.
+
+Uploads hand their file to the pool and await the result. Work is queued per
+tenant (organization, or user without one) and the LEXIBOX_EXTRACTION_WORKERS
+threads take it weighted round-robin. Each tenant with queued work gets up to
+its weight of extractions per turn (default 1; LEXIBOX_TENANT_WEIGHTS, e.g.
+"org:3=4,user:12=2"), so a bulk upload from one tenant only delays others by
+a turn, not by its whole backlog.
+
+Once LEXIBOX_EXTRACTION_MAX_QUEUE extractions are waiting or running, the
+process reports itself not ready, so a load balancer sends new uploads to a
+less busy worker.
+"""
+
+import asyncio
+import os
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+EXTRACTION_WORKERS = int(os.getenv("LEXIBOX_EXTRACTION_WORKERS", str(min(4, os.cpu_count() or 1))))
+EXTRACTION_MAX_QUEUE = int(os.getenv("LEXIBOX_EXTRACTION_MAX_QUEUE", "64"))
+
+
+def _parse_weights(value: str) -> Dict[str, int]:
+    weights = {}
+    for part in value.split(","):
+        tenant, _, weight = part.strip().rpartition("=")
+        if tenant and weight.isdigit() and int(weight) > 0:
+            weights[tenant] = int(weight)
+    return weights
+
+
+TENANT_WEIGHTS = _parse_weights(os.getenv("LEXIBOX_TENANT_WEIGHTS", ""))
+
+_Task = Tuple[Future, Callable, tuple]
+
+
+class ExtractionPool:
+    def __init__(self, workers: int = EXTRACTION_WORKERS, max_queue: int = EXTRACTION_MAX_QUEUE,
+                 weights: Optional[Dict[str, int]] = None):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.weights = TENANT_WEIGHTS if weights is None else weights
+        self._condition = threading.Condition()
+        # Tenants with queued work, in round-robin order
+        self._queues: "OrderedDict[str, Deque[_Task]]" = OrderedDict()
+        self._running: Dict[str, int] = {}
+        self._turn: Optional[str] = None
+        self._turn_left = 0
+        self._closed = False
+        self._threads = []
+
+    def _start(self) -> None:
+        if not self._threads:
+            for index in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"extraction-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    @property
+    def pending(self) -> int:
+        with self._condition:
+            return sum(len(queue) for queue in self._queues.values()) + sum(self._running.values())
+
+    def submit(self, tenant: str, func: Callable, *args) -> Future:
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("Extraction pool is shut down")
+            self._start()
+            self._queues.setdefault(tenant, deque()).append((future, func, args))
+            self._condition.notify()
+        return future
+
+    async def run(self, func: Callable, *args, tenant: str = "default"):
+        return await asyncio.wrap_future(self.submit(tenant, func, *args))
+
+    def _next(self) -> Tuple[str, _Task]:
+        """Weighted round-robin: the current tenant keeps its turn for `weight` tasks"""
+        if self._turn not in self._queues or self._turn_left <= 0:
+            if self._turn in self._queues:
+                self._queues.move_to_end(self._turn)
+            self._turn = next(iter(self._queues))
+            self._turn_left = self.weights.get(self._turn, 1)
+        tenant = self._turn
+        queue = self._queues[tenant]
+        task = queue.popleft()
+        self._turn_left -= 1
+        if not queue:
+            del self._queues[tenant]
+        return tenant, task
+
+    def _work(self) -> None:
+        while True:
+            with self._condition:
+                while not self._queues and not self._closed:
+                    self._condition.wait()
+                if self._closed and not self._queues:
+                    return
+                tenant, (future, func, args) = self._next()
+                self._running[tenant] = self._running.get(tenant, 0) + 1
+            try:
+                if future.set_running_or_notify_cancel():
+                    try:
+                        future.set_result(func(*args))
+                    except BaseException as e:
+                        future.set_exception(e)
+            finally:
+                with self._condition:
+                    self._running[tenant] -= 1
+                    if not self._running[tenant]:
+                        del self._running[tenant]
+
+    def queue_depths(self) -> Dict[str, Dict[str, int]]:
+        with self._condition:
+            tenants = set(self._queues) | set(self._running)
+            return {
+                tenant: {"queued": len(self._queues.get(tenant, ())), "running": self._running.get(tenant, 0)}
+                for tenant in sorted(tenants)
+            }
+
+    def status(self) -> Dict:
+        pending = self.pending
+        return {
+            "workers": self.workers,
+            "pending": pending,
+            "max_queue": self.max_queue,
+            "ready": not self._closed and pending < self.max_queue,
+        }
+
+    def shutdown(self) -> None:
+        with self._condition:
+            self._closed = True
+            for queue in self._queues.values():
+                for future, _func, _args in queue:
+                    future.cancel()
+            self._queues.clear()
+            self._condition.notify_all()
+
+
+pool = ExtractionPool()
@@ -0,0 +1,188 @@
+"""
+PDF text extraction backends.
+
+Every backend turns a PDF file into one text string per page. PyPDF2 and
+pypdfium2 (also used to render pages for OCR) are always installed. pypdf
+and pdfminer.six are optional: install whichever you want to use. Every
+backend reports a version string ("pypdfium2-4.25.0"), which is stored on
+each Document, so documents extracted by an older or weaker engine can be
+found and re-extracted later.
+
+LEXIBOX_PDF_EXTRACTOR selects the deployment default. "auto" (the default)
+picks the first installed backend in PREFERENCE order. That order comes from
+`python -m benchmarks.run --suites extraction`. On the synthetic corpus
+pypdfium2 is about 1.6x faster than PyPDF2, pypdf is slightly slower than
+PyPDF2, and pdfminer is about 6x slower; all four reproduce the text. pypdf
+still ranks above PyPDF2 because it is the maintained successor and has
+layout fixes that PyPDF2 will not get. pdfminer is the one to pick per file
+for difficult layouts.
+"""
+
+import os
+from dataclasses import dataclass
+from importlib import metadata
+from typing import Callable, Dict, List, Optional, Type
+
+# Called with (pages done, total pages) as extraction goes
+Progress = Optional[Callable[[int, int], None]]
+
+
+class ExtractorUnavailable(ValueError):
+    pass
+
+
+class EncryptedPDF(Exception):
+    pass
+
+
+@dataclass
+class ExtractionResult:
+    pages: List[str]
+    extractor_version: str
+
+    @property
+    def text(self) -> str:
+        return "\n".join(self.pages).strip()
+
+
+class Extractor:
+    name = ""
+    distribution = ""
+    module = ""
+
+    @classmethod
+    def available(cls) -> bool:
+        try:
+            __import__(cls.module)
+        except ImportError:
+            return False
+        return True
+
+    @property
+    def version(self) -> str:
+        try:
+            return f"{self.name}-{metadata.version(self.distribution)}"
+        except metadata.PackageNotFoundError:
+            return f"{self.name}-unknown"
+
+    def extract_pages(self, file_path: str, progress: Progress = None) -> List[str]:
+        raise NotImplementedError
+
+    def extract(self, file_path: str, progress: Progress = None) -> ExtractionResult:
+        return ExtractionResult(self.extract_pages(file_path, progress), self.version)
+
+
+class PyPDF2Extractor(Extractor):
+    name = "pypdf2"
+    distribution = "PyPDF2"
+    module = "PyPDF2"
+
+    def extract_pages(self, file_path: str, progress: Progress = None) -> List[str]:
+        import PyPDF2
+        with open(file_path, "rb") as file:
+            reader = PyPDF2.PdfReader(file)
+            if reader.is_encrypted:
+                raise EncryptedPDF("This PDF is password-protected and cannot be processed.")
+            total = len(reader.pages)
+            pages = []
+            for page in reader.pages:
+                pages.append(page.extract_text() or "")
+                if progress:
+                    progress(len(pages), total)
+            return pages
+
+
+class PypdfExtractor(Extractor):
+    name = "pypdf"
+    distribution = "pypdf"
+    module = "pypdf"
+
+    def extract_pages(self, file_path: str, progress: Progress = None) -> List[str]:
+        import pypdf
+        with open(file_path, "rb") as file:
+            reader = pypdf.PdfReader(file)
+            if reader.is_encrypted:
+                raise EncryptedPDF("This PDF is password-protected and cannot be processed.")
+            total = len(reader.pages)
+            pages = []
+            for page in reader.pages:
+                pages.append(page.extract_text() or "")
+                if progress:
+                    progress(len(pages), total)
+            return pages
+
+
+class PdfminerExtractor(Extractor):
+    name = "pdfminer"
+    distribution = "pdfminer.six"
+    module = "pdfminer"
+
+    def extract_pages(self, file_path: str, progress: Progress = None) -> List[str]:
+        from pdfminer.high_level import extract_text
+        from pdfminer.pdfdocument import PDFPasswordIncorrect
+        try:
+            text = extract_text(file_path)
+        except PDFPasswordIncorrect:
+            raise EncryptedPDF("This PDF is password-protected and cannot be processed.")
+        # pdfminer ends every page with a form feed
+        pages = text.split("\x0c")
+        pages = pages[:-1] if len(pages) > 1 and not pages[-1].strip() else pages
+        # Extracted in one call, so progress jumps straight to the end
+        if progress:
+            progress(len(pages), len(pages))
+        return pages
+
+
+class PdfiumExtractor(Extractor):
+    name = "pypdfium2"
+    distribution = "pypdfium2"
+    module = "pypdfium2"
+
+    def extract_pages(self, file_path: str, progress: Progress = None) -> List[str]:
+        import pypdfium2
+        try:
+            pdf = pypdfium2.PdfDocument(file_path)
+        except pypdfium2.PdfiumError as e:
+            if "password" in str(e).lower():
+                raise EncryptedPDF("This PDF is password-protected and cannot be processed.")
+            raise
+        try:
+            pages = []
+            for index in range(len(pdf)):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                pages.append(textpage.get_text_range().replace("\r\n", "\n"))
+                textpage.close()
+                page.close()
+                if progress:
+                    progress(len(pages), len(pdf))
+            return pages
+        finally:
+            pdf.close()
+
+
+EXTRACTORS: Dict[str, Type[Extractor]] = {
+    cls.name: cls for cls in (PyPDF2Extractor, PypdfExtractor, PdfminerExtractor, PdfiumExtractor)
+}
+PREFERENCE = ("pypdfium2", "pypdf", "pdfminer", "pypdf2")
+DEFAULT_EXTRACTOR = os.getenv("LEXIBOX_PDF_EXTRACTOR", "auto")
+
+_instances: Dict[str, Extractor] = {}
+
+
+def available_extractors() -> List[str]:
+    return [name for name, cls in EXTRACTORS.items() if cls.available()]
+
+
+def get_extractor(name: Optional[str] = None) -> Extractor:
+    """The named backend, or the deployment default when `name` is None"""
+    name = (name or DEFAULT_EXTRACTOR).lower()
+    if name == "auto":
+        name = next(candidate for candidate in PREFERENCE if EXTRACTORS[candidate].available())
+    if name not in EXTRACTORS:
+        raise ExtractorUnavailable(f"Unknown extractor '{name}'. Choose from: {', '.join(EXTRACTORS)}")
+    if name not in _instances:
+        if not EXTRACTORS[name].available():
+            raise ExtractorUnavailable(f"Extractor '{name}' is not installed")
+        _instances[name] = EXTRACTORS[name]()
+    return _instances[name]
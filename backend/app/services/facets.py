@@ -0,0 +1,154 @@
+"""
+Filters, sorting and facet counts for document lists.
+
+`/documents/` and `/search/` take the same filters. These are upload date
+range, filename pattern, owner, size, page count and file type (`text`, or
+`scanned` when some pages needed OCR). Each filter becomes one more condition
+in the WHERE clause, next to the user's scope and the search match.
+
+With `facets=true` the list is returned with facet counts by upload month,
+owner and file type, under the same conditions. All three are computed in
+one statement: a CTE of the matching rows, grouped three ways and combined
+with UNION ALL.
+
+The columns these read are in a covering index that starts with user_id,
+`ix_documents_user_facets`. A scope and upload date range narrow the index
+range that is scanned. The other filters and the facet counts are evaluated
+on index entries, without reading the rows, which hold the extracted text.
+Sorting by size, page count or filename uses its own (user_id, column) index.
+"""
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from fastapi import HTTPException, Query
+from sqlalchemy import case, func, literal, literal_column, select, union_all
+from sqlalchemy.orm import Session
+
+from ..models import Document, User
+
+SCOPE_PATTERN = "^(mine|organization)$"
+SORT_PATTERN = "^-?(upload_date|filename|size|pages)$"
+SORT_COLUMNS = {
+    "upload_date": Document.upload_date,
+    "filename": Document.filename,
+    "size": Document.size_bytes,
+    "pages": Document.page_count,
+}
+
+# Extraction appends "+<OCR engine>" to the extractor version when pages needed OCR
+FILE_TYPE = case(
+    (Document.extractor_version.is_(None), "unknown"),
+    (Document.extractor_version.contains("+"), "scanned"),
+    else_="text",
+)
+
+
+@dataclass
+class DocumentFilters:
+    since: Optional[datetime] = None
+    until: Optional[datetime] = None
+    filename: Optional[str] = None
+    owner_id: Optional[int] = None
+    min_size: Optional[int] = None
+    max_size: Optional[int] = None
+    min_pages: Optional[int] = None
+    max_pages: Optional[int] = None
+    file_type: Optional[str] = None
+
+    def conditions(self) -> List:
+        conditions = []
+        if self.owner_id is not None:
+            conditions.append(Document.user_id == self.owner_id)
+        if self.since is not None:
+            conditions.append(Document.upload_date >= self.since)
+        if self.until is not None:
+            conditions.append(Document.upload_date < self.until)
+        if self.filename:
+            conditions.append(Document.filename.ilike(filename_pattern(self.filename), escape="\\"))
+        if self.min_size is not None:
+            conditions.append(Document.size_bytes >= self.min_size)
+        if self.max_size is not None:
+            conditions.append(Document.size_bytes <= self.max_size)
+        if self.min_pages is not None:
+            conditions.append(Document.page_count >= self.min_pages)
+        if self.max_pages is not None:
+            conditions.append(Document.page_count <= self.max_pages)
+        if self.file_type is not None:
+            conditions.append(FILE_TYPE == self.file_type)
+        return conditions
+
+
+def filter_params(
+    since: Optional[datetime] = Query(None, description="Only documents uploaded at or after this time"),
+    until: Optional[datetime] = Query(None, description="Only documents uploaded before this time"),
+    filename: Optional[str] = Query(None, max_length=200, description="Filename pattern: * and ? are wildcards, otherwise a case-insensitive substring"),
+    owner_id: Optional[int] = Query(None, description="Only documents of this user (with scope=organization)"),
+    min_size: Optional[int] = Query(None, ge=0, description="Minimum file size in bytes"),
+    max_size: Optional[int] = Query(None, ge=0, description="Maximum file size in bytes"),
+    min_pages: Optional[int] = Query(None, ge=0, description="Minimum page count"),
+    max_pages: Optional[int] = Query(None, ge=0, description="Maximum page count"),
+    file_type: Optional[str] = Query(None, pattern="^(text|scanned)$", description="text, or scanned (some pages needed OCR)"),
+) -> DocumentFilters:
+    return DocumentFilters(since, until, filename, owner_id, min_size, max_size, min_pages, max_pages, file_type)
+
+
+def filename_pattern(pattern: str) -> str:
+    """'contract*.pdf' -> 'contract%.pdf' as an escaped LIKE pattern; without wildcards, a substring match"""
+    escaped = pattern.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    if "*" not in pattern and "?" not in pattern:
+        return f"%{escaped}%"
+    return escaped.replace("*", "%").replace("?", "_")
+
+
+def scope_condition(user: User, scope: str):
+    """Whose documents a request covers; the organization's need an org admin"""
+    if scope == "organization":
+        if not user.organization_id or not user.is_org_admin:
+            raise HTTPException(status_code=403, detail="Org admin privileges required")
+        members = select(User.id).where(User.organization_id == user.organization_id)
+        return Document.user_id.in_(members.scalar_subquery())
+    return Document.user_id == user.id
+
+
+def sort_order(sort: Optional[str]) -> List:
+    """'-size' -> [size_bytes DESC, id DESC]; ties are broken by id in the same direction"""
+    if not sort:
+        return []
+    descending = sort.startswith("-")
+    column = SORT_COLUMNS[sort.lstrip("-")]
+    if descending:
+        return [column.desc(), Document.id.desc()]
+    return [column.asc(), Document.id.asc()]
+
+
+def facet_counts(db: Session, conditions: Sequence) -> Dict:
+    """{"total": n, "facets": {"month": [...], "owner": [...], "file_type": [...]}} for the matching documents"""
+    matched = (
+        select(Document.user_id, Document.upload_date, FILE_TYPE.label("file_type"))
+        .where(*conditions)
+        .cte("matched")
+    )
+    month = func.strftime("%Y-%m", matched.c.upload_date)
+    statement = union_all(
+        select(literal("month").label("facet"), month.label("value"), literal_column("NULL").label("label"),
+               func.count().label("documents"))
+        .select_from(matched).group_by(month),
+        select(literal("owner"), matched.c.user_id, User.name, func.count())
+        .select_from(matched).join(User, User.id == matched.c.user_id).group_by(matched.c.user_id),
+        select(literal("file_type"), matched.c.file_type, literal_column("NULL"), func.count())
+        .select_from(matched).group_by(matched.c.file_type),
+    )
+
+    facets: Dict[str, List[Dict]] = {"month": [], "owner": [], "file_type": []}
+    for facet, value, label, documents in db.execute(statement):
+        entry = {"value": value, "documents": documents}
+        if facet == "owner":
+            entry["name"] = label
+        facets[facet].append(entry)
+    facets["month"].sort(key=lambda entry: entry["value"] or "", reverse=True)
+    for facet in ("owner", "file_type"):
+        facets[facet].sort(key=lambda entry: -entry["documents"])
+    total = sum(entry["documents"] for entry in facets["file_type"])
+    return {"total": total, "facets": facets}
@@ -0,0 +1,42 @@
+"""
+Keeps the derived search structures in step with the documents table.
+
+Routes call `index_document` after adding a document and `remove_documents`
+before deleting documents, in the same transaction.
+"""
+
+from typing import Sequence
+
+from sqlalchemy.orm import Session
+
+from ..log import get_logger
+from ..models import Document
+from . import near_duplicates, search_index, suggest, vector_index
+
+logger = get_logger("indexing")
+
+
+def index_document(db: Session, document: Document) -> None:
+    search_index.index_document(db, document)
+    suggest.add_documents(db, [document.id])
+    near_duplicates.sign_document(db, document)
+    try:
+        vector_index.add_document(db, document)
+    except Exception:
+        # Semantic search is best effort; build_semantic_index.py picks the document up later
+        logger.exception("semantic indexing failed", extra={"document_id": document.id})
+
+
+def remove_documents(db: Session, document_ids: Sequence[int]) -> None:
+    # Suggestions are counted from the postings, so they go first
+    suggest.remove_documents(db, document_ids)
+    search_index.remove_documents(db, document_ids)
+    near_duplicates.remove_documents(db, document_ids)
+    vector_index.remove_documents(db, document_ids)
+
+
+def reindex_document(db: Session, document: Document) -> None:
+    """Rebuild every derived structure after a document's content changed"""
+    suggest.remove_documents(db, [document.id])
+    vector_index.remove_documents(db, [document.id])
+    index_document(db, document)
@@ -0,0 +1,398 @@
+"""
+Scheduled SQLite maintenance in small, time-boxed slices.
+
+Deleting documents leaves free pages in lexibox.db and terms in the search
+dictionary that no document uses any more. Query plans also go stale once
+the tables have grown well past their last ANALYZE. Every
+LEXIBOX_MAINTENANCE_INTERVAL seconds the runner works through these tasks:
+
+    prune_terms   delete dictionary terms without postings, and their trigrams
+    vacuum        PRAGMA incremental_vacuum: return free pages to the filesystem
+    optimize      ANALYZE on first use, then PRAGMA optimize
+    checkpoint    PRAGMA wal_checkpoint(PASSIVE); TRUNCATE when nothing is left
+    integrity     PRAGMA quick_check, every LEXIBOX_MAINTENANCE_INTEGRITY_INTERVAL
+
+Each task runs in slices of at most LEXIBOX_MAINTENANCE_SLICE seconds, with
+a pause after each so the write lock is free in between. The maintenance
+connection waits only briefly for locks: a slice that would block users gives
+up and is retried after the pause. A slice is also put off while this process
+is serving more than LEXIBOX_MAINTENANCE_MAX_RPS requests per second. Set
+LEXIBOX_MAINTENANCE_WINDOW (for example "01:00-05:00", UTC) to run only at
+night. A run stops after LEXIBOX_MAINTENANCE_BUDGET seconds. Unfinished work
+is marked partial and resumed by the next run.
+
+Every run is recorded in `maintenance_runs` with each task's time and
+results, and the database and WAL sizes and free pages before and after. One
+process at a time runs maintenance: the runner holds an flock on
+`maintenance.lock`.
+
+Incremental vacuum needs auto_vacuum=INCREMENTAL. prestart.py sets it on new
+databases. Existing ones are converted once with
+`python maintain_database.py --enable-incremental-vacuum`.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, exists, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from ..database import SQLITE_BUSY_TIMEOUT, SessionLocal, engine
+from ..log import get_logger
+from ..metrics import http_requests_total, maintenance_reclaimed_bytes_total, maintenance_task_duration_seconds
+from ..models import DocumentTerm, MaintenanceRun, SearchTerm, TermTrigram
+from .reextraction import exclusive
+from .search_index import _chunks, trigrams
+
+logger = get_logger("maintenance")
+
+INTERVAL = float(os.getenv("LEXIBOX_MAINTENANCE_INTERVAL", "3600"))
+BUDGET = float(os.getenv("LEXIBOX_MAINTENANCE_BUDGET", "30"))
+SLICE = float(os.getenv("LEXIBOX_MAINTENANCE_SLICE", "0.2"))
+PAUSE = float(os.getenv("LEXIBOX_MAINTENANCE_PAUSE", "0.3"))
+MAX_RPS = float(os.getenv("LEXIBOX_MAINTENANCE_MAX_RPS", "5"))
+WINDOW = os.getenv("LEXIBOX_MAINTENANCE_WINDOW", "")
+INTEGRITY_INTERVAL = float(os.getenv("LEXIBOX_MAINTENANCE_INTEGRITY_INTERVAL", "86400"))
+LOCK_PATH = os.getenv("LEXIBOX_MAINTENANCE_LOCK", "maintenance.lock")
+# Free pages returned per incremental_vacuum statement, and dictionary terms checked per prune transaction
+VACUUM_STEP = 256
+PRUNE_STEP = 500
+# Rows ANALYZE samples per index; bounds how long it takes on large tables
+ANALYSIS_LIMIT = 1000
+# The maintenance connection gives a slice up rather than wait longer than this for a lock
+BUSY_TIMEOUT_MS = 50
+POLL_INTERVAL = 60.0
+KEEP_RUNS = 200
+
+
+def _parse_window(value: str) -> Optional[Tuple[int, int]]:
+    """"01:00-05:00" -> (60, 300) in minutes after midnight UTC"""
+    if not value:
+        return None
+    start, _, end = value.partition("-")
+    minutes = []
+    for part in (start, end):
+        hours, _, mins = part.strip().partition(":")
+        minutes.append(int(hours) * 60 + int(mins or 0))
+    return minutes[0], minutes[1]
+
+
+def in_window(now: Optional[datetime] = None, window: str = WINDOW) -> bool:
+    bounds = _parse_window(window)
+    if bounds is None:
+        return True
+    now = now or datetime.utcnow()
+    minute = now.hour * 60 + now.minute
+    start, end = bounds
+    # A window such as 22:00-04:00 wraps past midnight
+    return start <= minute < end if start <= end else minute >= start or minute < end
+
+
+@contextmanager
+def _connection() -> Iterator[Connection]:
+    """A connection outside any transaction that waits only briefly for locks"""
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.exec_driver_sql(f"PRAGMA busy_timeout={BUSY_TIMEOUT_MS}")
+        try:
+            yield conn
+        finally:
+            # The connection goes back to the pool for request handlers
+            conn.exec_driver_sql(f"PRAGMA busy_timeout={int(SQLITE_BUSY_TIMEOUT * 1000)}")
+
+
+def _pragma(conn: Connection, name: str) -> int:
+    return conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def database_status(conn: Connection) -> Dict:
+    """File size, free pages and WAL size of the database"""
+    page_size, page_count = _pragma(conn, "page_size"), _pragma(conn, "page_count")
+    path = engine.url.database
+    wal = f"{path}-wal" if path else None
+    return {
+        "bytes": page_size * page_count,
+        "pages": page_count,
+        "free_pages": _pragma(conn, "freelist_count"),
+        "page_size": page_size,
+        "wal_bytes": os.path.getsize(wal) if wal and os.path.exists(wal) else 0,
+        "auto_vacuum": {0: "none", 1: "full", 2: "incremental"}.get(_pragma(conn, "auto_vacuum")),
+    }
+
+
+# Tasks: each works until `deadline` (time.perf_counter()) and returns True once it has nothing left to do
+
+def prune_terms(conn: Connection, deadline: float, state: Dict, result: Dict) -> bool:
+    """Delete dictionary terms no document contains any more, with their trigrams"""
+    cursor = state.get("term_cursor", 0)
+    while time.perf_counter() < deadline:
+        # Take the write lock first, so no upload can start using a term between the check and the delete
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        try:
+            last = conn.execute(
+                select(SearchTerm.id).where(SearchTerm.id > cursor).order_by(SearchTerm.id)
+                .offset(PRUNE_STEP - 1).limit(1)
+            ).scalar()
+            in_range = [SearchTerm.id > cursor] + ([SearchTerm.id <= last] if last is not None else [])
+            orphans = conn.execute(
+                select(SearchTerm.id, SearchTerm.term)
+                .where(*in_range, ~exists().where(DocumentTerm.term_id == SearchTerm.id))
+            ).all()
+            # One primary key lookup per trigram
+            pairs = [{"gram": gram, "term": term_id} for term_id, term in orphans for gram in trigrams(term)]
+            if pairs:
+                conn.execute(delete(TermTrigram).where(TermTrigram.trigram == bindparam("gram"),
+                                                       TermTrigram.term_id == bindparam("term")), pairs)
+            for chunk in _chunks([term_id for term_id, _ in orphans]):
+                conn.execute(delete(SearchTerm).where(SearchTerm.id.in_(chunk)))
+            conn.exec_driver_sql("COMMIT")
+        except BaseException:
+            conn.exec_driver_sql("ROLLBACK")
+            raise
+        result["terms_removed"] = result.get("terms_removed", 0) + len(orphans)
+        if last is None:
+            state["term_cursor"] = 0
+            return True
+        cursor = state["term_cursor"] = last
+    return False
+
+
+def vacuum(conn: Connection, deadline: float, state: Dict, result: Dict) -> bool:
+    """Move free pages to the end of the file and truncate it"""
+    if _pragma(conn, "auto_vacuum") != 2:
+        result["skipped"] = "auto_vacuum is not incremental"
+        return True
+    while time.perf_counter() < deadline:
+        free = _pragma(conn, "freelist_count")
+        if free == 0:
+            return True
+        conn.exec_driver_sql(f"PRAGMA incremental_vacuum({VACUUM_STEP})")
+        result["pages_freed"] = result.get("pages_freed", 0) + free - _pragma(conn, "freelist_count")
+    return False
+
+
+def optimize(conn: Connection, deadline: float, state: Dict, result: Dict) -> bool:
+    """Refresh the statistics the query planner uses"""
+    conn.exec_driver_sql(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+    analyzed = conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").first()
+    # PRAGMA optimize only re-analyzes tables that were analyzed before and changed a lot since
+    conn.exec_driver_sql("PRAGMA optimize" if analyzed else "ANALYZE")
+    result["mode"] = "optimize" if analyzed else "analyze"
+    return True
+
+
+def checkpoint(conn: Connection, deadline: float, state: Dict, result: Dict) -> bool:
+    """Copy the WAL back into the database, and truncate it once it is fully copied"""
+    busy, frames, copied = conn.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").one()
+    result.update(wal_frames=frames, checkpointed=copied)
+    if frames > 0 and not busy and copied == frames:
+        busy, _frames, _copied = conn.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").one()
+        result["truncated"] = not busy
+    return True
+
+
+def integrity(conn: Connection, deadline: float, state: Dict, result: Dict) -> bool:
+    """PRAGMA quick_check; read-only, but not sliced: it runs to the end"""
+    problems = [row[0] for row in conn.exec_driver_sql("PRAGMA quick_check(10)")]
+    result["result"] = "ok" if problems == ["ok"] else "; ".join(problems)
+    return True
+
+
+TASKS: List[Tuple[str, Callable]] = [
+    ("prune_terms", prune_terms),
+    ("vacuum", vacuum),
+    ("optimize", optimize),
+    ("checkpoint", checkpoint),
+]
+
+
+class _Traffic:
+    """Requests per second served by this process, measured over at least a second"""
+
+    def __init__(self):
+        self._since = (time.monotonic(), http_requests_total.total())
+        self._busy = False
+
+    def busy(self) -> bool:
+        if MAX_RPS <= 0:
+            return False
+        now, total = time.monotonic(), http_requests_total.total()
+        then, before = self._since
+        if now - then >= 1.0:
+            self._busy = (total - before) / (now - then) > MAX_RPS
+            self._since = (now, total)
+        return self._busy
+
+
+def _integrity_due(db: Session) -> bool:
+    if INTEGRITY_INTERVAL <= 0:
+        return False
+    last = db.execute(
+        select(MaintenanceRun.started_at).where(MaintenanceRun.integrity.is_not(None))
+        .order_by(MaintenanceRun.id.desc()).limit(1)
+    ).scalar()
+    return last is None or last.replace(tzinfo=None) < datetime.utcnow() - timedelta(seconds=INTEGRITY_INTERVAL)
+
+
+def run_summary(run: MaintenanceRun) -> Dict:
+    return {
+        "id": run.id,
+        "status": run.status,
+        "seconds": run.seconds,
+        "reclaimed_bytes": run.reclaimed_bytes,
+        "database_bytes": {"before": run.database_bytes_before, "after": run.database_bytes_after},
+        "wal_bytes": {"before": run.wal_bytes_before, "after": run.wal_bytes_after},
+        "free_pages": {"before": run.free_pages_before, "after": run.free_pages_after},
+        "integrity": run.integrity,
+        "tasks": run.tasks,
+        "error": run.error,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+    }
+
+
+def run_maintenance(budget: float = BUDGET, stop: Optional[threading.Event] = None, state: Optional[Dict] = None,
+                    check_integrity: Optional[bool] = None, slice_seconds: float = SLICE,
+                    pause: float = PAUSE) -> Dict:
+    """One maintenance pass within `budget` seconds; recorded in maintenance_runs"""
+    stop = stop or threading.Event()
+    state = state if state is not None else {}
+    started = time.perf_counter()
+    deadline = started + budget
+    db = SessionLocal()
+    try:
+        if check_integrity is None:
+            check_integrity = _integrity_due(db)
+        run = MaintenanceRun(status="running")
+        db.add(run)
+        db.commit()
+        tasks = TASKS + ([("integrity", integrity)] if check_integrity else [])
+        report: Dict[str, Dict] = {}
+        status = "completed"
+        traffic = _Traffic()
+        with _connection() as conn:
+            before = database_status(conn)
+            try:
+                for position, (name, task) in enumerate(tasks):
+                    # Each task gets a fair share of what is left, so one long task cannot starve the others
+                    task_deadline = time.perf_counter() + (deadline - time.perf_counter()) / (len(tasks) - position)
+                    result = report[name] = {"slices": 0, "seconds": 0.0, "finished": False}
+                    while not result["finished"]:
+                        now = time.perf_counter()
+                        if stop.is_set() or now >= task_deadline:
+                            status = "partial"
+                            break
+                        if traffic.busy():
+                            result["deferred"] = result.get("deferred", 0) + 1
+                            time.sleep(pause)
+                            continue
+                        try:
+                            result["finished"] = task(conn, min(task_deadline, now + slice_seconds), state, result)
+                        except OperationalError as e:
+                            # Locked by user traffic: give the slice up and retry after the pause
+                            if "locked" not in str(e) and "busy" not in str(e):
+                                raise
+                            result["busy"] = result.get("busy", 0) + 1
+                        result["slices"] += 1
+                        result["seconds"] += time.perf_counter() - now
+                        if not result["finished"]:
+                            time.sleep(pause)
+                    result["seconds"] = round(result["seconds"], 3)
+                    maintenance_task_duration_seconds.observe(result["seconds"], task=name)
+            except Exception as e:
+                status = "failed"
+                run.error = str(e)
+                logger.exception("maintenance failed", extra={"run_id": run.id})
+            after = database_status(conn)
+
+        reclaimed = max(0, before["bytes"] - after["bytes"])
+        maintenance_reclaimed_bytes_total.inc(reclaimed)
+        run.status = status
+        run.tasks = report
+        run.seconds = round(time.perf_counter() - started, 3)
+        run.database_bytes_before, run.database_bytes_after = before["bytes"], after["bytes"]
+        run.wal_bytes_before, run.wal_bytes_after = before["wal_bytes"], after["wal_bytes"]
+        run.free_pages_before, run.free_pages_after = before["free_pages"], after["free_pages"]
+        run.reclaimed_bytes = reclaimed
+        if "integrity" in report:
+            run.integrity = report["integrity"].get("result")
+        run.finished_at = datetime.utcnow()
+        db.commit()
+        db.execute(delete(MaintenanceRun).where(MaintenanceRun.id <= run.id - KEEP_RUNS))
+        db.commit()
+        log = logger.error if run.integrity not in (None, "ok") else logger.info
+        log("maintenance finished", extra={"run_id": run.id, "status": status, "seconds": run.seconds,
+                                           "reclaimed_bytes": reclaimed, "integrity": run.integrity})
+        return run_summary(run)
+    finally:
+        db.close()
+
+
+def progress(db: Session) -> Dict:
+    """Database file status and the last maintenance run, for admin stats"""
+    last = db.query(MaintenanceRun).order_by(MaintenanceRun.id.desc()).first()
+    with engine.connect() as conn:
+        status = database_status(conn)
+    return {"database": status, "last_run": run_summary(last) if last else None,
+            "interval": INTERVAL, "window": WINDOW or None}
+
+
+def recent_runs(db: Session, limit: int = 20) -> List[Dict]:
+    return [run_summary(run) for run in db.query(MaintenanceRun).order_by(MaintenanceRun.id.desc()).limit(limit)]
+
+
+class Runner:
+    """Runs maintenance every `interval` seconds on a daemon thread, in one process at a time"""
+
+    def __init__(self, lock_path: str = LOCK_PATH, interval: float = INTERVAL):
+        self.lock_path = lock_path
+        self.interval = interval
+        # Carried between runs, so a partial run resumes where it stopped
+        self.state: Dict = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._guard = threading.Lock()
+
+    def ensure_running(self) -> None:
+        if self.interval <= 0 or engine.dialect.name != "sqlite":
+            return
+        with self._guard:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="maintenance", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _due(self) -> bool:
+        db = SessionLocal()
+        try:
+            last = db.execute(select(MaintenanceRun.started_at).order_by(MaintenanceRun.id.desc()).limit(1)).scalar()
+        finally:
+            db.close()
+        # Recorded runs survive restarts, so a restart does not trigger a run by itself
+        return last is None or last.replace(tzinfo=None) <= datetime.utcnow() - timedelta(seconds=self.interval)
+
+    def _run(self) -> None:
+        # Another process holding the lock runs maintenance
+        with exclusive(self.lock_path) as acquired:
+            while acquired and not self._stop.is_set():
+                try:
+                    if in_window() and self._due():
+                        run_maintenance(stop=self._stop, state=self.state)
+                except Exception:
+                    logger.exception("maintenance run failed")
+                self._stop.wait(min(POLL_INTERVAL, self.interval))
+
+
+runner = Runner()
@@ -0,0 +1,140 @@
+"""
+Near-duplicate detection with MinHash and locality-sensitive hashing.
+
+A document's text is cut into overlapping word shingles. Its signature is the
+minimum of NUM_PERMUTATIONS independent hash functions over those shingles;
+the fraction of positions where two signatures agree estimates the Jaccard
+similarity of the two shingle sets.
+
+The signature is split into BANDS bands of ROWS values. Each band is hashed
+into a bucket row, so finding candidates for a new document is one indexed
+lookup per band, whatever the corpus size. Two documents with Jaccard
+similarity s share at least one bucket with probability 1 - (1 - s^ROWS)^BANDS.
+With 16 bands of 8 rows that is about 0.1% at s = 0.3, 61% at s = 0.7, 95%
+at s = 0.8 and over 99.9% at s = 0.9.
+"""
+
+import hashlib
+import os
+import zlib
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import and_, delete, or_, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..models import Document, DocumentSignature, LshBucket
+from .search_index import tokenize
+
+NUM_PERMUTATIONS = 128
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+SHINGLE_WORDS = 5
+
+# Estimated Jaccard similarity at which documents count as near-duplicates
+DEFAULT_THRESHOLD = float(os.getenv("LEXIBOX_DUPLICATE_THRESHOLD", "0.8"))
+
+# Multiply-shift hashing: h(x) = ((a * x + b) mod 2^64) >> 32 with odd a
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(1, 2 ** 63, size=NUM_PERMUTATIONS, dtype=np.uint64) | np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, size=NUM_PERMUTATIONS, dtype=np.uint64)
+_EMPTY = np.full(NUM_PERMUTATIONS, np.iinfo(np.uint32).max, dtype=np.uint32)
+
+
+def shingles(text: str, size: int = SHINGLE_WORDS) -> List[str]:
+    words = tokenize(text)
+    if len(words) <= size:
+        return [" ".join(words)] if words else []
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def minhash(text: str) -> np.ndarray:
+    """NUM_PERMUTATIONS uint32 minimums over the text's shingles"""
+    items = {zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text)}
+    if not items:
+        return _EMPTY.copy()
+    values = np.fromiter(items, dtype=np.uint64, count=len(items))
+    hashed = (values[:, None] * _A[None, :] + _B[None, :]) >> np.uint64(32)
+    return hashed.min(axis=0).astype(np.uint32)
+
+
+def band_buckets(signature: np.ndarray) -> List[int]:
+    """One signed 64-bit bucket id per band"""
+    return [
+        int.from_bytes(hashlib.blake2b(signature[band * ROWS:(band + 1) * ROWS].tobytes(),
+                                       digest_size=8).digest(), "big", signed=True)
+        for band in range(BANDS)
+    ]
+
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    if np.array_equal(a, _EMPTY) or np.array_equal(b, _EMPTY):
+        return 0.0
+    return float(np.count_nonzero(a == b)) / NUM_PERMUTATIONS
+
+
+def _load(blob: bytes) -> np.ndarray:
+    return np.frombuffer(blob, dtype=np.uint32)
+
+
+def sign_document(db: Session, document: Document) -> np.ndarray:
+    """Store the document's signature and LSH buckets; the caller commits"""
+    signature = minhash(document.content)
+    db.execute(delete(LshBucket).where(LshBucket.document_id == document.id))
+    db.execute(
+        sqlite_insert(DocumentSignature)
+        .values(document_id=document.id, user_id=document.user_id, minhash=signature.tobytes())
+        .on_conflict_do_update(index_elements=["document_id"],
+                               set_={"user_id": document.user_id, "minhash": signature.tobytes()})
+    )
+    if not np.array_equal(signature, _EMPTY):
+        db.execute(
+            sqlite_insert(LshBucket).on_conflict_do_nothing(),
+            [{"user_id": document.user_id, "band": band, "bucket": bucket, "document_id": document.id}
+             for band, bucket in enumerate(band_buckets(signature))],
+        )
+    return signature
+
+
+def remove_documents(db: Session, document_ids: Sequence[int]) -> None:
+    """Drop signatures and buckets of deleted documents; the caller commits"""
+    ids = list(document_ids)
+    for start in range(0, len(ids), 500):
+        chunk = ids[start:start + 500]
+        db.execute(delete(LshBucket).where(LshBucket.document_id.in_(chunk)))
+        db.execute(delete(DocumentSignature).where(DocumentSignature.document_id.in_(chunk)))
+
+
+def find_similar(db: Session, document: Document, threshold: float = DEFAULT_THRESHOLD,
+                 limit: int = 20, signature: Optional[np.ndarray] = None) -> List[Tuple[Document, float]]:
+    """Documents of the same user whose estimated similarity is at least `threshold`, best first"""
+    if signature is None:
+        stored = db.get(DocumentSignature, document.id)
+        signature = _load(stored.minhash) if stored else minhash(document.content)
+    if np.array_equal(signature, _EMPTY):
+        return []
+
+    bands = [and_(LshBucket.band == band, LshBucket.bucket == bucket)
+             for band, bucket in enumerate(band_buckets(signature))]
+    candidates = set(db.execute(
+        select(LshBucket.document_id).where(LshBucket.user_id == document.user_id, or_(*bands))
+    ).scalars())
+    candidates.discard(document.id)
+    if not candidates:
+        return []
+
+    scored = []
+    for document_id, blob in db.execute(
+        select(DocumentSignature.document_id, DocumentSignature.minhash)
+        .where(DocumentSignature.document_id.in_(candidates))
+    ):
+        score = similarity(signature, _load(blob))
+        if score >= threshold:
+            scored.append((document_id, score))
+    scored.sort(key=lambda item: item[1], reverse=True)
+    scored = scored[:limit]
+
+    documents = {doc.id: doc for doc in db.query(Document).filter(Document.id.in_([doc_id for doc_id, _ in scored]))}
+    return [(documents[doc_id], round(score, 4)) for doc_id, score in scored if doc_id in documents]
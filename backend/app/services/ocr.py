@@ -0,0 +1,166 @@
+"""
+OCR fallback for pages without a text layer.
+
+Scanned PDFs extract to empty or near-empty pages. After normal extraction,
+pages with fewer than MIN_TEXT_CHARS characters are rendered with pypdfium2
+and passed to the `tesseract` command-line tool.
+
+All OCR runs on its own process pool of LEXIBOX_OCR_WORKERS processes
+(default: half the cores, divided between API worker processes), at a lower
+scheduling priority. A large scan therefore queues behind itself and cannot
+take every core from ordinary extraction or from requests. Each task renders
+and recognizes one page, so the pages of a document are rendered in parallel.
+
+Results are cached on disk by a hash of the rendered page image, the
+resolution and the language. Re-extracting a document, or uploading the same
+scan again, skips Tesseract for every page it has already seen.
+
+OCR is enabled when LEXIBOX_OCR is "auto" (the default) and both pypdfium2
+and the tesseract binary are installed. Set it to "off" to disable it.
+"""
+
+import hashlib
+import os
+import shutil
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+import multiprocessing
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+OCR_MODE = os.getenv("LEXIBOX_OCR", "auto").lower()
+# Half the cores, shared between the API worker processes
+_WEB_WORKERS = max(1, int(os.getenv("LEXIBOX_WEB_WORKERS", "1")))
+OCR_WORKERS = int(os.getenv("LEXIBOX_OCR_WORKERS", str(max(1, (os.cpu_count() or 2) // 2 // _WEB_WORKERS))))
+OCR_LANGUAGE = os.getenv("LEXIBOX_OCR_LANGUAGE", "eng")
+OCR_DPI = int(os.getenv("LEXIBOX_OCR_DPI", "300"))
+OCR_TIMEOUT = float(os.getenv("LEXIBOX_OCR_TIMEOUT", "120"))
+OCR_MAX_PAGES = int(os.getenv("LEXIBOX_OCR_MAX_PAGES", "500"))
+OCR_CACHE_DIR = os.getenv("LEXIBOX_OCR_CACHE_DIR", "ocr_cache")
+# Pages with less extracted text than this are treated as having no text layer
+MIN_TEXT_CHARS = int(os.getenv("LEXIBOX_OCR_MIN_CHARS", "20"))
+UNAVAILABLE = "ocr-unavailable"
+
+
+@lru_cache(maxsize=1)
+def tesseract_version() -> Optional[str]:
+    binary = shutil.which("tesseract")
+    if not binary:
+        return None
+    try:
+        output = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    first_line = (output.stdout or output.stderr).strip().splitlines()[:1]
+    parts = first_line[0].split() if first_line else []
+    return f"tesseract-{parts[1] if len(parts) > 1 else 'unknown'}"
+
+
+def available() -> bool:
+    if OCR_MODE == "off":
+        return False
+    try:
+        import pypdfium2  # noqa: F401
+    except ImportError:
+        return False
+    return tesseract_version() is not None
+
+
+def needs_ocr(pages: Sequence[str]) -> List[int]:
+    """Indexes of pages that look like they have no text layer"""
+    return [index for index, text in enumerate(pages) if len(text.strip()) < MIN_TEXT_CHARS][:OCR_MAX_PAGES]
+
+
+def _cache_path(key: str) -> str:
+    return os.path.join(OCR_CACHE_DIR, key[:2], f"{key}.txt")
+
+
+def _ocr_page(file_path: str, index: int, dpi: int, language: str, timeout: float) -> Tuple[int, str, str]:
+    """Worker: render one page, OCR it unless cached. Returns (index, text, outcome)"""
+    import pypdfium2
+
+    pdf = pypdfium2.PdfDocument(file_path)
+    try:
+        page = pdf[index]
+        bitmap = page.render(scale=dpi / 72, grayscale=True)
+        pixels = bitmap.to_numpy()
+        page.close()
+    finally:
+        pdf.close()
+
+    height, width = pixels.shape[:2]
+    raw = pixels.tobytes()
+    key = hashlib.blake2b(raw + f"|{width}x{height}|{dpi}|{language}".encode(), digest_size=20).hexdigest()
+    path = _cache_path(key)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return index, f.read(), "hit"
+
+    # Portable graymap: understood by Tesseract without an imaging library
+    image = f"P5 {width} {height} 255\n".encode() + raw
+    result = subprocess.run(["tesseract", "stdin", "stdout", "-l", language],
+                            input=image, capture_output=True, timeout=timeout)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.decode("utf-8", "replace").strip() or "tesseract failed")
+    text = result.stdout.decode("utf-8", "replace")
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+    return index, text, "miss"
+
+
+def _lower_priority() -> None:
+    try:
+        os.nice(10)
+    except OSError:
+        pass
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: the API process has threads, which fork does not copy safely
+        _pool = ProcessPoolExecutor(max_workers=OCR_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+                                    initializer=_lower_priority)
+    return _pool
+
+
+def shutdown() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def ocr_pages(file_path: str, indexes: Sequence[int],
+              progress: Optional[Callable[[int, int], None]] = None) -> Dict[int, str]:
+    """OCR the given pages in parallel on the pool; pages that fail are left out"""
+    from ..log import get_logger
+    from ..metrics import record_ocr
+
+    logger = get_logger("ocr")
+    pool = get_pool()
+    path = os.path.abspath(file_path)
+    started = {index: time.perf_counter() for index in indexes}
+    futures = [pool.submit(_ocr_page, path, index, OCR_DPI, OCR_LANGUAGE, OCR_TIMEOUT) for index in indexes]
+    texts = {}
+    for done, (index, future) in enumerate(zip(indexes, futures), start=1):
+        try:
+            page_index, text, outcome = future.result()
+        except Exception as e:
+            record_ocr("error", time.perf_counter() - started[index])
+            logger.warning("ocr failed", extra={"page": index, "error": str(e)})
+            continue
+        finally:
+            if progress:
+                progress(done, len(indexes))
+        record_ocr(outcome, time.perf_counter() - started[page_index])
+        texts[page_index] = text
+    return texts
@@ -1,24 +1,51 @@
 import PyPDF2
 import os
+import time
+from typing import Optional
+from ..metrics import record_extraction
+from .extractors import ExtractionResult, Progress, get_extractor
+from . import ocr
+from .storage import get_storage
 
-def extract_text_from_pdf(file_path: str) -> str:
+def extract_document(file_path: str, extractor: Optional[str] = None, progress: Progress = None,
+                     ocr_progress: Progress = None) -> ExtractionResult:
     """
-    Extract text from a PDF file using PyPDF2
+    Extract per-page text from a PDF file with the given (or the default) extractor.
+    `progress` and `ocr_progress` are called with (done, total) pages as each stage goes.
     """
+    backend = get_extractor(extractor)
     try:
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            if pdf_reader.is_encrypted:
-                raise Exception("This PDF is password-protected and cannot be processed.")
-            text = ""
-            
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            
-            return text.strip()
+        start = time.perf_counter()
+        result = backend.extract(file_path, progress)
+        record_extraction(time.perf_counter() - start, len(result.pages))
     except Exception as e:
         raise Exception(f"Error extracting text from PDF: {str(e)}")
 
+    # Scanned pages: fall back to OCR, and record it in the version
+    blank = ocr.needs_ocr(result.pages)
+    if blank:
+        if ocr.available():
+            for index, text in ocr.ocr_pages(file_path, blank, ocr_progress).items():
+                if len(text.strip()) > len(result.pages[index].strip()):
+                    result.pages[index] = text
+            result.extractor_version += f"+{ocr.tesseract_version()}"
+        else:
+            result.extractor_version += f"+{ocr.UNAVAILABLE}"
+    return result
+
+def extract_stored_document(key: str, extractor: Optional[str] = None) -> ExtractionResult:
+    """
+    Extract a PDF kept in storage under `key` (Document.file_path)
+    """
+    with get_storage().local_path(key) as file_path:
+        return extract_document(file_path, extractor)
+
+def extract_text_from_pdf(file_path: str, extractor: Optional[str] = None) -> str:
+    """
+    Extract text from a PDF file
+    """
+    return extract_document(file_path, extractor).text
+
 def is_valid_pdf(file_path: str) -> bool:
     """
     Check if a file is a valid PDF
@@ -0,0 +1,326 @@
+"""
+Search query language.
+
+    indemnification AND NOT arbitration
+    "force majeure" OR "act of god"
+    indemn* filename:lease
+    (termination OR renewal) -draft
+
+Words are matched against the term index, `word*` is a prefix match, quoted
+text is a phrase, `filename:` filters on the file name (`*` wildcards allowed),
+and adjacent terms are ANDed. NOT and a leading `-` negate.
+
+A query compiles to one SQL WHERE clause. Before compiling, the planner looks
+up how many documents contain each term and uses it to drop branches that
+cannot match and to order AND operands so the most selective postings are
+evaluated first and full-text checks (phrases, filename patterns) last.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Union
+
+from sqlalchemy import and_, false, func, not_, or_, select, true, event
+from sqlalchemy.orm import Session
+
+from ..database import engine
+from ..models import Document, DocumentTerm, SearchTerm
+from .search_index import tokenize
+
+MAX_CLAUSES = 32
+FIELDS = ("filename",)
+
+# Relative costs for operands that cannot be answered from postings
+SCAN_COST = 10 ** 9
+
+
+class QuerySyntaxError(ValueError):
+    pass
+
+
+@dataclass
+class Term:
+    word: str
+    prefix: bool = False
+
+
+@dataclass
+class Phrase:
+    words: List[str]
+
+
+@dataclass
+class FieldMatch:
+    name: str
+    value: str
+
+
+@dataclass
+class Not:
+    child: "Node"
+
+
+@dataclass
+class And:
+    children: List["Node"] = field(default_factory=list)
+
+
+@dataclass
+class Or:
+    children: List["Node"] = field(default_factory=list)
+
+
+Node = Union[Term, Phrase, FieldMatch, Not, And, Or]
+
+_TOKEN = re.compile(r'\s*(?:(?P<lparen>\()|(?P<rparen>\))|"(?P<phrase>[^"]*)"?|(?P<word>[^\s()"]+))')
+
+
+def _lex(query: str) -> List[tuple]:
+    tokens = []
+    position = 0
+    query = query.strip()
+    while position < len(query):
+        match = _TOKEN.match(query, position)
+        if not match or match.end() == position:
+            raise QuerySyntaxError(f"Unexpected character at position {position}")
+        position = match.end()
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, query: str):
+        self.tokens = _lex(query)
+        self.position = 0
+        self.clauses = 0
+
+    def _peek(self) -> Optional[tuple]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _keyword(self, word: str) -> bool:
+        token = self._peek()
+        if token and token[0] == "word" and token[1] == word:
+            self.position += 1
+            return True
+        return False
+
+    def parse(self) -> Node:
+        if not self.tokens:
+            raise QuerySyntaxError("Empty query")
+        node = self._or()
+        if self._peek() is not None:
+            raise QuerySyntaxError(f"Unexpected '{self._peek()[1]}'")
+        return node
+
+    def _or(self) -> Node:
+        children = [self._and()]
+        while self._keyword("OR"):
+            children.append(self._and())
+        return children[0] if len(children) == 1 else Or(children)
+
+    def _and(self) -> Node:
+        children = [self._unary()]
+        while True:
+            token = self._peek()
+            if token is None or token[0] == "rparen" or token == ("word", "OR"):
+                break
+            self._keyword("AND")
+            children.append(self._unary())
+        return children[0] if len(children) == 1 else And(children)
+
+    def _unary(self) -> Node:
+        if self._keyword("NOT"):
+            return Not(self._unary())
+        token = self._peek()
+        if token and token[0] == "word" and token[1].startswith("-") and len(token[1]) > 1:
+            self.tokens[self.position] = ("word", token[1][1:])
+            return Not(self._atom())
+        return self._atom()
+
+    def _atom(self) -> Node:
+        token = self._peek()
+        if token is None:
+            raise QuerySyntaxError("Query ends unexpectedly")
+        kind, value = token
+        self.position += 1
+        self.clauses += 1
+        if self.clauses > MAX_CLAUSES:
+            raise QuerySyntaxError(f"Queries are limited to {MAX_CLAUSES} terms")
+
+        if kind == "lparen":
+            node = self._or()
+            if not self._peek() or self._peek()[0] != "rparen":
+                raise QuerySyntaxError("Missing closing parenthesis")
+            self.position += 1
+            return node
+        if kind == "rparen":
+            raise QuerySyntaxError("Unexpected ')'")
+        if kind == "phrase":
+            return self._phrase(value)
+        if value in ("AND", "OR", "NOT"):
+            raise QuerySyntaxError(f"Unexpected operator '{value}'")
+
+        name, sep, rest = value.partition(":")
+        if sep and name.lower() in FIELDS:
+            if not rest:
+                following = self._peek()
+                if following is None or following[0] != "phrase":
+                    raise QuerySyntaxError(f"Missing value for {name}:")
+                self.position += 1
+                rest = following[1]
+            return FieldMatch(name.lower(), rest)
+
+        prefix = value.endswith("*")
+        words = tokenize(value.rstrip("*"))
+        if not words:
+            raise QuerySyntaxError(f"'{value}' contains no searchable characters")
+        if len(words) > 1:
+            # "non-compete" and similar split into several terms: match them as a phrase
+            return Phrase(words)
+        return Term(words[0], prefix=prefix)
+
+    @staticmethod
+    def _phrase(text: str) -> Node:
+        words = tokenize(text)
+        if not words:
+            raise QuerySyntaxError("Empty phrase")
+        return Term(words[0]) if len(words) == 1 else Phrase(words)
+
+
+def parse_query(query: str) -> Node:
+    return _Parser(query).parse()
+
+
+def _prefix_upper_bound(prefix: str) -> str:
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _prefix_condition(prefix: str):
+    return and_(SearchTerm.term >= prefix, SearchTerm.term < _prefix_upper_bound(prefix))
+
+
+@event.listens_for(engine, "connect")
+def _register_sql_functions(dbapi_connection, connection_record):
+    def phrase_match(content, phrase):
+        return phrase in f" {' '.join(tokenize(content or ''))} "
+    dbapi_connection.create_function("lexibox_phrase", 2, phrase_match, deterministic=True)
+
+
+class QueryPlanner:
+    """Estimates operand cost from document frequencies and compiles to SQL"""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.frequencies: Dict[tuple, int] = {}
+
+    def _collect(self, node: Node, terms: set, prefixes: set) -> None:
+        if isinstance(node, Term):
+            (prefixes if node.prefix else terms).add(node.word)
+        elif isinstance(node, Phrase):
+            terms.update(node.words)
+        elif isinstance(node, Not):
+            self._collect(node.child, terms, prefixes)
+        elif isinstance(node, (And, Or)):
+            for child in node.children:
+                self._collect(child, terms, prefixes)
+
+    def load_statistics(self, node: Node) -> None:
+        terms, prefixes = set(), set()
+        self._collect(node, terms, prefixes)
+        if terms:
+            rows = self.db.execute(
+                select(SearchTerm.term, func.count(DocumentTerm.document_id))
+                .join(DocumentTerm, DocumentTerm.term_id == SearchTerm.id)
+                .where(SearchTerm.term.in_(terms))
+                .group_by(SearchTerm.term)
+            ).all()
+            counts = dict(rows)
+            for term in terms:
+                self.frequencies[("term", term)] = counts.get(term, 0)
+        for prefix in prefixes:
+            self.frequencies[("prefix", prefix)] = self.db.execute(
+                select(func.count(DocumentTerm.document_id))
+                .join(SearchTerm, DocumentTerm.term_id == SearchTerm.id)
+                .where(_prefix_condition(prefix))
+            ).scalar_one()
+
+    def cost(self, node: Node) -> int:
+        """Upper bound on matching documents; SCAN_COST for row-by-row checks"""
+        if isinstance(node, Term):
+            return self.frequencies.get(("prefix" if node.prefix else "term", node.word), 0)
+        if isinstance(node, Phrase):
+            return min(self.frequencies.get(("term", word), 0) for word in node.words)
+        if isinstance(node, (FieldMatch, Not)):
+            return SCAN_COST
+        if isinstance(node, And):
+            return min(self.cost(child) for child in node.children)
+        if isinstance(node, Or):
+            return min(SCAN_COST, sum(self.cost(child) for child in node.children))
+        raise TypeError(node)
+
+    def _rank(self, node: Node) -> tuple:
+        # Cheap postings lookups first, then negations, then full-text checks
+        if isinstance(node, Phrase):
+            return (2, self.cost(node))
+        if isinstance(node, FieldMatch):
+            return (3, 0)
+        if isinstance(node, Not):
+            return (1, 0)
+        return (0, self.cost(node))
+
+    def compile(self, node: Node):
+        if isinstance(node, Term):
+            if self.cost(node) == 0:
+                return false()
+            if node.prefix:
+                postings = (
+                    select(DocumentTerm.document_id)
+                    .join(SearchTerm, DocumentTerm.term_id == SearchTerm.id)
+                    .where(_prefix_condition(node.word))
+                )
+            else:
+                term_id = select(SearchTerm.id).where(SearchTerm.term == node.word).scalar_subquery()
+                postings = select(DocumentTerm.document_id).where(DocumentTerm.term_id == term_id)
+            return Document.id.in_(postings)
+
+        if isinstance(node, Phrase):
+            if self.cost(node) == 0:
+                return false()
+            words = sorted(node.words, key=lambda word: self.frequencies.get(("term", word), 0))
+            clauses = [self.compile(Term(word)) for word in dict.fromkeys(words)]
+            clauses.append(func.lexibox_phrase(Document.content, f" {' '.join(node.words)} "))
+            return and_(*clauses)
+
+        if isinstance(node, FieldMatch):
+            pattern = node.value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_").replace("*", "%")
+            if "%" not in pattern.replace("\\%", ""):
+                pattern = f"%{pattern}%"
+            return Document.filename.ilike(pattern, escape="\\")
+
+        if isinstance(node, Not):
+            if not isinstance(node.child, (Not, FieldMatch)) and self.cost(node.child) == 0:
+                return true()
+            return not_(self.compile(node.child))
+
+        if isinstance(node, And):
+            children = sorted(node.children, key=self._rank)
+            if any(not isinstance(child, Not) and self.cost(child) == 0 for child in children):
+                return false()
+            return and_(*(self.compile(child) for child in children))
+
+        if isinstance(node, Or):
+            children = [child for child in node.children if self.cost(child) != 0]
+            if not children:
+                return false()
+            return or_(*(self.compile(child) for child in sorted(children, key=self._rank)))
+
+        raise TypeError(node)
+
+
+def compile_query(db: Session, query: str):
+    """Parse `query` and return a WHERE clause over Document"""
+    node = parse_query(query)
+    planner = QueryPlanner(db)
+    planner.load_statistics(node)
+    return planner.compile(node)
@@ -0,0 +1,208 @@
+"""
+Per-user and per-organization storage quotas.
+
+A quota caps documents, bytes stored and pages extracted. Usage is not
+counted here: the per-user and per-organization totals in `stat_counters`
+(see stats.py) are already adjusted by every upload, delete and move between
+organizations. Checking a quota therefore reads two or three counter rows,
+however many documents the tenant has.
+
+Limits come from the environment; 0 or unset means unlimited. Byte limits
+take K, M, G and T suffixes (powers of 1024):
+
+    LEXIBOX_QUOTA_USER_DOCUMENTS   LEXIBOX_QUOTA_ORG_DOCUMENTS
+    LEXIBOX_QUOTA_USER_BYTES       LEXIBOX_QUOTA_ORG_BYTES
+    LEXIBOX_QUOTA_USER_PAGES       LEXIBOX_QUOTA_ORG_PAGES
+
+LEXIBOX_QUOTA_OVERRIDES sets limits for single tenants, for example
+`org:3:bytes=50G,user:12:documents=10000`.
+
+An upload is checked three times. Before it is read, a tenant at its
+document limit, or with no bytes left, is refused. While it is copied to the
+spool file, every chunk is checked against the bytes left, so an oversized
+upload is cut off when it crosses the limit, not after it has been written
+out. Once the text is extracted, the final size and page count are checked
+again in the transaction that stores the document, after its row is
+inserted. The insert takes the SQLite write lock, so concurrent uploads are
+checked one at a time against committed usage and cannot both pass. The two
+earlier checks are advisory: they only spare the work of reading and
+extracting an upload that is bound to fail.
+"""
+
+import os
+import re
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import Session
+
+from ..log import get_logger
+from ..models import StatCounter, User
+from . import stats
+
+logger = get_logger("quotas")
+
+RESOURCES = ("documents", "bytes", "pages")
+# Tenants at or above this share of a limit are listed in the admin stats
+NEAR_LIMIT = 0.9
+
+_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_amount(value: str) -> int:
+    """"2G" -> 2147483648; "5000" -> 5000"""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)B?\s*", value.upper())
+    if not match:
+        raise ValueError(f"Invalid quota amount: {value!r}")
+    return int(float(match.group(1)) * _UNITS[match.group(2)])
+
+
+def _parse_overrides(value: str) -> Dict[str, Dict[str, int]]:
+    """"org:3:bytes=50G,user:12:documents=10000" -> {"org:3": {"bytes": ...}, "user:12": {"documents": 10000}}"""
+    overrides: Dict[str, Dict[str, int]] = {}
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        key, _, amount = item.partition("=")
+        scope, _, resource = key.strip().rpartition(":")
+        if resource not in RESOURCES or not re.fullmatch(r"(user|org):\d+", scope):
+            raise ValueError(f"Invalid quota override: {item!r}")
+        overrides.setdefault(scope, {})[resource] = parse_amount(amount)
+    return overrides
+
+
+DEFAULTS = {
+    kind: {resource: parse_amount(os.getenv(f"LEXIBOX_QUOTA_{kind.upper()}_{resource.upper()}", "0"))
+           for resource in RESOURCES}
+    for kind in ("user", "org")
+}
+OVERRIDES = _parse_overrides(os.getenv("LEXIBOX_QUOTA_OVERRIDES", ""))
+
+
+def limits(scope: str) -> Dict[str, int]:
+    """Limits for a "user:<id>" or "org:<id>" scope; 0 is unlimited"""
+    return {**DEFAULTS[scope.split(":", 1)[0]], **OVERRIDES.get(scope, {})}
+
+
+def enabled() -> bool:
+    return any(any(values.values()) for values in DEFAULTS.values()) or bool(OVERRIDES)
+
+
+def _describe(scope: str) -> str:
+    return "your organization" if scope.startswith("org:") else "your account"
+
+
+def _format(resource: str, amount: int) -> str:
+    if resource != "bytes":
+        return f"{amount} {resource}"
+    for unit in ("T", "G", "M", "K"):
+        if amount >= _UNITS[unit]:
+            return f"{amount / _UNITS[unit]:.1f} {unit}B"
+    return f"{amount} bytes"
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, scope: str, resource: str, used: int, adding: int, limit: int):
+        self.scope = scope
+        self.resource = resource
+        self.used = used
+        self.limit = limit
+        message = f"Storage quota exceeded for {_describe(scope)}: {_format(resource, used)} of {_format(resource, limit)} used"
+        if used < limit:
+            message += f", this upload needs {_format(resource, adding)}"
+        super().__init__(message)
+
+    @property
+    def status_code(self) -> int:
+        # An upload too large for what is left is 413; a full quota otherwise
+        return 413 if self.resource == "bytes" else 403
+
+
+def _scopes(user: User) -> List[str]:
+    scopes = [stats.user_scope(user.id)]
+    if user.organization_id:
+        scopes.append(stats.org_scope(user.organization_id))
+    return scopes
+
+
+class Allowance:
+    """What one upload may still add, for the user and their organization"""
+
+    def __init__(self, db: Session, user: User):
+        self.entries = []
+        for scope in _scopes(user):
+            scope_limits = limits(scope)
+            if any(scope_limits.values()):
+                self.entries.append((scope, stats.totals(db, scope), scope_limits))
+
+    def check(self, documents: int = 1, size: int = 0, pages: int = 0) -> None:
+        """Raise QuotaExceeded if adding this much would go over a limit"""
+        adding = {"documents": documents, "bytes": size, "pages": pages}
+        for scope, used, scope_limits in self.entries:
+            for resource in RESOURCES:
+                limit = scope_limits[resource]
+                if limit and used[resource] + adding[resource] > limit:
+                    logger.info("quota exceeded", extra={"scope": scope, "resource": resource,
+                                                         "used": used[resource], "limit": limit})
+                    raise QuotaExceeded(scope, resource, used[resource], adding[resource], limit)
+
+    def check_bytes(self, size: int) -> None:
+        """Spool hook: called with the bytes received so far"""
+        self.check(documents=1, size=size)
+
+
+def check_upload(db: Session, user: User) -> Allowance:
+    """Refuse an upload before reading it when a quota is already used up"""
+    allowance = Allowance(db, user)
+    # Any upload adds a document and at least a byte and a page
+    allowance.check(documents=1, size=1, pages=1)
+    return allowance
+
+
+def check_document(db: Session, user: User, size: int, pages: int) -> None:
+    """Final check with the extracted document; call it after a write in the same transaction, so usage is current"""
+    Allowance(db, user).check(documents=1, size=size, pages=pages)
+
+
+def usage(db: Session, scope: str) -> Dict[str, Dict[str, Optional[int]]]:
+    """{"documents": {"used": n, "limit": n or None}, ...} for a user or organization scope"""
+    used = stats.totals(db, scope)
+    scope_limits = limits(scope)
+    return {resource: {"used": used[resource], "limit": scope_limits[resource] or None} for resource in RESOURCES}
+
+
+def near_limit(db: Session, threshold: float = NEAR_LIMIT) -> List[Dict]:
+    """Tenants using at least `threshold` of a limit, read from the counters"""
+    if not enabled():
+        return []
+    # Only the running totals that have a limit. Scope ranges rather than LIKE, so
+    # SQLite seeks the (scope, day, name) key instead of scanning every daily row.
+    keys = []
+    for kind, values in DEFAULTS.items():
+        resources = [resource for resource, limit in values.items() if limit]
+        if resources:
+            keys.append(and_(StatCounter.scope > f"{kind}:", StatCounter.scope < f"{kind};",
+                             StatCounter.day == "", StatCounter.name.in_(resources)))
+    if OVERRIDES:
+        keys.append(and_(StatCounter.scope.in_(list(OVERRIDES)), StatCounter.day == "",
+                         StatCounter.name.in_(RESOURCES)))
+    rows = db.execute(
+        select(StatCounter.scope, StatCounter.name, StatCounter.value).where(or_(*keys))
+    ).all()
+    result = []
+    for scope, resource, used in rows:
+        limit = limits(scope)[resource]
+        if limit and used >= threshold * limit:
+            result.append({"scope": scope, "resource": resource, "used": used, "limit": limit,
+                           "share": round(used / limit, 3)})
+    return sorted(result, key=lambda entry: -entry["share"])
+
+
+def summary(db: Session) -> Dict:
+    """Configured limits and the tenants close to them, for the admin dashboard"""
+    return {
+        "defaults": {kind: {resource: limit or None for resource, limit in values.items()}
+                     for kind, values in DEFAULTS.items()},
+        "overrides": OVERRIDES,
+        "near_limit": near_limit(db),
+    }
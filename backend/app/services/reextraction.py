@@ -0,0 +1,322 @@
+"""
+Background re-extraction of documents whose extractor version is outdated.
+
+A job walks the outdated documents in id order. For each one it re-reads the
+stored file (see storage.py), re-extracts it, replaces `Document.content` and
+rebuilds the search structures. Files are extracted outside any transaction,
+then each batch is written in one short transaction. The
+job row keeps a cursor (`last_document_id`), so a paused, interrupted or
+restarted job carries on where it stopped.
+
+Work is throttled to a CPU budget (fraction of one core) and an I/O budget
+(MB/s read from disk). After every document the runner sleeps long enough
+for both averages to stay under budget, so interactive requests keep most of
+the machine. One process at a time runs jobs: the runner holds an flock on
+`reextraction.lock`, so several API workers can share a database.
+"""
+
+import fcntl
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, not_, or_, select, update
+from sqlalchemy.orm import Session
+
+from ..database import SessionLocal
+from ..log import get_logger
+from ..models import Document, ReextractionJob, User
+from . import ocr, stats
+from .extractors import get_extractor
+from .indexing import reindex_document
+from .pdf_service import extract_stored_document
+
+logger = get_logger("reextraction")
+
+CPU_BUDGET = float(os.getenv("LEXIBOX_REEXTRACT_CPU_BUDGET", "0.25"))
+IO_BUDGET_MB = float(os.getenv("LEXIBOX_REEXTRACT_IO_MB", "5"))
+BATCH_SIZE = int(os.getenv("LEXIBOX_REEXTRACT_BATCH_SIZE", "20"))
+LOCK_PATH = os.getenv("LEXIBOX_REEXTRACT_LOCK", "reextraction.lock")
+
+ACTIVE = ("running", "paused")
+
+
+class JobStateError(ValueError):
+    pass
+
+
+class Throttle:
+    """Sleeps so that CPU time and bytes read stay under their per-second budgets"""
+
+    def __init__(self, cpu_budget: float, io_budget_mb: float):
+        self.cpu_budget = cpu_budget
+        self.io_budget = io_budget_mb * 1024 * 1024
+
+    def delay(self, cpu_seconds: float, elapsed: float, bytes_read: int) -> float:
+        needed = 0.0
+        if self.cpu_budget > 0:
+            needed = max(needed, cpu_seconds / self.cpu_budget)
+        if self.io_budget > 0:
+            needed = max(needed, bytes_read / self.io_budget)
+        return max(0.0, needed - elapsed)
+
+
+def outdated(version: str):
+    """Documents not extracted by `version` (with or without the OCR fallback where it could run)"""
+    current = [
+        Document.extractor_version == version,
+        Document.extractor_version.startswith(f"{version}+tesseract-", autoescape=True),
+    ]
+    if not ocr.available():
+        current.append(Document.extractor_version == f"{version}+{ocr.UNAVAILABLE}")
+    return or_(Document.extractor_version.is_(None), not_(or_(*current)))
+
+
+def is_current(stored: Optional[str], version: str) -> bool:
+    """The same test as `outdated`, negated, for one stored extractor version"""
+    if stored is None:
+        return False
+    if stored == version or stored.startswith(f"{version}+tesseract-"):
+        return True
+    return not ocr.available() and stored == f"{version}+{ocr.UNAVAILABLE}"
+
+
+def active_job(db: Session) -> Optional[ReextractionJob]:
+    return db.query(ReextractionJob).filter(ReextractionJob.status.in_(ACTIVE)).order_by(ReextractionJob.id.desc()).first()
+
+
+def latest_job(db: Session) -> Optional[ReextractionJob]:
+    return db.query(ReextractionJob).order_by(ReextractionJob.id.desc()).first()
+
+
+def start_job(db: Session, extractor: Optional[str] = None, cpu_budget: float = CPU_BUDGET,
+              io_budget_mb: float = IO_BUDGET_MB, batch_size: int = BATCH_SIZE,
+              user_id: Optional[int] = None) -> ReextractionJob:
+    """Queue a job re-extracting every document not produced by `extractor`'s current version"""
+    if active_job(db):
+        raise JobStateError("A re-extraction job is already running or paused")
+    version = get_extractor(extractor).version
+    total = db.execute(select(func.count(Document.id)).where(outdated(version))).scalar_one()
+    job = ReextractionJob(
+        status="running", extractor=extractor, target_version=version, cpu_budget=cpu_budget,
+        io_budget_mb=io_budget_mb, batch_size=batch_size, total=total, started_by_user_id=user_id,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    logger.info("re-extraction started", extra={"job_id": job.id, "target_version": version, "total": total})
+    return job
+
+
+def _transition(db: Session, job_id: int, expected: str, **values) -> bool:
+    """Compare-and-set the job status, so a pause never races a completion"""
+    result = db.execute(
+        update(ReextractionJob)
+        .where(ReextractionJob.id == job_id, ReextractionJob.status == expected)
+        .values(**values)
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def set_status(db: Session, job_id: int, status: str) -> ReextractionJob:
+    """Pause a running job or resume a paused one"""
+    job = db.get(ReextractionJob, job_id)
+    if job is None:
+        raise LookupError(job_id)
+    expected = {"paused": "running", "running": "paused"}[status]
+    if not _transition(db, job_id, expected, status=status):
+        db.refresh(job)
+        raise JobStateError(f"Job {job_id} is {job.status}")
+    db.refresh(job)
+    logger.info("re-extraction resumed" if status == "running" else "re-extraction paused", extra={"job_id": job_id})
+    return job
+
+
+def progress(db: Session) -> dict:
+    """Summary of the latest job for admin stats"""
+    job = latest_job(db)
+    current = get_extractor().version
+    # From the per-version stat counters, so the dashboard never scans documents
+    versions = stats.extractor_versions(db)
+    summary = {
+        "current_version": current,
+        "outdated_documents": sum(count for stored, count in versions.items()
+                                  if stored == stats.UNKNOWN_VERSION or not is_current(stored, current)),
+        "job": None,
+    }
+    if job:
+        summary["job"] = job_summary(job)
+    return summary
+
+
+def job_summary(job: ReextractionJob) -> dict:
+    done = job.processed + job.failed
+    return {
+        "id": job.id,
+        "status": job.status,
+        "target_version": job.target_version,
+        "total": job.total,
+        "processed": job.processed,
+        "failed": job.failed,
+        "percent": round(100.0 * done / job.total, 1) if job.total else 100.0,
+        "cpu_budget": job.cpu_budget,
+        "io_budget_mb": job.io_budget_mb,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def _still_running(db: Session, job_id: int) -> bool:
+    return db.execute(select(ReextractionJob.status).where(ReextractionJob.id == job_id)).scalar_one() == "running"
+
+
+def _pace(db: Session, job_id: int, throttle: Throttle, stop: threading.Event,
+          cpu_seconds: float, elapsed: float, bytes_read: int = 0) -> None:
+    delay = throttle.delay(cpu_seconds, elapsed, bytes_read)
+    # Sleep in short steps so a pause takes effect without waiting out a long delay
+    deadline = time.perf_counter() + delay
+    while delay > 0 and not stop.wait(min(delay, 1.0)):
+        delay = deadline - time.perf_counter()
+        if delay > 0 and not _still_running(db, job_id):
+            break
+
+
+def _extract_batch(db: Session, job: ReextractionJob, documents, throttle: Throttle, stop: threading.Event):
+    """Re-extract files without touching the database; returns (document, result or None) pairs"""
+    results = []
+    for document in documents:
+        wall, cpu = time.perf_counter(), time.thread_time()
+        bytes_read = 0
+        try:
+            bytes_read = document.size_bytes or 0
+            results.append((document, extract_stored_document(document.file_path, job.extractor)))
+        except Exception as e:
+            results.append((document, None))
+            logger.warning("re-extraction failed", extra={"job_id": job.id, "document_id": document.id,
+                                                          "error": str(e)})
+        _pace(db, job.id, throttle, stop, time.thread_time() - cpu, time.perf_counter() - wall, bytes_read)
+        if stop.is_set() or not _still_running(db, job.id):
+            break
+    return results
+
+
+def run_job(job_id: int, stop: Optional[threading.Event] = None) -> str:
+    """Work on a job until it completes, is paused or `stop` is set; returns its final status"""
+    stop = stop or threading.Event()
+    db = SessionLocal()
+    try:
+        while not stop.is_set():
+            job = db.get(ReextractionJob, job_id)
+            db.refresh(job)
+            if job.status != "running":
+                return job.status
+            throttle = Throttle(job.cpu_budget, job.io_budget_mb)
+            documents = db.execute(
+                select(Document)
+                .where(Document.id > job.last_document_id, outdated(job.target_version))
+                .order_by(Document.id)
+                .limit(job.batch_size)
+            ).scalars().all()
+            if not documents:
+                if not _transition(db, job_id, "running", status="completed", finished_at=datetime.utcnow()):
+                    continue
+                logger.info("re-extraction completed", extra={"job_id": job_id, "processed": job.processed,
+                                                               "failed": job.failed})
+                return "completed"
+
+            # Extraction (slow, throttled) happens outside any transaction; the
+            # batch is then written in one short transaction so the SQLite write
+            # lock is never held across a throttle sleep.
+            results = _extract_batch(db, job, documents, throttle, stop)
+            wall, cpu = time.perf_counter(), time.thread_time()
+            try:
+                for document, result in results:
+                    if result is None:
+                        job.failed += 1
+                    else:
+                        if (document.page_count or 0) != len(result.pages):
+                            owner = db.get(User, document.user_id)
+                            stats.pages_changed(db, document, owner.organization_id if owner else None,
+                                                len(result.pages) - (document.page_count or 0))
+                        stats.version_changed(db, document.extractor_version, result.extractor_version)
+                        document.content = result.text
+                        document.extractor_version = result.extractor_version
+                        document.page_count = len(result.pages)
+                        reindex_document(db, document)
+                        job.processed += 1
+                    job.last_document_id = document.id
+                db.commit()
+            except Exception as e:
+                db.rollback()
+                db.execute(
+                    update(ReextractionJob).where(ReextractionJob.id == job_id)
+                    .values(status="failed", error=str(e), finished_at=datetime.utcnow())
+                )
+                db.commit()
+                logger.exception("re-extraction job failed", extra={"job_id": job_id})
+                return "failed"
+            _pace(db, job_id, throttle, stop, time.thread_time() - cpu, time.perf_counter() - wall)
+        return "interrupted"
+    finally:
+        db.close()
+
+
+@contextmanager
+def exclusive(lock_path: str = LOCK_PATH):
+    """Yields True if this process may run jobs (no other process holds the lock)"""
+    with open(lock_path, "a") as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+class Runner:
+    """Runs the active job on a daemon thread in this process, if no other process is"""
+
+    def __init__(self, lock_path: str = LOCK_PATH):
+        self.lock_path = lock_path
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._guard = threading.Lock()
+
+    def ensure_running(self) -> None:
+        with self._guard:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="reextraction", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        with exclusive(self.lock_path) as acquired:
+            while acquired and not self._stop.is_set():
+                db = SessionLocal()
+                try:
+                    job = db.query(ReextractionJob).filter(ReextractionJob.status == "running") \
+                        .order_by(ReextractionJob.id).first()
+                    job_id = job.id if job else None
+                finally:
+                    db.close()
+                if job_id is None:
+                    return
+                run_job(job_id, self._stop)
+
+
+runner = Runner()
@@ -0,0 +1,187 @@
+"""
+Term and trigram index over document text.
+
+Documents are tokenized into normalized terms when they are stored. Each new
+term is broken into character trigrams, so a misspelled query term can be
+matched by looking up the terms that share enough trigrams with it (an indexed
+lookup) and then checking edit distance on that short candidate list only.
+"""
+
+import os
+import re
+import unicodedata
+from collections import Counter
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..models import Document, DocumentTerm, SearchTerm, TermTrigram
+
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 40
+DEFAULT_MAX_DISTANCE = int(os.getenv("LEXIBOX_FUZZY_MAX_DISTANCE", "2"))
+
+# SQLite limits the number of bound parameters per statement
+_CHUNK = 500
+
+# Words split across lines by PyPDF2 ("indemni-\nfication")
+_HYPHENATION = re.compile(r"(\w)-[ \t]*\r?\n[ \t]*(\w)")
+_TOKEN = re.compile(r"[^\W_]+")
+
+
+def normalize_text(text: str) -> str:
+    """Fold ligatures and compatibility characters, rejoin hyphenated line breaks"""
+    text = unicodedata.normalize("NFKC", text or "")
+    return _HYPHENATION.sub(r"\1\2", text).lower()
+
+
+def tokenize(text: str) -> List[str]:
+    return [
+        token for token in _TOKEN.findall(normalize_text(text))
+        if MIN_TERM_LENGTH <= len(token) <= MAX_TERM_LENGTH
+    ]
+
+
+def trigrams(term: str) -> List[str]:
+    padded = f"  {term} "
+    return sorted({padded[i:i + 3] for i in range(len(padded) - 2)})
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """Levenshtein distance, giving up (returning limit + 1) once it exceeds limit"""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i] + [0] * len(b)
+        for j, char_b in enumerate(b, start=1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b),
+            )
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _chunks(items: Sequence, size: int = _CHUNK) -> Iterable[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _term_ids(db: Session, terms: Sequence[str]) -> Dict[str, int]:
+    """Return ids for `terms`, adding the missing ones (and their trigrams) to the dictionary"""
+    ids: Dict[str, int] = {}
+    for chunk in _chunks(list(terms)):
+        ids.update(db.execute(select(SearchTerm.term, SearchTerm.id).where(SearchTerm.term.in_(chunk))).all())
+
+    missing = [term for term in terms if term not in ids]
+    for chunk in _chunks(missing):
+        db.execute(
+            sqlite_insert(SearchTerm).on_conflict_do_nothing(index_elements=["term"]),
+            [{"term": term, "length": len(term)} for term in chunk],
+        )
+        new_ids = dict(db.execute(select(SearchTerm.term, SearchTerm.id).where(SearchTerm.term.in_(chunk))).all())
+        rows = [{"trigram": gram, "term_id": new_ids[term]} for term in chunk for gram in trigrams(term)]
+        for rows_chunk in _chunks(rows):
+            db.execute(sqlite_insert(TermTrigram).on_conflict_do_nothing(), rows_chunk)
+        ids.update(new_ids)
+    return ids
+
+
+def index_document(db: Session, document: Document) -> None:
+    """(Re)build the term postings of one document; the caller commits"""
+    counts = Counter(tokenize(document.content))
+    counts.update(tokenize(os.path.splitext(document.filename or "")[0]))
+
+    db.execute(delete(DocumentTerm).where(DocumentTerm.document_id == document.id))
+    if not counts:
+        return
+    ids = _term_ids(db, list(counts))
+    rows = [{"term_id": ids[term], "document_id": document.id, "frequency": n} for term, n in counts.items()]
+    for chunk in _chunks(rows):
+        db.execute(sqlite_insert(DocumentTerm), chunk)
+
+
+def remove_documents(db: Session, document_ids: Sequence[int]) -> None:
+    """Drop the postings of deleted documents; the caller commits"""
+    for chunk in _chunks(list(document_ids)):
+        db.execute(delete(DocumentTerm).where(DocumentTerm.document_id.in_(chunk)))
+
+
+def similar_terms(db: Session, word: str, max_distance: int) -> List[Tuple[int, str, float]]:
+    """
+    Terms within `max_distance` edits of `word` as (term_id, term, similarity).
+
+    One edit changes at most three padded trigrams, so a term within k edits
+    shares at least len(trigrams(word)) - 3k of them; only terms passing that
+    bound (found through the trigram index) get an edit distance check.
+    """
+    grams = trigrams(word)
+    min_shared = max(1, len(grams) - 3 * max_distance)
+    shared = func.count(TermTrigram.trigram)
+    candidates = db.execute(
+        select(SearchTerm.id, SearchTerm.term)
+        .join(TermTrigram, TermTrigram.term_id == SearchTerm.id)
+        .where(
+            TermTrigram.trigram.in_(grams),
+            SearchTerm.length.between(len(word) - max_distance, len(word) + max_distance),
+        )
+        .group_by(SearchTerm.id)
+        .having(shared >= min_shared)
+    ).all()
+
+    matches = []
+    for term_id, term in candidates:
+        distance = edit_distance(word, term, max_distance)
+        if distance <= max_distance:
+            matches.append((term_id, term, 1.0 - distance / max(len(word), len(term))))
+    return matches
+
+
+def fuzzy_search(db: Session, user_id: int, query: str, max_distance: int = DEFAULT_MAX_DISTANCE,
+                 limit: int = 50) -> List[Tuple[Document, float]]:
+    """
+    Documents of `user_id` matching every query word within `max_distance`
+    edits, best matches first. A document's score is the sum over query words
+    of the best similarity among its terms, weighted by term frequency.
+    """
+    words = list(dict.fromkeys(tokenize(query)))
+    if not words:
+        return []
+
+    scores: Dict[int, float] = {}
+    for position, word in enumerate(words):
+        # Short words tolerate fewer edits, or everything would match
+        distance = min(max_distance, max(0, (len(word) - 1) // 3))
+        matches = similar_terms(db, word, distance)
+        if not matches:
+            return []
+        similarity = {term_id: score for term_id, _term, score in matches}
+
+        best: Dict[int, float] = {}
+        for chunk in _chunks(list(similarity)):
+            rows = db.execute(
+                select(DocumentTerm.document_id, DocumentTerm.term_id, DocumentTerm.frequency)
+                .join(Document, Document.id == DocumentTerm.document_id)
+                .where(Document.user_id == user_id, DocumentTerm.term_id.in_(chunk))
+            ).all()
+            for document_id, term_id, frequency in rows:
+                score = similarity[term_id] * (1.0 + 0.1 * min(frequency, 10))
+                if score > best.get(document_id, 0.0):
+                    best[document_id] = score
+
+        if position == 0:
+            scores = best
+        else:
+            scores = {doc_id: scores[doc_id] + score for doc_id, score in best.items() if doc_id in scores}
+        if not scores:
+            return []
+
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+    documents = {doc.id: doc for doc in db.query(Document).filter(Document.id.in_([doc_id for doc_id, _ in ranked]))}
+    return [(documents[doc_id], round(score, 4)) for doc_id, score in ranked if doc_id in documents]
@@ -0,0 +1,265 @@
+"""
+Incrementally maintained counters behind the admin dashboard.
+
+Counting users and documents with COUNT(*) scans the tables on every refresh.
+Instead, every write that changes a count also adjusts a row in
+`stat_counters`, in the same transaction:
+
+    scope        all, org:<id> or user:<id>; extractor for documents per extractor version
+    day          "" for running totals, YYYY-MM-DD for per-day activity
+    name         users, admin_users, documents, bytes, pages (totals)
+                 signups, uploads, upload_bytes, pages_extracted, deletions (per day)
+                 the extractor version, or "unknown" (extractor scope)
+
+Per-user totals let a user's documents move with them when they join or
+leave an organization, without recounting. Per-day rows are kept for "all"
+and for each organization.
+
+`reconcile` recomputes the totals from the tables and overwrites any that
+drifted, for example after a crash between two commits or a manual edit.
+Changes committed while it runs may be counted wrong until the next run.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..log import get_logger
+from ..models import Document, StatCounter, User
+
+logger = get_logger("stats")
+
+ALL = "all"
+EXTRACTOR = "extractor"
+UNKNOWN_VERSION = "unknown"
+TOTALS = ("users", "admin_users", "documents", "bytes", "pages")
+DAILY = ("signups", "uploads", "upload_bytes", "pages_extracted", "deletions")
+DOCUMENT_TOTALS = ("documents", "bytes", "pages")
+
+Key = Tuple[str, str, str]
+
+
+def org_scope(organization_id: int) -> str:
+    return f"org:{organization_id}"
+
+
+def user_scope(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def _today() -> str:
+    return datetime.utcnow().date().isoformat()
+
+
+def _bump(db: Session, deltas: Dict[Key, int]) -> None:
+    """Add to counters (upsert); the caller commits"""
+    rows = [{"scope": scope, "day": day, "name": name, "value": value}
+            for (scope, day, name), value in deltas.items() if value]
+    if rows:
+        statement = sqlite_insert(StatCounter)
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["scope", "day", "name"],
+                set_={"value": StatCounter.value + statement.excluded.value},
+            ),
+            rows,
+        )
+
+
+def _scopes(user_id: Optional[int], organization_id: Optional[int]) -> List[str]:
+    scopes = [ALL]
+    if organization_id:
+        scopes.append(org_scope(organization_id))
+    if user_id:
+        scopes.append(user_scope(user_id))
+    return scopes
+
+
+def _version_key(version: Optional[str]) -> Key:
+    return (EXTRACTOR, "", version or UNKNOWN_VERSION)
+
+
+def document_added(db: Session, document: Document, organization_id: Optional[int]) -> None:
+    deltas: Dict[Key, int] = defaultdict(int)
+    deltas[_version_key(document.extractor_version)] += 1
+    size, pages = document.size_bytes or 0, document.page_count or 0
+    today = _today()
+    for scope in _scopes(document.user_id, organization_id):
+        deltas[(scope, "", "documents")] += 1
+        deltas[(scope, "", "bytes")] += size
+        deltas[(scope, "", "pages")] += pages
+        if not scope.startswith("user:"):
+            deltas[(scope, today, "uploads")] += 1
+            deltas[(scope, today, "upload_bytes")] += size
+            deltas[(scope, today, "pages_extracted")] += pages
+    _bump(db, deltas)
+
+
+def documents_removed(db: Session, rows: Iterable[Tuple[Optional[int], Optional[int], Optional[int], Optional[int], Optional[str]]]) -> None:
+    """`rows` are (user_id, organization_id, size_bytes, page_count, extractor_version) of the deleted documents"""
+    deltas: Dict[Key, int] = defaultdict(int)
+    today = _today()
+    for user_id, organization_id, size, pages, version in rows:
+        deltas[_version_key(version)] -= 1
+        for scope in _scopes(user_id, organization_id):
+            deltas[(scope, "", "documents")] -= 1
+            deltas[(scope, "", "bytes")] -= size or 0
+            deltas[(scope, "", "pages")] -= pages or 0
+            if not scope.startswith("user:"):
+                deltas[(scope, today, "deletions")] += 1
+    _bump(db, deltas)
+
+
+def pages_changed(db: Session, document: Document, organization_id: Optional[int], delta: int) -> None:
+    """A re-extraction found a different number of pages"""
+    _bump(db, {(scope, "", "pages"): delta for scope in _scopes(document.user_id, organization_id)})
+
+
+def version_changed(db: Session, old_version: Optional[str], new_version: Optional[str]) -> None:
+    """A re-extraction replaced a document's text"""
+    if old_version != new_version:
+        _bump(db, {_version_key(old_version): -1, _version_key(new_version): 1})
+
+
+def user_added(db: Session, user: User) -> None:
+    deltas: Dict[Key, int] = {(ALL, "", "users"): 1, (ALL, _today(), "signups"): 1}
+    if user.is_admin:
+        deltas[(ALL, "", "admin_users")] = 1
+    if user.organization_id:
+        deltas[(org_scope(user.organization_id), "", "users")] = 1
+        deltas[(org_scope(user.organization_id), _today(), "signups")] = 1
+    _bump(db, deltas)
+
+
+def admin_changed(db: Session, delta: int) -> None:
+    _bump(db, {(ALL, "", "admin_users"): delta})
+
+
+def user_moved(db: Session, user_id: int, old_organization_id: Optional[int],
+               new_organization_id: Optional[int]) -> None:
+    """Move a user and their document totals from one organization to another (either may be None)"""
+    if old_organization_id == new_organization_id:
+        return
+    own = totals(db, user_scope(user_id))
+    deltas: Dict[Key, int] = defaultdict(int)
+    for organization_id, sign in ((old_organization_id, -1), (new_organization_id, 1)):
+        if organization_id:
+            scope = org_scope(organization_id)
+            deltas[(scope, "", "users")] += sign
+            for name in DOCUMENT_TOTALS:
+                deltas[(scope, "", name)] += sign * own[name]
+    _bump(db, deltas)
+
+
+def user_removed(db: Session, user: User) -> None:
+    """The account is deleted; its documents must already have been removed"""
+    deltas: Dict[Key, int] = {(ALL, "", "users"): -1}
+    if user.is_admin:
+        deltas[(ALL, "", "admin_users")] = -1
+    if user.organization_id:
+        deltas[(org_scope(user.organization_id), "", "users")] = -1
+    _bump(db, deltas)
+    db.execute(delete(StatCounter).where(StatCounter.scope == user_scope(user.id)))
+
+
+def organization_removed(db: Session, organization_id: int) -> None:
+    db.execute(delete(StatCounter).where(StatCounter.scope == org_scope(organization_id)))
+
+
+def totals(db: Session, scope: str = ALL) -> Dict[str, int]:
+    if scope == ALL:
+        names = TOTALS
+    else:
+        names = DOCUMENT_TOTALS if scope.startswith("user:") else ("users",) + DOCUMENT_TOTALS
+    values = dict.fromkeys(names, 0)
+    values.update(db.execute(
+        select(StatCounter.name, StatCounter.value).where(StatCounter.scope == scope, StatCounter.day == "")
+    ).all())
+    return values
+
+
+def organization_totals(db: Session) -> Dict[int, Dict[str, int]]:
+    result: Dict[int, Dict[str, int]] = {}
+    rows = db.execute(
+        select(StatCounter.scope, StatCounter.name, StatCounter.value)
+        .where(StatCounter.scope.startswith("org:"), StatCounter.day == "")
+    ).all()
+    for scope, name, value in rows:
+        organization_id = int(scope.split(":", 1)[1])
+        result.setdefault(organization_id, dict.fromkeys(("users",) + DOCUMENT_TOTALS, 0))[name] = value
+    return result
+
+
+def extractor_versions(db: Session) -> Dict[str, int]:
+    """Document count per extractor version, with documents of unknown version under UNKNOWN_VERSION"""
+    return dict(db.execute(
+        select(StatCounter.name, StatCounter.value)
+        .where(StatCounter.scope == EXTRACTOR, StatCounter.day == "", StatCounter.value != 0)
+    ).all())
+
+
+def daily(db: Session, scope: str = ALL, days: int = 30) -> List[Dict]:
+    """Per-day activity for the last `days` days, oldest first; days without activity are included"""
+    first = datetime.utcnow().date() - timedelta(days=days - 1)
+    by_day = {(first + timedelta(days=offset)).isoformat(): dict.fromkeys(DAILY, 0) for offset in range(days)}
+    rows = db.execute(
+        select(StatCounter.day, StatCounter.name, StatCounter.value)
+        .where(StatCounter.scope == scope, StatCounter.day >= first.isoformat())
+    ).all()
+    for day, name, value in rows:
+        if day in by_day:
+            by_day[day][name] = value
+    return [{"day": day, **values} for day, values in by_day.items()]
+
+
+def initialized(db: Session) -> bool:
+    return db.execute(select(StatCounter.scope).limit(1)).first() is not None
+
+
+def _expected(db: Session) -> Dict[Key, int]:
+    expected: Dict[Key, int] = defaultdict(int)
+    users, admins = db.execute(
+        select(func.count(User.id), func.coalesce(func.sum(case((User.is_admin == True, 1), else_=0)), 0))  # noqa: E712
+    ).one()
+    expected[(ALL, "", "users")] = users
+    expected[(ALL, "", "admin_users")] = admins
+    for organization_id, count in db.execute(
+        select(User.organization_id, func.count(User.id)).where(User.organization_id.is_not(None))
+        .group_by(User.organization_id)
+    ):
+        expected[(org_scope(organization_id), "", "users")] = count
+    for version, count in db.execute(
+        select(Document.extractor_version, func.count(Document.id)).group_by(Document.extractor_version)
+    ):
+        expected[_version_key(version)] += count
+    for user_id, organization_id, count, size, pages in db.execute(
+        select(Document.user_id, User.organization_id, func.count(Document.id),
+               func.coalesce(func.sum(Document.size_bytes), 0), func.coalesce(func.sum(Document.page_count), 0))
+        .outerjoin(User, User.id == Document.user_id)
+        .group_by(Document.user_id, User.organization_id)
+    ):
+        for scope in _scopes(user_id, organization_id):
+            expected[(scope, "", "documents")] += count
+            expected[(scope, "", "bytes")] += size
+            expected[(scope, "", "pages")] += pages
+    return expected
+
+
+def reconcile(db: Session) -> Dict[str, int]:
+    """Recompute the running totals from the tables and correct any that drifted"""
+    expected = _expected(db)
+    actual = {(scope, day, name): value for scope, day, name, value in db.execute(
+        select(StatCounter.scope, StatCounter.day, StatCounter.name, StatCounter.value).where(StatCounter.day == "")
+    )}
+    corrections = {key: expected.get(key, 0) - actual.get(key, 0)
+                   for key in set(expected) | set(actual) if expected.get(key, 0) != actual.get(key, 0)}
+    _bump(db, corrections)
+    db.commit()
+    if corrections:
+        logger.info("stat counters corrected", extra={"corrections": len(corrections),
+                                                      "examples": sorted(corrections.items())[:5]})
+    return {"counters": len(expected), "corrections": len(corrections)}
@@ -0,0 +1,273 @@
+"""
+Where uploaded PDFs are kept.
+
+`Document.file_path` holds a storage key such as `3f/a2/3fa2...e1.pdf`. Keys
+are random, so their first two pairs of hex digits spread files evenly over
+65536 directories (or S3 prefixes) however many are stored. LEXIBOX_STORAGE
+selects the backend:
+
+    local  files under LEXIBOX_UPLOAD_DIR (default uploads/), one directory
+           level per pair of digits
+    s3     objects in LEXIBOX_S3_BUCKET on any S3-compatible service
+           (LEXIBOX_S3_ENDPOINT_URL for MinIO and the like), so several API
+           nodes can share one store; needs boto3
+
+An upload is streamed in chunks to a spool file first, because extraction
+needs a seekable local file. `put` then moves it into place: a rename for
+local storage, or a multipart upload of LEXIBOX_S3_PART_MB parts for S3.
+Code that reads a stored PDF asks for `local_path(key)`. For S3 that
+downloads the object in chunks to a temporary file.
+
+Documents uploaded before sharding keep their `uploads/<filename>` key. The
+local backend still resolves those keys, and `migrate_storage.py` moves the
+files into the sharded layout or to S3.
+"""
+
+import os
+import tempfile
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from ..log import get_logger
+
+logger = get_logger("storage")
+
+BACKEND = os.getenv("LEXIBOX_STORAGE", "local").lower()
+UPLOAD_DIR = os.getenv("LEXIBOX_UPLOAD_DIR", "uploads")
+# Where uploads were written before keys were sharded
+LEGACY_DIR = "uploads"
+SPOOL_DIR = ".incoming"
+CHUNK_SIZE = 1024 * 1024
+
+S3_BUCKET = os.getenv("LEXIBOX_S3_BUCKET", "")
+S3_PREFIX = os.getenv("LEXIBOX_S3_PREFIX", "")
+S3_ENDPOINT_URL = os.getenv("LEXIBOX_S3_ENDPOINT_URL") or None
+S3_REGION = os.getenv("LEXIBOX_S3_REGION") or None
+# S3 requires every part but the last to be at least 5 MB
+S3_PART_SIZE = max(5, int(os.getenv("LEXIBOX_S3_PART_MB", "8"))) * 1024 * 1024
+
+
+class StorageUnavailable(RuntimeError):
+    pass
+
+
+@dataclass
+class StoredFile:
+    key: str
+    size: int
+    modified: float  # Unix time
+
+
+def new_key(filename: str) -> str:
+    token = uuid.uuid4().hex
+    extension = os.path.splitext(filename)[1].lower() or ".pdf"
+    return f"{token[:2]}/{token[2:4]}/{token}{extension}"
+
+
+def discard(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class Storage:
+    name = ""
+
+    def spool_dir(self) -> str:
+        return tempfile.gettempdir()
+
+    async def spool(self, upload, check: Optional[Callable[[int], None]] = None) -> Tuple[str, int]:
+        """
+        Copy an UploadFile to a local spool file chunk by chunk; returns (path, size).
+        `check` is called with the size so far before each chunk is written, and
+        may raise to abort the upload (the spool file is removed).
+        """
+        directory = self.spool_dir()
+        os.makedirs(directory, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=directory)
+        size = 0
+        try:
+            with os.fdopen(fd, "wb") as buffer:
+                while True:
+                    chunk = await upload.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if check is not None:
+                        check(size)
+                    buffer.write(chunk)
+        except BaseException:
+            discard(path)
+            raise
+        return path, size
+
+    def put(self, source: str, key: str) -> None:
+        """Store the spool file `source` under `key`; `source` is gone afterwards"""
+        raise NotImplementedError
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[str]:
+        """A local file with the stored content, valid inside the block"""
+        raise NotImplementedError
+
+    def delete(self, key: str) -> bool:
+        """Remove a stored file; False if it did not exist"""
+        raise NotImplementedError
+
+    def list(self) -> Iterator[StoredFile]:
+        raise NotImplementedError
+
+    def describe(self) -> Dict:
+        return {"backend": self.name}
+
+
+class LocalStorage(Storage):
+    name = "local"
+
+    def __init__(self, root: str = UPLOAD_DIR):
+        self.root = root
+
+    def spool_dir(self) -> str:
+        # Same filesystem as the store, so `put` is a rename
+        return os.path.join(self.root, SPOOL_DIR)
+
+    def path(self, key: str) -> str:
+        if key.startswith(f"{LEGACY_DIR}/"):
+            return key
+        return os.path.join(self.root, key)
+
+    def put(self, source: str, key: str) -> None:
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source, path)
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[str]:
+        path = self.path(key)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(path)
+        yield path
+
+    def delete(self, key: str) -> bool:
+        try:
+            os.remove(self.path(key))
+        except FileNotFoundError:
+            return False
+        return True
+
+    def list(self) -> Iterator[StoredFile]:
+        # Files at the top level are flat uploads from before sharding
+        legacy = os.path.abspath(self.root) == os.path.abspath(LEGACY_DIR)
+        for directory, subdirectories, files in os.walk(self.root):
+            relative = os.path.relpath(directory, self.root)
+            if relative == "." and SPOOL_DIR in subdirectories:
+                # Uploads still being received, not stored files
+                subdirectories.remove(SPOOL_DIR)
+            subdirectories.sort()
+            for name in sorted(files):
+                try:
+                    stat = os.stat(os.path.join(directory, name))
+                except FileNotFoundError:
+                    continue
+                if relative == ".":
+                    key = f"{LEGACY_DIR}/{name}" if legacy else name
+                else:
+                    key = f"{relative.replace(os.sep, '/')}/{name}"
+                yield StoredFile(key, stat.st_size, stat.st_mtime)
+
+    def describe(self) -> Dict:
+        return {"backend": self.name, "root": os.path.abspath(self.root)}
+
+
+class S3Storage(Storage):
+    """Objects in one bucket of an S3-compatible service, read and written in parts"""
+
+    name = "s3"
+
+    def __init__(self, bucket: str = S3_BUCKET, prefix: str = S3_PREFIX, endpoint_url=S3_ENDPOINT_URL,
+                 region=S3_REGION, part_size: int = S3_PART_SIZE):
+        try:
+            import boto3
+        except ImportError:
+            raise StorageUnavailable("LEXIBOX_STORAGE=s3 needs boto3 (pip install boto3)")
+        if not bucket:
+            raise StorageUnavailable("LEXIBOX_STORAGE=s3 needs LEXIBOX_S3_BUCKET")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self.part_size = part_size
+        # Credentials come from the usual AWS_* variables or config files
+        self.client = boto3.client("s3", endpoint_url=endpoint_url, region_name=region)
+
+    def put(self, source: str, key: str) -> None:
+        with open(source, "rb") as file:
+            self._upload(file, self.prefix + key)
+        discard(source)
+
+    def _upload(self, file, name: str) -> None:
+        chunk = file.read(self.part_size)
+        if len(chunk) < self.part_size:
+            self.client.put_object(Bucket=self.bucket, Key=name, Body=chunk)
+            return
+        upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=name)["UploadId"]
+        parts = []
+        try:
+            while chunk:
+                number = len(parts) + 1
+                response = self.client.upload_part(Bucket=self.bucket, Key=name, UploadId=upload_id,
+                                                   PartNumber=number, Body=chunk)
+                parts.append({"ETag": response["ETag"], "PartNumber": number})
+                chunk = file.read(self.part_size)
+            self.client.complete_multipart_upload(Bucket=self.bucket, Key=name, UploadId=upload_id,
+                                                  MultipartUpload={"Parts": parts})
+        except Exception:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=name, UploadId=upload_id)
+            raise
+
+    @contextmanager
+    def local_path(self, key: str) -> Iterator[str]:
+        fd, path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+        try:
+            with os.fdopen(fd, "wb") as file:
+                try:
+                    body = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)["Body"]
+                except self.client.exceptions.NoSuchKey:
+                    raise FileNotFoundError(key)
+                for chunk in body.iter_chunks(CHUNK_SIZE):
+                    file.write(chunk)
+            yield path
+        finally:
+            discard(path)
+
+    def delete(self, key: str) -> bool:
+        # S3 does not say whether the object existed
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+        return True
+
+    def list(self) -> Iterator[StoredFile]:
+        pages = self.client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=self.prefix)
+        for page in pages:
+            for item in page.get("Contents", []):
+                yield StoredFile(item["Key"][len(self.prefix):], item["Size"], item["LastModified"].timestamp())
+
+    def describe(self) -> Dict:
+        return {"backend": self.name, "bucket": self.bucket, "prefix": self.prefix, "endpoint_url": self.endpoint_url}
+
+
+BACKENDS = {"local": LocalStorage, "s3": S3Storage}
+
+_storage = None
+
+
+def get_storage() -> Storage:
+    """The configured backend, created on first use"""
+    global _storage
+    if _storage is None:
+        if BACKEND not in BACKENDS:
+            raise StorageUnavailable(f"Unknown storage backend '{BACKEND}'. Choose from: {', '.join(BACKENDS)}")
+        _storage = BACKENDS[BACKEND]()
+        logger.info("storage configured", extra=_storage.describe())
+    return _storage
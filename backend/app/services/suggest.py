@@ -0,0 +1,159 @@
+"""
+Search-as-you-type suggestions.
+
+Every user has a dictionary of the terms in their documents and of their
+filenames: the `suggestions` table, keyed by (user_id, kind, key) and stored
+as one B-tree. It works as a sorted term array on disk. All keys starting with
+a prefix form one contiguous range, so a lookup reads only that range and
+returns the entries found in the most documents. That takes a few
+milliseconds however many documents the user has. An `ilike` search would
+read every document instead.
+
+The dictionary is maintained at ingest, next to the term postings (see
+indexing.py). Indexing a document adds one to the count of each distinct term
+and of its filename, and removing it subtracts one again. Entries that reach
+zero are deleted. `rebuild` recomputes everything from the postings.
+"""
+
+from collections import defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+from sqlalchemy import delete, func, literal, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from ..log import get_logger
+from ..models import Document, DocumentTerm, SearchTerm, Suggestion
+from .search_index import _TOKEN, _chunks, normalize_text
+
+logger = get_logger("suggest")
+
+TERM = "term"
+FILENAME = "filename"
+MAX_LIMIT = 20
+
+Key = Tuple[int, str, str]
+
+
+def filename_key(filename: str) -> str:
+    return normalize_text(filename or "").strip()
+
+
+def _upper_bound(prefix: str) -> str:
+    """The smallest string greater than every string starting with `prefix`"""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _entries(db: Session, document_ids: Sequence[int]) -> Dict[Key, List]:
+    """(user_id, kind, key) -> [text, documents] for the given documents, from their postings"""
+    entries: Dict[Key, List] = {}
+    for chunk in _chunks(list(document_ids)):
+        rows = db.execute(
+            select(Document.user_id, SearchTerm.term, func.count())
+            .select_from(DocumentTerm)
+            .join(Document, Document.id == DocumentTerm.document_id)
+            .join(SearchTerm, SearchTerm.id == DocumentTerm.term_id)
+            .where(DocumentTerm.document_id.in_(chunk))
+            .group_by(Document.user_id, SearchTerm.id)
+        )
+        for user_id, term, count in rows:
+            # Counts add up across chunks
+            entries.setdefault((user_id, TERM, term), [term, 0])[1] += count
+        for user_id, filename in db.execute(select(Document.user_id, Document.filename).where(Document.id.in_(chunk))):
+            key = filename_key(filename)
+            if key:
+                entries.setdefault((user_id, FILENAME, key), [filename, 0])[1] += 1
+    return entries
+
+
+def _apply(db: Session, entries: Dict[Key, List], sign: int) -> None:
+    rows = [{"user_id": user_id, "kind": kind, "key": key, "text": text, "document_count": sign * count}
+            for (user_id, kind, key), (text, count) in entries.items()]
+    statement = sqlite_insert(Suggestion)
+    for chunk in _chunks(rows):
+        db.execute(
+            statement.on_conflict_do_update(
+                index_elements=["user_id", "kind", "key"],
+                set_={"document_count": Suggestion.document_count + statement.excluded.document_count},
+            ),
+            chunk,
+        )
+    if sign < 0:
+        keys: Dict[Tuple[int, str], List[str]] = defaultdict(list)
+        for user_id, kind, key in entries:
+            keys[(user_id, kind)].append(key)
+        for (user_id, kind), group in keys.items():
+            for chunk in _chunks(group):
+                db.execute(delete(Suggestion).where(
+                    Suggestion.user_id == user_id, Suggestion.kind == kind,
+                    Suggestion.key.in_(chunk), Suggestion.document_count <= 0))
+
+
+def add_documents(db: Session, document_ids: Sequence[int]) -> None:
+    """Count documents whose postings were just written; the caller commits"""
+    _apply(db, _entries(db, document_ids), 1)
+
+
+def remove_documents(db: Session, document_ids: Sequence[int]) -> None:
+    """Uncount documents before their postings are removed; the caller commits"""
+    _apply(db, _entries(db, document_ids), -1)
+
+
+def _lookup(db: Session, user_id: int, kind: str, prefix: str, limit: int) -> List[Tuple[str, int]]:
+    return db.execute(
+        select(Suggestion.text, Suggestion.document_count)
+        .where(Suggestion.user_id == user_id, Suggestion.kind == kind,
+               Suggestion.key >= prefix, Suggestion.key < _upper_bound(prefix))
+        .order_by(Suggestion.document_count.desc(), Suggestion.key)
+        .limit(limit)
+    ).all()
+
+
+def suggest(db: Session, user_id: int, text: str, limit: int = 10) -> Dict:
+    """
+    Completions for what the user has typed so far: terms completing the last
+    word (with the whole query completed), and filenames starting with the text
+    """
+    limit = min(limit, MAX_LIMIT)
+    terms = []
+    words = list(_TOKEN.finditer(text))
+    # Nothing to complete once the last word is finished with a space
+    if words and words[-1].end() == len(text):
+        last = words[-1]
+        prefix = normalize_text(last.group())
+        terms = [{"term": term, "query": text[:last.start()] + term, "documents": count}
+                 for term, count in _lookup(db, user_id, TERM, prefix, limit)]
+    filenames = []
+    prefix = filename_key(text)
+    if prefix:
+        filenames = [{"filename": filename, "documents": count}
+                     for filename, count in _lookup(db, user_id, FILENAME, prefix, limit)]
+    return {"q": text, "terms": terms, "filenames": filenames}
+
+
+def initialized(db: Session) -> bool:
+    return db.execute(select(Suggestion.user_id).limit(1)).first() is not None
+
+
+def rebuild(db: Session) -> Dict[str, int]:
+    """Recompute every user's dictionary from the postings and filenames"""
+    db.execute(delete(Suggestion))
+    db.execute(sqlite_insert(Suggestion).from_select(
+        ["user_id", "kind", "key", "text", "document_count"],
+        select(Document.user_id, literal(TERM), SearchTerm.term, SearchTerm.term, func.count())
+        .select_from(DocumentTerm)
+        .join(Document, Document.id == DocumentTerm.document_id)
+        .join(SearchTerm, SearchTerm.id == DocumentTerm.term_id)
+        .group_by(Document.user_id, SearchTerm.id)
+    ))
+    filenames: Dict[Key, List] = {}
+    for user_id, filename in db.execute(select(Document.user_id, Document.filename)
+                                        .execution_options(yield_per=1000)):
+        key = filename_key(filename)
+        if key:
+            filenames.setdefault((user_id, FILENAME, key), [filename, 0])[1] += 1
+    _apply(db, filenames, 1)
+    db.commit()
+    terms = db.execute(select(func.count()).select_from(Suggestion).where(Suggestion.kind == TERM)).scalar_one()
+    logger.info("suggestions rebuilt", extra={"terms": terms, "filenames": len(filenames)})
+    return {"terms": terms, "filenames": len(filenames)}
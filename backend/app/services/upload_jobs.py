@@ -0,0 +1,266 @@
+"""
+Upload progress, pushed to the uploader as Server-Sent Events.
+
+Every upload gets an `UploadJob` row. Its status moves from queued to
+extracting, then ocr (scanned pages only), then indexing, and ends as
+completed or failed. While text is extracted the row carries pages_done and
+pages_total for the current stage. The extraction thread reports every page,
+but the row is written at most every LEXIBOX_PROGRESS_INTERVAL seconds, and
+on every change of stage. A 500-page document therefore costs a handful of
+writes, not 500.
+
+`GET /upload/events` streams changes to the user's jobs. A stream wakes as
+soon as a job in the same process changes. It also re-reads the table every
+LEXIBOX_PROGRESS_POLL seconds to pick up jobs run by other worker processes.
+A client that reconnects with Last-Event-ID is sent whatever changed since.
+With `wait=false`, the upload request returns 202 as soon as the file is
+received. Clients then follow the job on the stream and do not hold a
+request open during extraction.
+
+A job that has not changed for LEXIBOX_UPLOAD_STALE_SECONDS is assumed lost
+with its process and is marked failed. Finished jobs are deleted after
+LEXIBOX_UPLOAD_RETENTION_SECONDS. Both run at startup and on the deletion
+runner's housekeeping schedule (see deletion.py).
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple
+
+import orjson
+from sqlalchemy import delete, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..database import SessionLocal
+from ..log import get_logger
+from ..models import UploadJob
+
+logger = get_logger("upload_jobs")
+
+PROGRESS_INTERVAL = float(os.getenv("LEXIBOX_PROGRESS_INTERVAL", "0.5"))
+POLL_INTERVAL = float(os.getenv("LEXIBOX_PROGRESS_POLL", "1.0"))
+STALE_SECONDS = float(os.getenv("LEXIBOX_UPLOAD_STALE_SECONDS", "3600"))
+RETENTION_SECONDS = float(os.getenv("LEXIBOX_UPLOAD_RETENTION_SECONDS", str(7 * 86400)))
+KEEPALIVE_SECONDS = 15.0
+# A new stream starts with the jobs that changed this recently
+REPLAY_SECONDS = 300
+# Rows from other processes can commit slightly out of timestamp order; look back this far
+OVERLAP = timedelta(seconds=2)
+FINAL = ("completed", "failed")
+
+_Waiter = Tuple[asyncio.AbstractEventLoop, asyncio.Event]
+
+
+class Broker:
+    """Wakes a user's event streams in this process when one of their jobs changed"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: Dict[int, Set[_Waiter]] = defaultdict(set)
+
+    def subscribe(self, user_id: int) -> _Waiter:
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters[user_id].add(waiter)
+        return waiter
+
+    def unsubscribe(self, user_id: int, waiter: _Waiter) -> None:
+        with self._lock:
+            self._waiters[user_id].discard(waiter)
+            if not self._waiters[user_id]:
+                del self._waiters[user_id]
+
+    def publish(self, user_id: int) -> None:
+        """Safe to call from any thread"""
+        with self._lock:
+            waiters = list(self._waiters.get(user_id, ()))
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # loop already closed
+
+
+broker = Broker()
+
+
+def job_summary(job: UploadJob) -> dict:
+    return {
+        "id": job.id,
+        "filename": job.filename,
+        "status": job.status,
+        "pages_done": job.pages_done,
+        "pages_total": job.pages_total,
+        "size_bytes": job.size_bytes,
+        "document_id": job.document_id,
+        "near_duplicates": job.near_duplicates,
+        "error": job.error,
+        "created_at": job.created_at,
+        "updated_at": job.updated_at,
+        "finished_at": job.finished_at,
+    }
+
+
+def create_job(db: Session, user_id: int, filename: str, size: int) -> UploadJob:
+    job = UploadJob(user_id=user_id, filename=filename, size_bytes=size, status="queued",
+                    updated_at=datetime.utcnow())
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    broker.publish(user_id)
+    return job
+
+
+def update_job(job_id: int, user_id: int, **values) -> None:
+    """Write a change in its own short transaction and wake the owner's streams"""
+    db = SessionLocal()
+    try:
+        db.execute(update(UploadJob).where(UploadJob.id == job_id).values(updated_at=datetime.utcnow(), **values))
+        db.commit()
+    finally:
+        db.close()
+    broker.publish(user_id)
+
+
+def finish(job_id: int, user_id: int, document_id: int, near_duplicates: List[dict]) -> None:
+    update_job(job_id, user_id, status="completed", document_id=document_id, near_duplicates=near_duplicates,
+               finished_at=datetime.utcnow())
+
+
+def fail(job_id: int, user_id: int, error: str) -> None:
+    try:
+        update_job(job_id, user_id, status="failed", error=error, finished_at=datetime.utcnow())
+    except Exception:
+        logger.exception("could not record failed upload", extra={"job_id": job_id})
+
+
+class Tracker:
+    """Progress callbacks for one job, called from the extraction thread"""
+
+    def __init__(self, job_id: int, user_id: int, interval: float = PROGRESS_INTERVAL):
+        self.job_id = job_id
+        self.user_id = user_id
+        self.interval = interval
+        self._status: Optional[str] = None
+        self._written = 0.0
+
+    def stage(self, status: str, **values) -> None:
+        self._status = status
+        self._write(status=status, **values)
+
+    def pages(self, status: str):
+        """A (done, total) callback for a stage that goes page by page"""
+        def report(done: int, total: int) -> None:
+            if self._status == status and done < total and time.monotonic() - self._written < self.interval:
+                return
+            self._status = status
+            self._write(status=status, pages_done=done, pages_total=total)
+        return report
+
+    def _write(self, **values) -> None:
+        self._written = time.monotonic()
+        try:
+            update_job(self.job_id, self.user_id, **values)
+        except Exception as e:
+            # Progress is informational; never fail the upload over it
+            logger.warning("progress update failed", extra={"job_id": self.job_id, "error": str(e)})
+
+
+_background: Set[asyncio.Task] = set()
+
+
+def run_in_background(coroutine) -> None:
+    """Run an upload after its request has returned; failures are recorded on the job"""
+    task = asyncio.ensure_future(coroutine)
+    _background.add(task)
+
+    def done(task: asyncio.Task) -> None:
+        _background.discard(task)
+        if not task.cancelled():
+            task.exception()  # already logged and recorded
+    task.add_done_callback(done)
+
+
+def expire_stale(db: Session) -> int:
+    """Mark jobs that stopped making progress (their process died) as failed"""
+    cutoff = datetime.utcnow() - timedelta(seconds=STALE_SECONDS)
+    result = db.execute(
+        update(UploadJob)
+        .where(UploadJob.status.not_in(FINAL), UploadJob.updated_at < cutoff)
+        .values(status="failed", error="Upload was interrupted", updated_at=datetime.utcnow(),
+                finished_at=datetime.utcnow())
+    )
+    db.commit()
+    if result.rowcount:
+        logger.info("stale uploads failed", extra={"jobs": result.rowcount})
+    return result.rowcount
+
+
+def prune(db: Session) -> int:
+    """Delete finished jobs older than the retention period"""
+    cutoff = datetime.utcnow() - timedelta(seconds=RETENTION_SECONDS)
+    result = db.execute(delete(UploadJob).where(UploadJob.status.in_(FINAL), UploadJob.updated_at < cutoff))
+    db.commit()
+    if result.rowcount:
+        logger.info("old upload jobs deleted", extra={"jobs": result.rowcount})
+    return result.rowcount
+
+
+def _changed_since(user_id: int, since: datetime) -> List[dict]:
+    db = SessionLocal()
+    try:
+        jobs = db.query(UploadJob).filter(UploadJob.user_id == user_id, UploadJob.updated_at > since) \
+            .order_by(UploadJob.updated_at).all()
+        return [job_summary(job) for job in jobs]
+    finally:
+        db.close()
+
+
+def _event(summary: dict) -> bytes:
+    return (b"id: " + summary["updated_at"].isoformat().encode() + b"\nevent: upload\ndata: "
+            + orjson.dumps(summary) + b"\n\n")
+
+
+def _parse_event_id(value: Optional[str]) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+async def stream(user_id: int, last_event_id: Optional[str] = None,
+                 poll_interval: float = POLL_INTERVAL) -> AsyncIterator[bytes]:
+    """SSE body: one `upload` event per change of the user's jobs, until the client disconnects"""
+    since = _parse_event_id(last_event_id) or datetime.utcnow() - timedelta(seconds=REPLAY_SECONDS)
+    sent: Dict[int, datetime] = {}
+    waiter = broker.subscribe(user_id)
+    _loop, wake = waiter
+    try:
+        yield f"retry: {int(poll_interval * 2000)}\n\n".encode()
+        quiet_since = time.monotonic()
+        while True:
+            wake.clear()
+            changes = await run_in_threadpool(_changed_since, user_id, since - OVERLAP)
+            for summary in changes:
+                if sent.get(summary["id"], datetime.min) >= summary["updated_at"]:
+                    continue
+                sent[summary["id"]] = summary["updated_at"]
+                since = max(since, summary["updated_at"])
+                quiet_since = time.monotonic()
+                yield _event(summary)
+            if changes:
+                sent = {job_id: updated for job_id, updated in sent.items() if updated >= since - OVERLAP}
+            if time.monotonic() - quiet_since >= KEEPALIVE_SECONDS:
+                quiet_since = time.monotonic()
+                yield b": keep-alive\n\n"
+            try:
+                await asyncio.wait_for(wake.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
+    finally:
+        broker.unsubscribe(user_id, waiter)
@@ -0,0 +1,401 @@
+"""
+On-disk vector index for semantic search.
+
+Chunk embeddings are appended to a flat float32 file that is memory-mapped for
+reads, next to an int32 file holding each row's owner (user id, -1 once
+deleted). `DocumentChunk.id` is the row number, so SQLite maps rows back to
+documents.
+
+Small tenants are searched exactly over their own rows. Larger ones go through
+an inverted-file (IVF) index: spherical k-means centroids trained by
+`build_semantic_index.py`, with the trained rows stored sorted by centroid so
+each list is one contiguous slice. A query scores the centroids, probes the
+best `nprobe` lists and rescores only those rows. Rows appended after training
+are assigned to their nearest centroid on insert and kept in a short tail.
+
+Files live in LEXIBOX_SEMANTIC_DIR (default "semantic_index"). Writers take an
+flock on `index.lock`, so several API worker processes can share them.
+
+Because chunk ids are row numbers, the files must outlive the database rows.
+If the directory is lost, new rows would start again at 0 and collide with
+the existing chunk ids. `reconcile` (run by prestart.py) detects chunk ids
+past the end of the files and drops the chunk rows, so documents can be
+embedded again with `build_semantic_index.py`. Until then an upload skips
+semantic indexing rather than fail.
+"""
+
+import fcntl
+import json
+import math
+import os
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from ..log import get_logger
+from ..models import Document, DocumentChunk
+from .embeddings import chunk_text, get_embedder, reset_embedder
+
+logger = get_logger("vector_index")
+
+INDEX_DIR = os.getenv("LEXIBOX_SEMANTIC_DIR", "semantic_index")
+NPROBE = int(os.getenv("LEXIBOX_SEMANTIC_NPROBE", "16"))
+# Tenants with at most this many chunks are searched exactly
+EXACT_SEARCH_LIMIT = int(os.getenv("LEXIBOX_SEMANTIC_EXACT_LIMIT", "20000"))
+# Cosine similarity below which a chunk is not considered related
+MIN_SCORE = float(os.getenv("LEXIBOX_SEMANTIC_MIN_SCORE", "0.1"))
+
+
+class VectorStore:
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._owners_path = os.path.join(directory, "owners.i32")
+        self._assign_path = os.path.join(directory, "assign.i32")
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._lock_path = os.path.join(directory, "index.lock")
+        self._meta: Dict = {}
+        self._meta_mtime = None
+        self._maps: Dict[str, Tuple[tuple, np.ndarray]] = {}
+        self._ivf = None
+        self._ivf_stamp = None
+
+    # Metadata
+
+    @property
+    def meta(self) -> Dict:
+        try:
+            mtime = os.stat(self._meta_path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        if mtime != self._meta_mtime:
+            with open(self._meta_path) as f:
+                self._meta = json.load(f)
+            self._meta_mtime = mtime
+        return self._meta
+
+    def write_meta(self, **values) -> None:
+        meta = dict(self.meta, **values)
+        tmp = self._meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path)
+
+    @contextmanager
+    def lock(self):
+        with open(self._lock_path, "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    # Row storage
+
+    @property
+    def dim(self) -> int:
+        return int(self.meta.get("dim", 0))
+
+    def rows(self) -> int:
+        if not self.dim or not os.path.exists(self._owners_path):
+            return 0
+        return os.path.getsize(self._owners_path) // 4
+
+    def _map(self, path: str, dtype, width: int = 1) -> np.ndarray:
+        """Memory-map `path`, reopening when the file has grown or was replaced"""
+        count = self.rows()
+        if count == 0:
+            return np.zeros((0, width) if width > 1 else 0, dtype=dtype)
+        key = (os.stat(path).st_ino, count)
+        cached = self._maps.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        shape = (count, width) if width > 1 else (count,)
+        mapped = np.memmap(path, dtype=dtype, mode="r", shape=shape)
+        self._maps[path] = (key, mapped)
+        return mapped
+
+    def vectors(self) -> np.ndarray:
+        return self._map(self._vectors_path, np.float32, self.dim)
+
+    def owners(self) -> np.ndarray:
+        return self._map(self._owners_path, np.int32)
+
+    def assignments(self) -> np.ndarray:
+        return self._map(self._assign_path, np.int32)
+
+    def append(self, vectors: np.ndarray, owner: int, embedder_version: str) -> List[int]:
+        """Append vectors for one owner and return their row ids"""
+        with self.lock():
+            if not self.dim:
+                self.write_meta(dim=int(vectors.shape[1]), embedder=embedder_version, trained_rows=0)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match index dimension {self.dim}")
+            start = self.rows()
+            ivf = self.ivf()
+            assign = ivf.nearest(vectors) if ivf else np.full(len(vectors), -1, dtype=np.int32)
+            with open(self._vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            with open(self._assign_path, "ab") as f:
+                f.write(assign.astype(np.int32).tobytes())
+            # Owners last: rows() is derived from this file
+            with open(self._owners_path, "ab") as f:
+                f.write(np.full(len(vectors), owner, dtype=np.int32).tobytes())
+            return list(range(start, start + len(vectors)))
+
+    def tombstone(self, rows: Sequence[int]) -> None:
+        if not rows or not os.path.exists(self._owners_path):
+            return
+        with self.lock():
+            owners = np.memmap(self._owners_path, dtype=np.int32, mode="r+")
+            owners[np.asarray(rows, dtype=np.int64)] = -1
+            owners.flush()
+            del owners
+
+    def truncate(self, **meta) -> None:
+        """
+        Drop every vector (for a rebuild); caller holds the lock. Files are
+        replaced rather than truncated so other processes' maps stay valid.
+        """
+        for path in (self._vectors_path, self._owners_path, self._assign_path):
+            open(path + ".tmp", "wb").close()
+            os.replace(path + ".tmp", path)
+        self._maps.clear()
+        self._ivf = None
+        self.write_meta(trained_rows=0, nlist=None, ivf_trained_at=None, **meta)
+
+    # IVF
+
+    def ivf(self) -> Optional["IVFIndex"]:
+        stamp = self.meta.get("ivf_trained_at")
+        if stamp is None:
+            return None
+        if self._ivf is None or self._ivf_stamp != stamp:
+            self._ivf = IVFIndex.load(self.directory)
+            self._ivf_stamp = stamp
+        return self._ivf
+
+
+def _save(directory: str, name: str, array: np.ndarray) -> None:
+    """np.save through a rename, so readers that mapped the old file are unaffected"""
+    path = os.path.join(directory, name)
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, array)
+    os.replace(path + ".tmp", path)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+class IVFIndex:
+    def __init__(self, centroids: np.ndarray, order: np.ndarray, offsets: np.ndarray):
+        self.centroids = centroids
+        self.order = order
+        self.offsets = offsets
+
+    @classmethod
+    def load(cls, directory: str) -> "IVFIndex":
+        return cls(
+            np.load(os.path.join(directory, "ivf_centroids.npy")),
+            np.load(os.path.join(directory, "ivf_order.npy"), mmap_mode="r"),
+            np.load(os.path.join(directory, "ivf_offsets.npy")),
+        )
+
+    def nearest(self, vectors: np.ndarray, batch: int = 16384) -> np.ndarray:
+        out = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch):
+            out[start:start + batch] = np.argmax(vectors[start:start + batch] @ self.centroids.T, axis=1)
+        return out
+
+    def probe(self, queries: np.ndarray, nprobe: int) -> np.ndarray:
+        """Best `nprobe` list ids per query (batched)"""
+        nprobe = min(nprobe, len(self.centroids))
+        scores = queries @ self.centroids.T
+        return np.argpartition(-scores, nprobe - 1, axis=1)[:, :nprobe]
+
+    def list_rows(self, lists: Sequence[int]) -> np.ndarray:
+        parts = [self.order[self.offsets[l]:self.offsets[l + 1]] for l in lists]
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    @staticmethod
+    def train(store: VectorStore, nlist: Optional[int] = None, iterations: int = 15,
+              sample_size: int = 100_000, seed: int = 0) -> int:
+        """Train centroids over the current rows and sort rows by list; caller holds the lock"""
+        vectors = store.vectors()
+        owners = store.owners()
+        live = np.flatnonzero(owners >= 0)
+        if live.size == 0:
+            return 0
+        nlist = nlist or max(1, min(int(4 * math.sqrt(live.size)), live.size // 39 or 1))
+        rng = np.random.default_rng(seed)
+        sample = np.asarray(vectors[np.sort(rng.choice(live, size=min(sample_size, live.size), replace=False))])
+
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+        for _ in range(iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=nlist) == 0
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()))]
+            centroids = _normalize(sums)
+
+        index = IVFIndex(centroids.astype(np.float32), np.zeros(0, dtype=np.int64), np.zeros(1, dtype=np.int64))
+        total = store.rows()
+        assign = index.nearest(np.asarray(vectors[:total]))
+        order = np.argsort(assign, kind="stable").astype(np.int64)
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+
+        _save(store.directory, "ivf_centroids.npy", index.centroids)
+        _save(store.directory, "ivf_order.npy", order)
+        _save(store.directory, "ivf_offsets.npy", offsets)
+        assignments = np.memmap(store._assign_path, dtype=np.int32, mode="r+", shape=(total,))
+        assignments[:] = assign
+        assignments.flush()
+        del assignments
+        store.write_meta(trained_rows=int(total), nlist=int(nlist), ivf_trained_at=os.urandom(8).hex())
+        return nlist
+
+
+_store: Optional[VectorStore] = None
+
+
+def get_store() -> VectorStore:
+    global _store
+    if _store is None:
+        _store = VectorStore(INDEX_DIR)
+    return _store
+
+
+def _embedder(store: VectorStore):
+    """The embedder matching the stored vectors (reloaded if the index was rebuilt)"""
+    embedder = get_embedder(store.directory)
+    expected = store.meta.get("embedder")
+    if expected and embedder.version != expected:
+        reset_embedder()
+        embedder = get_embedder(store.directory)
+        if embedder.version != expected:
+            logger.warning("embedder does not match the semantic index; rebuild it",
+                           extra={"embedder": embedder.version, "index": expected})
+    return embedder
+
+
+def _top_chunk_id(db: Session) -> Optional[int]:
+    return db.execute(select(func.max(DocumentChunk.id))).scalar()
+
+
+def reconcile(db: Session) -> int:
+    """Drop every chunk row if some point past the end of the vector files; returns the rows dropped"""
+    top = _top_chunk_id(db)
+    rows = get_store().rows()
+    if top is None or top < rows:
+        return 0
+    # The files were lost or replaced: no chunk id can be trusted to name its vector
+    dropped = db.query(DocumentChunk).delete(synchronize_session=False)
+    db.commit()
+    logger.warning("semantic index lost; chunk rows dropped", extra={"chunks": dropped, "index_rows": rows})
+    return dropped
+
+
+def add_document(db: Session, document: Document) -> int:
+    """Chunk, embed and store a document; the caller commits. Returns the chunk count"""
+    chunks = chunk_text(document.content)
+    if not chunks:
+        return 0
+    store = get_store()
+    top = _top_chunk_id(db)
+    if top is not None and top >= store.rows():
+        logger.warning("semantic index is behind the database; run prestart.py and build_semantic_index.py",
+                       extra={"document_id": document.id, "index_rows": store.rows(), "top_chunk_id": top})
+        return 0
+    embedder = _embedder(store)
+    vectors = embedder.embed([text for _, _, text in chunks])
+    rows = store.append(vectors, document.user_id, embedder.version)
+    db.add_all([
+        DocumentChunk(id=row, document_id=document.id, user_id=document.user_id,
+                      chunk_index=position, char_start=start, char_end=end)
+        for row, (position, (start, end, _)) in zip(rows, enumerate(chunks))
+    ])
+    return len(rows)
+
+
+def remove_documents(db: Session, document_ids: Sequence[int]) -> None:
+    """Tombstone the vectors of deleted documents; the caller commits"""
+    if not document_ids:
+        return
+    rows = [row for (row,) in db.query(DocumentChunk.id).filter(DocumentChunk.document_id.in_(list(document_ids)))]
+    get_store().tombstone(rows)
+    db.query(DocumentChunk).filter(DocumentChunk.document_id.in_(list(document_ids))).delete(synchronize_session=False)
+
+
+def _top_rows(vectors: np.ndarray, rows: np.ndarray, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+    if rows.size == 0:
+        return []
+    rows = np.sort(rows)
+    scores = np.asarray(vectors[rows]) @ query
+    k = min(k, len(rows))
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best])]
+    return [(int(rows[i]), float(scores[i])) for i in best]
+
+
+def search_rows(db: Session, user_id: int, queries: np.ndarray, k: int, nprobe: int = NPROBE) -> List[List[Tuple[int, float]]]:
+    """Top-k (row, cosine) per query vector among `user_id`'s chunks"""
+    store = get_store()
+    vectors, owners = store.vectors(), store.owners()
+    if len(vectors) == 0:
+        return [[] for _ in queries]
+
+    chunk_count = db.execute(select(func.count(DocumentChunk.id)).where(DocumentChunk.user_id == user_id)).scalar_one()
+    ivf = store.ivf()
+    if chunk_count <= EXACT_SEARCH_LIMIT or ivf is None:
+        rows = np.fromiter(
+            (row for (row,) in db.execute(select(DocumentChunk.id).where(DocumentChunk.user_id == user_id))),
+            dtype=np.int64,
+        )
+        rows = rows[rows < len(vectors)]
+        return [_top_rows(vectors, rows, query, k) for query in queries]
+
+    trained = int(store.meta.get("trained_rows", 0))
+    tail = np.arange(trained, len(vectors), dtype=np.int64)
+    tail_assign = np.asarray(store.assignments()[trained:len(vectors)])
+    results = []
+    for query, lists in zip(queries, ivf.probe(queries, nprobe)):
+        candidates = ivf.list_rows(lists)
+        if tail.size:
+            candidates = np.concatenate([candidates, tail[np.isin(tail_assign, lists)]])
+        candidates = candidates[candidates < len(vectors)]
+        candidates = candidates[owners[candidates] == user_id]
+        results.append(_top_rows(vectors, candidates, query, k))
+    return results
+
+
+def semantic_search(db: Session, user_id: int, query: str, limit: int = 10) -> List[Tuple[Document, float]]:
+    """Documents of `user_id` ranked by their best-matching chunk"""
+    store = get_store()
+    query_vector = _embedder(store).embed([query])
+    if not np.any(query_vector):
+        return []
+    hits = search_rows(db, user_id, query_vector, k=limit * 5)[0]
+    if not hits:
+        return []
+
+    scores = {row: score for row, score in hits if score >= MIN_SCORE}
+    if not scores:
+        return []
+    best: Dict[int, float] = {}
+    for row, document_id in db.execute(
+        select(DocumentChunk.id, DocumentChunk.document_id).where(DocumentChunk.id.in_(list(scores)))
+    ):
+        best[document_id] = max(best.get(document_id, -1.0), scores[row])
+
+    ranked = sorted(best.items(), key=lambda item: item[1], reverse=True)[:limit]
+    documents = {doc.id: doc for doc in db.query(Document).filter(
+        Document.id.in_([doc_id for doc_id, _ in ranked]), Document.user_id == user_id)}
+    return [(documents[doc_id], round(score, 4)) for doc_id, score in ranked if doc_id in documents]
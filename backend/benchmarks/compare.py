@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Compare two benchmark reports produced by `benchmarks.run`:
+
+    python -m benchmarks.compare baseline.json candidate.json [--threshold 10]
+
+Prints the p50/p99 change for every measurement present in both reports and
+exits non-zero when any p99 regresses by more than the threshold (percent).
+"""
+
+import argparse
+import json
+
+# Fields that identify a row within a suite
+KEY_FIELDS = ("corpus_size", "term", "concurrency", "engine", "endpoint", "mode")
+
+
+def _rows(report):
+    for suite, rows in report.get("results", {}).items():
+        if isinstance(rows, dict):
+            rows = [rows]
+        for row in rows:
+            key = tuple((field, row[field]) for field in KEY_FIELDS if field in row)
+            yield (suite,) + key, row
+
+
+def _change(old, new):
+    if not old:
+        return 0.0
+    return (new - old) / old * 100
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed p99 regression in percent")
+    args = parser.parse_args(argv)
+
+    with open(args.baseline) as f:
+        baseline = dict(_rows(json.load(f)))
+    with open(args.candidate) as f:
+        candidate = dict(_rows(json.load(f)))
+
+    regressions = 0
+    for key in sorted(set(baseline) & set(candidate), key=str):
+        old, new = baseline[key], candidate[key]
+        p50 = _change(old.get("p50_ms", 0), new.get("p50_ms", 0))
+        p99 = _change(old.get("p99_ms", 0), new.get("p99_ms", 0))
+        flag = ""
+        if p99 > args.threshold:
+            flag = "  REGRESSION"
+            regressions += 1
+        label = " ".join(str(part) if not isinstance(part, tuple) else f"{part[0]}={part[1]}" for part in key)
+        print(f"{label:<60} p50 {old.get('p50_ms')}→{new.get('p50_ms')} ms ({p50:+.1f}%)  "
+              f"p99 {old.get('p99_ms')}→{new.get('p99_ms')} ms ({p99:+.1f}%){flag}")
+
+    raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Deterministic synthetic corpora: text with a Zipf-like word distribution and
+minimal text-layer PDFs built from it, so runs are reproducible across commits.
+"""
+
+import random
+from typing import List
+
+VOCABULARY = (
+    "agreement party parties shall term termination notice payment invoice liability "
+    "indemnification arbitration confidential information obligation breach remedy "
+    "warranty representation governing law jurisdiction clause section schedule "
+    "amendment assignment force majeure severability waiver counterpart effective "
+    "date license intellectual property fee renewal insurance audit compliance "
+    "subcontractor deliverable acceptance milestone dispute resolution damages "
+    "limitation exclusive nonexclusive territory supplier customer contractor lease "
+    "tenant landlord premises rent deposit employee employer salary benefits "
+    "severance restrictive covenant solicitation privacy data processing security"
+).split()
+
+WORDS_PER_PAGE = 350
+
+
+def _zipf_weights(n: int) -> List[float]:
+    return [1.0 / rank for rank in range(1, n + 1)]
+
+
+class CorpusGenerator:
+    def __init__(self, seed: int = 1234, vocabulary_size: int = 5000):
+        self.random = random.Random(seed)
+        # Real vocabulary first (most frequent), then synthetic long-tail terms
+        self.vocabulary = list(VOCABULARY) + [
+            f"term{index:05d}" for index in range(max(0, vocabulary_size - len(VOCABULARY)))
+        ]
+        self.weights = _zipf_weights(len(self.vocabulary))
+
+    def page_text(self, words: int = WORDS_PER_PAGE) -> str:
+        return " ".join(self.random.choices(self.vocabulary, weights=self.weights, k=words))
+
+    def document_pages(self, pages: int) -> List[str]:
+        return [self.page_text() for _ in range(pages)]
+
+    def document_text(self, pages: int) -> str:
+        return "\n".join(self.document_pages(pages))
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: List[str], words_per_line: int = 12, columns: int = 1) -> bytes:
+    """Build a minimal PDF with one Helvetica text layer per page, optionally in columns"""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [%s] /Count %d >>" % (
+            " ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages)),
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    width = 532 // columns
+    per_line = max(1, words_per_line // columns)
+    for index, text in enumerate(pages):
+        words = text.split()
+        size = -(-len(words) // columns)
+        blocks = []
+        for column in range(columns):
+            column_words = words[column * size:(column + 1) * size]
+            lines = [" ".join(column_words[i:i + per_line]) for i in range(0, len(column_words), per_line)]
+            blocks.append(f"BT /F1 9 Tf 11 TL {40 + column * width} 760 Td "
+                          + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET")
+        body = " ".join(blocks)
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * index} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(body)} >>\nstream\n{body}\nendstream")
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    for offset in offsets:
+        out += f"{offset:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return bytes(out)
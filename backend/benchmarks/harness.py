@@ -0,0 +1,184 @@
+"""
+Shared plumbing for the benchmark suites: an isolated working directory (the
+app keeps `lexibox.db` and `uploads/` relative to the cwd), database seeding,
+latency statistics and a concurrent in-process HTTP driver.
+"""
+
+import asyncio
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Union
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def prepare_workspace(path: Optional[str] = None) -> str:
+    """chdir into a scratch directory before the app is imported"""
+    workdir = path or tempfile.mkdtemp(prefix="lexibox-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    os.chdir(workdir)
+    os.environ.setdefault("LEXIBOX_LOG_LEVEL", "WARNING")
+    # Every request comes from a handful of seeded users: per-tenant admission
+    # limits would turn most of them into 429s and time those instead
+    for operation in ("SEARCH", "UPLOAD"):
+        for setting in ("USER_RATE", "ORG_RATE", "USER_CONCURRENCY", "ORG_CONCURRENCY"):
+            os.environ.setdefault(f"LEXIBOX_{operation}_{setting}", "0")
+    return workdir
+
+
+def environment_info() -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def percentile(sorted_samples: Sequence[float], fraction: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, int(round(fraction * (len(sorted_samples) - 1)))))
+    return sorted_samples[index]
+
+
+def summarize(latencies: List[float], elapsed: Optional[float] = None, errors: int = 0) -> Dict:
+    """Latency summary in milliseconds; throughput when wall time is given"""
+    samples = sorted(latencies)
+    summary = {
+        "count": len(samples),
+        "errors": errors,
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3) if samples else 0.0,
+        "mean_ms": round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0,
+    }
+    if elapsed:
+        summary["throughput_rps"] = round(len(samples) / elapsed, 2)
+    return summary
+
+
+def seed_database(generator, users: int, orgs: int, documents: int, pages: int) -> List[Dict]:
+    """
+    Insert `users` users spread over `orgs` organizations and `documents`
+    documents spread over those users. Returns [{"id", "email", "token"}].
+    """
+    from app.auth import create_access_token, get_password_hash
+    from app.database import SessionLocal
+    from app.models import Document, Organization, User
+    from app.services.indexing import index_document
+
+    db = SessionLocal()
+    try:
+        org_ids = []
+        for index in range(orgs):
+            org = Organization(name=f"bench-org-{index}")
+            db.add(org)
+            db.flush()
+            org_ids.append(org.id)
+
+        password = get_password_hash("benchmark")
+        seeded = []
+        for index in range(users):
+            user = User(
+                name=f"Bench User {index}",
+                email=f"bench{index}@example.com",
+                hashed_password=password,
+                organization_id=org_ids[index % len(org_ids)] if org_ids else None,
+                is_org_admin=index < len(org_ids),
+            )
+            db.add(user)
+            db.flush()
+            seeded.append({"id": user.id, "email": user.email})
+        db.commit()
+
+        for index in range(documents):
+            owner = seeded[index % len(seeded)]
+            content = generator.document_text(pages)
+            document = Document(
+                filename=f"contract-{index:06d}.pdf",
+                file_path=f"uploads/contract-{index:06d}.pdf",
+                content=content,
+                # Spread over a year, so date filters and month facets have something to narrow
+                upload_date=datetime.utcnow() - timedelta(days=index % 365),
+                size_bytes=len(content),
+                page_count=pages,
+                user_id=owner["id"],
+            )
+            db.add(document)
+            db.flush()
+            index_document(db, document)
+            if index % 200 == 199:
+                db.commit()
+                db.expunge_all()
+        db.commit()
+    finally:
+        db.close()
+
+    for user in seeded:
+        user["token"] = create_access_token({"sub": user["email"]}, expires_delta=timedelta(hours=12))
+    return seeded
+
+
+def reset_database() -> None:
+    from app.database import engine
+    from app.models import Base
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+async def drive(
+    make_request: Callable[[int], Awaitable[Union[int, bool]]],
+    total: int,
+    concurrency: int,
+) -> Dict:
+    """
+    Run `make_request(i)` for i in range(total) with at most `concurrency`
+    in flight. The callable returns the HTTP status, or False (or raises) on
+    failure. Only successful requests are timed; failures are counted under
+    `errors`, by status under `error_statuses`.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures: Counter = Counter()
+
+    async def one(index: int):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await make_request(index)
+            except Exception:
+                result = "exception"
+            elapsed = time.perf_counter() - start
+            if result is True or (type(result) is int and 200 <= result < 300):
+                latencies.append(elapsed)
+            else:
+                failures[str(result)] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(index) for index in range(total)))
+    summary = summarize(latencies, time.perf_counter() - start, sum(failures.values()))
+    if failures:
+        summary["error_statuses"] = dict(failures)
+    return summary
+
+
+def asgi_client(app):
+    import httpx
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
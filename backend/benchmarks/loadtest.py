@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+"""
+Load generator for a running LexiBox API.
+
+Simulates many users across several organizations issuing a weighted mix of
+login, upload, list, search and delete requests, and steps through increasing
+concurrency levels. For every level it reports throughput, latency
+percentiles and error rates per operation, and counts SQLite
+"database is locked" failures separately so write contention is visible.
+
+    cd backend
+    uvicorn main:app --port 8000 &           # or pass --start-server
+    python -m benchmarks.loadtest --base-url http://localhost:8000 \\
+        --users 40 --orgs 4 --levels 1,8,32,64 --duration 30 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from benchmarks import harness
+from benchmarks.corpus import CorpusGenerator, make_pdf
+
+DEFAULT_MIX = "login=5,upload=10,list=30,search=45,delete=10"
+LOCKED_MARKER = "database is locked"
+
+
+class VirtualUser:
+    def __init__(self, email: str, password: str):
+        self.email = email
+        self.password = password
+        self.token: Optional[str] = None
+        self.documents: List[int] = []
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"}
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Counter = Counter()
+        self.locked: Counter = Counter()
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, operation: str, elapsed: float, status: int, body: str = "") -> None:
+        self.latencies[operation].append(elapsed)
+        self.statuses[operation][str(status)] += 1
+        if status >= 400 or status == 0:
+            self.errors[operation] += 1
+            if LOCKED_MARKER in body:
+                self.locked[operation] += 1
+
+    def report(self, elapsed: float) -> Dict:
+        operations = {}
+        total = 0
+        for operation, latencies in sorted(self.latencies.items()):
+            summary = harness.summarize(latencies, elapsed, self.errors[operation])
+            summary["error_rate"] = round(self.errors[operation] / len(latencies), 4) if latencies else 0.0
+            summary["database_locked"] = self.locked[operation]
+            summary["statuses"] = dict(self.statuses[operation])
+            operations[operation] = summary
+            total += len(latencies)
+        all_latencies = [value for values in self.latencies.values() for value in values]
+        overall = harness.summarize(all_latencies, elapsed, sum(self.errors.values()))
+        overall["error_rate"] = round(sum(self.errors.values()) / total, 4) if total else 0.0
+        overall["database_locked"] = sum(self.locked.values())
+        return {"overall": overall, "operations": operations}
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = float(weight)
+    unknown = set(mix) - {"login", "upload", "list", "search", "delete"}
+    if unknown:
+        raise argparse.ArgumentTypeError(f"Unknown operations in mix: {', '.join(sorted(unknown))}")
+    return mix
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.generator = CorpusGenerator(seed=args.seed)
+        self.random = random.Random(args.seed)
+        self.pdfs = [make_pdf(self.generator.document_pages(args.pages)) for _ in range(10)]
+        self.terms = self.generator.vocabulary[:200]
+        self.users: List[VirtualUser] = []
+        self.mix = args.mix
+
+    async def _call(self, stats: Stats, operation: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except httpx.HTTPError as exc:
+            stats.record(operation, time.perf_counter() - start, 0, str(exc))
+            return None
+        stats.record(operation, time.perf_counter() - start, response.status_code,
+                     response.text if response.status_code >= 400 else "")
+        return response
+
+    async def setup(self) -> None:
+        """Sign up org admins, invite the remaining users into their orgs"""
+        run_id = f"{int(time.time())}-{self.random.randrange(1 << 20):05x}"
+        password = "loadtest-password"
+        admins = []
+        for index in range(self.args.users):
+            user = VirtualUser(f"load-{run_id}-{index}@example.com", password)
+            payload = {"name": f"Load User {index}", "email": user.email, "password": password}
+            if index < self.args.orgs:
+                payload["org_name"] = f"load-org-{run_id}-{index}"
+            response = await self.client.post("/auth/signup", json=payload)
+            response.raise_for_status()
+            body = response.json()
+            user.token = body["access_token"]
+            if index < self.args.orgs:
+                admins.append((user, body["user"]["organization_id"]))
+            self.users.append(user)
+
+        for index, user in enumerate(self.users[len(admins):]):
+            if not admins:
+                break
+            admin, org_id = admins[index % len(admins)]
+            invite = await self.client.post(
+                "/org/invite",
+                json={"email": user.email, "organization_id": org_id, "invited_by_user_id": 0},
+                headers=admin.headers,
+            )
+            if invite.status_code == 200:
+                await self.client.post(f"/org/accept-invite/{invite.json()['id']}", headers=user.headers)
+
+    async def operation(self, user: VirtualUser, stats: Stats) -> None:
+        names = list(self.mix)
+        name = self.random.choices(names, weights=[self.mix[n] for n in names])[0]
+        if name == "delete" and not user.documents:
+            name = "upload"
+
+        if name == "login":
+            response = await self._call(stats, "login", "POST", "/auth/login",
+                                        data={"username": user.email, "password": user.password})
+            if response is not None and response.status_code == 200:
+                user.token = response.json()["access_token"]
+        elif name == "upload":
+            pdf = self.random.choice(self.pdfs)
+            response = await self._call(
+                stats, "upload", "POST", "/upload/", headers=user.headers,
+                files={"file": (f"load-{self.random.randrange(1 << 30)}.pdf", pdf, "application/pdf")},
+            )
+            if response is not None and response.status_code == 200:
+                user.documents.append(response.json()["id"])
+        elif name == "list":
+            await self._call(stats, "list", "GET", "/documents/", headers=user.headers)
+        elif name == "search":
+            await self._call(stats, "search", "GET", "/search/", headers=user.headers,
+                             params={"q": self.random.choice(self.terms)})
+        elif name == "delete":
+            document_id = user.documents.pop(self.random.randrange(len(user.documents)))
+            await self._call(stats, "delete", "DELETE", f"/documents/{document_id}", headers=user.headers)
+
+    async def run_level(self, concurrency: int) -> Dict:
+        stats = Stats()
+        deadline = time.perf_counter() + self.args.duration
+
+        async def worker(slot: int):
+            while time.perf_counter() < deadline:
+                user = self.users[slot % len(self.users)]
+                await self.operation(user, stats)
+                if self.args.think_ms:
+                    await asyncio.sleep(self.random.expovariate(1000 / self.args.think_ms))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(slot) for slot in range(concurrency)))
+        report = stats.report(time.perf_counter() - start)
+        report["concurrency"] = concurrency
+        return report
+
+
+def start_server(args) -> subprocess.Popen:
+    workdir = tempfile.mkdtemp(prefix="lexibox-load-")
+    env = dict(os.environ, PYTHONPATH=harness.BACKEND_DIR, LEXIBOX_LOG_LEVEL="WARNING")
+    subprocess.run([sys.executable, os.path.join(harness.BACKEND_DIR, "prestart.py")],
+                   cwd=workdir, env=env, check=True, stdout=subprocess.DEVNULL)
+    command = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.port),
+               "--workers", str(args.workers), "--log-level", "warning"]
+    process = subprocess.Popen(command, cwd=workdir, env=env)
+    for _ in range(100):
+        try:
+            if httpx.get(f"{args.base_url}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Server did not become healthy")
+
+
+async def run(args) -> Dict:
+    limits = httpx.Limits(max_connections=max(args.levels) + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        test = LoadTest(client, args)
+        await test.setup()
+        levels = []
+        for concurrency in args.levels:
+            report = await test.run_level(concurrency)
+            levels.append(report)
+            overall = report["overall"]
+            flag = "  <-- database is locked" if overall["database_locked"] else ""
+            print(f"concurrency={concurrency:<4} rps={overall.get('throughput_rps', 0):<8} "
+                  f"p50={overall['p50_ms']}ms p99={overall['p99_ms']}ms "
+                  f"errors={overall['error_rate'] * 100:.2f}%{flag}", file=sys.stderr)
+    return {
+        "environment": harness.environment_info(),
+        "parameters": {
+            "base_url": args.base_url, "users": args.users, "orgs": args.orgs, "levels": args.levels,
+            "duration": args.duration, "mix": args.mix, "pages": args.pages, "think_ms": args.think_ms,
+        },
+        "levels": levels,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--orgs", type=int, default=4)
+    parser.add_argument("--levels", default="1,4,16,64",
+                        type=lambda value: [int(part) for part in value.split(",") if part],
+                        help="concurrency levels to step through")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per concurrency level")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument("--pages", type=int, default=3, help="pages per uploaded PDF")
+    parser.add_argument("--think-ms", type=float, default=0.0, help="mean think time between requests")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--start-server", action="store_true",
+                        help="start uvicorn in a scratch directory on --port first")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    server = None
+    if args.start_server:
+        args.base_url = f"http://127.0.0.1:{args.port}"
+        server = start_server(args)
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""
+Reproducible benchmark suite for the LexiBox backend.
+
+Runs in-process against the FastAPI app with a scratch SQLite database and
+prints (or writes) one JSON document so results can be diffed across commits:
+
+    cd backend
+    pip install -r benchmarks/requirements.txt
+    python -m benchmarks.run --sizes 100,1000,5000 --output bench.json
+
+Suites: extraction, search, listing, upload, serialization (default: all).
+The extraction suite compares every installed PDF extractor on pages per
+second and text fidelity; `pip install pypdf pdfminer.six pypdfium2` to
+include them all. The search suite also times `/search/suggest` after one
+and three keystrokes. The serialization suite times `/documents/` and `/search/`
+on multi-megabyte documents three ways: the standard library encoder with
+pydantic validation (LEXIBOX_FAST_JSON=0), orjson with validation, and orjson
+with the unvalidated fast path.
+
+Admission limits are disabled in the scratch environment. Only successful
+requests are timed; any non-2xx response is reported on stderr with its
+status and the run exits non-zero.
+"""
+
+import argparse
+import asyncio
+import difflib
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+if __package__ in (None, ""):
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.corpus import CorpusGenerator, make_pdf
+from benchmarks import harness
+
+SUITES = ("extraction", "search", "listing", "upload", "serialization")
+
+
+def _sample_corpus(args, generator) -> list:
+    """(path, ground truth or None) for the PDFs to extract"""
+    if args.extraction_corpus:
+        samples = []
+        for name in sorted(os.listdir(args.extraction_corpus)):
+            if name.lower().endswith(".pdf"):
+                path = os.path.join(args.extraction_corpus, name)
+                truth_path = os.path.splitext(path)[0] + ".txt"
+                truth = None
+                if os.path.exists(truth_path):
+                    with open(truth_path, encoding="utf-8") as f:
+                        truth = f.read()
+                samples.append((path, truth))
+        return samples
+
+    directory = tempfile.mkdtemp(prefix="corpus-", dir=".")
+    samples = []
+    for index in range(args.extraction_docs):
+        path = os.path.join(directory, f"doc-{index}.pdf")
+        pages = generator.document_pages(args.pages)
+        # Every other document is laid out in two columns to exercise reading order
+        with open(path, "wb") as f:
+            f.write(make_pdf(pages, columns=1 + index % 2))
+        samples.append((path, "\n".join(pages)))
+    return samples
+
+
+def _fidelity(truth: str, text: str) -> float:
+    """Similarity of the extracted word sequence to the ground truth (1.0 = identical)"""
+    from app.services.search_index import tokenize
+    return difflib.SequenceMatcher(None, tokenize(truth), tokenize(text), autojunk=False).ratio()
+
+
+def bench_extraction(args, generator) -> list:
+    from app.services.extractors import available_extractors, get_extractor
+
+    samples = _sample_corpus(args, generator)
+    engines = args.extractors or available_extractors()
+    results = []
+    for engine in engines:
+        extractor = get_extractor(engine)
+        latencies, fidelity = [], []
+        characters = pages = failures = 0
+        start = time.perf_counter()
+        for path, truth in samples:
+            t0 = time.perf_counter()
+            try:
+                result = extractor.extract(path)
+            except Exception:
+                failures += 1
+                continue
+            latencies.append(time.perf_counter() - t0)
+            characters += len(result.text)
+            pages += len(result.pages)
+            if truth is not None:
+                fidelity.append(_fidelity(truth, result.text))
+        elapsed = time.perf_counter() - start
+
+        summary = harness.summarize(latencies, elapsed, failures)
+        summary.update({
+            "engine": engine,
+            "version": extractor.version,
+            "documents": len(samples),
+            "pages": pages,
+            "pages_per_second": round(pages / elapsed, 2) if elapsed else 0.0,
+            "characters": characters,
+            "fidelity": round(sum(fidelity) / len(fidelity), 4) if fidelity else None,
+        })
+        results.append(summary)
+        print(f"{engine:<10} {summary['pages_per_second']:>9} pages/s  fidelity={summary['fidelity']}",
+              file=sys.stderr)
+    return results
+
+
+def _search_terms(generator) -> dict:
+    vocabulary = generator.vocabulary
+    return {
+        "common": ("substring", vocabulary[0]),
+        "medium": ("substring", vocabulary[40]),
+        "rare": ("substring", vocabulary[-1]),
+        "missing": ("substring", "zzzznotpresent"),
+        # Misspellings of a frequent and an infrequent vocabulary word
+        "fuzzy_common": ("fuzzy", "indemnifcation"),
+        "fuzzy_rare": ("fuzzy", "severabilty"),
+        "query_boolean": ("query", f"{vocabulary[0]} AND NOT {vocabulary[-1]}"),
+        "semantic": ("semantic", "landlord repairs to the premises"),
+        "query_phrase": ("query", f'"{vocabulary[0]} {vocabulary[1]}" OR {vocabulary[40]}*'),
+    }
+
+
+def _suggest_prefixes(generator) -> dict:
+    """What a user has typed after one and three keystrokes, and a filename prefix"""
+    word = generator.vocabulary[0]
+    return {"suggest_1": word[:1], "suggest_3": word[:3], "suggest_filename": "contract-00"}
+
+
+def _filtered_requests(generator) -> dict:
+    """Filtered, sorted and faceted lists; the seeded corpus spans a year of uploads"""
+    since = (datetime.utcnow() - timedelta(days=30)).isoformat()
+    return {
+        "filter_recent": ("/documents/", {"since": since, "sort": "-size"}),
+        "facets": ("/documents/", {"facets": "true"}),
+        "facets_org": ("/documents/", {"facets": "true", "scope": "organization"}),
+        "search_filtered": ("/search/", {"q": generator.vocabulary[0], "filename": "contract-00*",
+                                         "since": since, "facets": "true"}),
+    }
+
+
+async def bench_search_and_listing(args, generator, suites) -> dict:
+    from main import app
+
+    results = {"search": [], "listing": []}
+    async with harness.asgi_client(app) as client:
+        for size in args.sizes:
+            harness.reset_database()
+            users = harness.seed_database(generator, args.users, args.orgs, size, args.pages)
+            # All documents of one tenant: the per-user corpus the queries scan
+            owner = users[0]
+            docs_for_owner = len(range(0, size, len(users)))
+            headers = {"Authorization": f"Bearer {owner['token']}"}
+
+            if "search" in suites:
+                for label, (mode, term) in _search_terms(generator).items():
+                    async def search(_):
+                        response = await client.get("/search/", params={"q": term, "mode": mode}, headers=headers)
+                        return response.status_code
+                    summary = await harness.drive(search, args.requests, 1)
+                    summary.update({"corpus_size": size, "user_documents": docs_for_owner, "term": label})
+                    results["search"].append(summary)
+                for label, prefix in _suggest_prefixes(generator).items():
+                    async def suggest(_):
+                        response = await client.get("/search/suggest", params={"q": prefix}, headers=headers)
+                        return response.status_code
+                    summary = await harness.drive(suggest, args.requests, 1)
+                    summary.update({"corpus_size": size, "user_documents": docs_for_owner, "term": label})
+                    results["search"].append(summary)
+                for label, (path, params) in _filtered_requests(generator).items():
+                    async def filtered(_):
+                        response = await client.get(path, params=params, headers=headers)
+                        return response.status_code
+                    summary = await harness.drive(filtered, args.requests, 1)
+                    summary.update({"corpus_size": size, "user_documents": docs_for_owner, "term": label})
+                    results["search"].append(summary)
+
+            if "listing" in suites:
+                async def listing(index):
+                    user = users[index % len(users)]
+                    response = await client.get(
+                        "/documents/", headers={"Authorization": f"Bearer {user['token']}"})
+                    return response.status_code
+                for concurrency in args.concurrency:
+                    summary = await harness.drive(listing, args.requests, concurrency)
+                    summary.update({"corpus_size": size, "concurrency": concurrency})
+                    results["listing"].append(summary)
+    return {suite: rows for suite, rows in results.items() if suite in suites}
+
+
+async def bench_upload(args, generator) -> list:
+    from main import app
+
+    harness.reset_database()
+    users = harness.seed_database(generator, args.users, args.orgs, 0, args.pages)
+    pdfs = [make_pdf(generator.document_pages(args.pages)) for _ in range(min(args.requests, 20))]
+
+    results = []
+    async with harness.asgi_client(app) as client:
+        for concurrency in args.concurrency:
+            async def upload(index):
+                user = users[index % len(users)]
+                response = await client.post(
+                    "/upload/",
+                    files={"file": (f"upload-{concurrency}-{index}.pdf", pdfs[index % len(pdfs)], "application/pdf")},
+                    headers={"Authorization": f"Bearer {user['token']}"},
+                )
+                return response.status_code
+            summary = await harness.drive(upload, args.requests, concurrency)
+            summary.update({"concurrency": concurrency, "pages_per_document": args.pages})
+            results.append(summary)
+    return results
+
+
+async def bench_serialization(args, generator) -> list:
+    from main import app
+    from app import serialization
+    from app.database import SessionLocal
+    from app.models import Document
+
+    harness.reset_database()
+    owner = harness.seed_database(generator, 1, 0, 0, args.pages)[0]
+    headers = {"Authorization": f"Bearer {owner['token']}"}
+    # Roughly 3.3 KB of text per synthetic page
+    pages = max(1, int(args.document_mb * 1024 * 1024 / 3300))
+    db = SessionLocal()
+    try:
+        for index in range(args.serialization_docs):
+            db.add(Document(filename=f"large-{index:04d}.pdf", file_path=f"uploads/large-{index:04d}.pdf",
+                            content=generator.document_text(pages), user_id=owner["id"]))
+        db.commit()
+    finally:
+        db.close()
+
+    endpoints = {
+        "listing": ("/documents/", {}),
+        "search": ("/search/", {"q": generator.vocabulary[0]}),
+    }
+    results = []
+    settings = serialization.USE_ORJSON, serialization.FAST_PATH
+    async with harness.asgi_client(app) as client:
+        try:
+            for label, (path, params) in endpoints.items():
+                timings = {}
+                for mode, use_orjson, fast in (("stdlib", False, False), ("orjson", True, False), ("fast", True, True)):
+                    serialization.USE_ORJSON, serialization.FAST_PATH = use_orjson, fast
+                    sizes = []
+
+                    async def fetch(_):
+                        response = await client.get(path, params=params, headers=headers)
+                        sizes.append(len(response.content))
+                        return response.status_code
+                    summary = await harness.drive(fetch, args.requests, 1)
+                    summary.update({"endpoint": label, "mode": mode, "documents": args.serialization_docs,
+                                    "response_mb": round(max(sizes) / 1024 / 1024, 2)})
+                    timings[mode] = summary["p50_ms"]
+                    results.append(summary)
+                speedup = round(timings["stdlib"] / timings["fast"], 2) if timings["fast"] else None
+                results[-1]["speedup_p50"] = speedup
+                print(f"{label:<8} stdlib {timings['stdlib']:>9} ms  orjson {timings['orjson']:>9} ms  "
+                      f"fast {timings['fast']:>9} ms  x{speedup}", file=sys.stderr)
+        finally:
+            serialization.USE_ORJSON, serialization.FAST_PATH = settings
+    return results
+
+
+def _int_list(value: str):
+    return [int(part) for part in value.split(",") if part]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--suites", default=",".join(SUITES), help="comma separated subset of: " + ", ".join(SUITES))
+    parser.add_argument("--sizes", type=_int_list, default=[100, 1000], help="corpus sizes (documents) for search/listing")
+    parser.add_argument("--pages", type=int, default=3, help="pages per synthetic document")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--orgs", type=int, default=3)
+    parser.add_argument("--requests", type=int, default=50, help="requests per measurement")
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16])
+    parser.add_argument("--extraction-docs", type=int, default=50)
+    parser.add_argument("--extraction-corpus",
+                        help="directory of sample PDFs (with optional same-named .txt ground truth) "
+                             "instead of synthetic documents")
+    parser.add_argument("--extractors", type=lambda value: [part for part in value.split(",") if part],
+                        help="extraction engines to compare (default: every installed one)")
+    parser.add_argument("--serialization-docs", type=int, default=10,
+                        help="documents returned per request in the serialization suite")
+    parser.add_argument("--document-mb", type=float, default=2.0,
+                        help="text per document in the serialization suite (MB)")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--workdir", help="scratch directory (default: a new temp dir)")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    suites = [suite for suite in args.suites.split(",") if suite]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        raise SystemExit(f"Unknown suites: {', '.join(sorted(unknown))}")
+
+    output = os.path.abspath(args.output) if args.output else None
+    workdir = harness.prepare_workspace(args.workdir)
+    generator = CorpusGenerator(seed=args.seed)
+
+    report = {
+        "environment": harness.environment_info(),
+        "parameters": {key: value for key, value in vars(args).items() if key not in ("output", "workdir")},
+        "workdir": workdir,
+        "results": {},
+    }
+    if "extraction" in suites:
+        report["results"]["extraction"] = bench_extraction(args, generator)
+    if "search" in suites or "listing" in suites:
+        report["results"].update(asyncio.run(bench_search_and_listing(args, generator, suites)))
+    if "upload" in suites:
+        report["results"]["upload"] = asyncio.run(bench_upload(args, generator))
+    if "serialization" in suites:
+        report["results"]["serialization"] = asyncio.run(bench_serialization(args, generator))
+
+    text = json.dumps(report, indent=2)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    # drive() leaves failed requests out of the latencies; a measurement that had any is not comparable
+    failed = [(suite, row) for suite, rows in report["results"].items() for row in rows if row.get("error_statuses")]
+    for suite, row in failed:
+        label = row.get("term") or row.get("endpoint") or f"concurrency {row.get('concurrency')}"
+        print(f"{suite} {label}: {row['errors']} failed requests {row['error_statuses']}", file=sys.stderr)
+    if failed:
+        raise SystemExit(1)
+
+if __name__ == "__main__":
+    main()
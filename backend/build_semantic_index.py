@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Maintain the semantic search index.
+
+    python build_semantic_index.py            # embed documents that have no chunks yet, retrain IVF
+    python build_semantic_index.py --fit      # learn an LSA basis from the corpus, then re-embed everything
+    python build_semantic_index.py --train    # only retrain the IVF lists (e.g. after heavy growth)
+"""
+
+import argparse
+import random
+
+from sqlalchemy import exists, select
+from app.database import SessionLocal, engine
+from app.models import Base, Document, DocumentChunk
+from app.services import vector_index
+from app.services.embeddings import HashedEmbedder, chunk_text, reset_embedder
+from app.services.vector_index import IVFIndex, get_store
+
+BATCH_SIZE = 100
+# Below this many vectors exact search is fast enough that IVF is not worth training
+MIN_ROWS_FOR_IVF = 20000
+
+def embed_missing(db, rebuild=False):
+    last_id = 0
+    embedded = 0
+    while True:
+        query = select(Document).where(Document.id > last_id)
+        if not rebuild:
+            query = query.where(~exists().where(DocumentChunk.document_id == Document.id))
+        documents = db.execute(query.order_by(Document.id).limit(BATCH_SIZE)).scalars().all()
+        if not documents:
+            break
+        for document in documents:
+            vector_index.add_document(db, document)
+        db.commit()
+        last_id = documents[-1].id
+        embedded += len(documents)
+        print(f"✓ Embedded {embedded} documents")
+    return embedded
+
+def fit(db, sample_size):
+    texts = []
+    for (content,) in db.execute(select(Document.content)):
+        texts.extend(text for _, _, text in chunk_text(content))
+    random.Random(0).shuffle(texts)
+    store = get_store()
+    embedder = HashedEmbedder(store.directory)
+    embedder.fit(texts[:sample_size])
+    reset_embedder()
+    print(f"✓ Fitted LSA basis on {min(len(texts), sample_size)} chunks")
+
+    with store.lock():
+        store.truncate(embedder=embedder.version, dim=embedder.dim)
+    db.query(DocumentChunk).delete()
+    db.commit()
+    embed_missing(db, rebuild=True)
+
+def train(nlist=None):
+    store = get_store()
+    with store.lock():
+        lists = IVFIndex.train(store, nlist=nlist)
+    print(f"✓ Trained IVF index with {lists} lists over {store.rows()} vectors")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fit", action="store_true", help="learn an LSA basis and rebuild all vectors")
+    parser.add_argument("--train", action="store_true", help="only retrain the IVF lists")
+    parser.add_argument("--sample", type=int, default=5000, help="chunks used to fit the LSA basis")
+    parser.add_argument("--nlist", type=int, help="number of IVF lists (default: ~4*sqrt(rows))")
+    args = parser.parse_args()
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        if args.fit:
+            fit(db, args.sample)
+        elif not args.train:
+            embed_missing(db)
+        if args.train or get_store().rows() >= MIN_ROWS_FOR_IVF:
+            train(args.nlist)
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    main()
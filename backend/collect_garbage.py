@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Reconcile stored files against the database in the foreground: remove documents
+whose owner was deleted, and files no document refers to.
+
+    python collect_garbage.py --grace-seconds 0
+"""
+
+import argparse
+from app.database import engine
+from app.models import Base
+from app.services import deletion
+
+def collect_garbage(args):
+    Base.metadata.create_all(bind=engine)
+    with deletion.exclusive(deletion.LOCK_PATH) as acquired:
+        if not acquired:
+            print("✓ Another process is running deletions; it collects garbage every "
+                  f"{deletion.GC_INTERVAL:.0f} seconds")
+            return
+        result = deletion.collect_garbage(chunk_size=args.chunk_size, grace_seconds=args.grace_seconds)
+    print(f"✓ Removed {result['orphaned_documents']} orphaned documents and {result['orphaned_files']} "
+          f"orphaned files ({result['bytes_freed'] / 1024 / 1024:.1f} MB) in {result['seconds']}s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=deletion.GC_CHUNK_SIZE)
+    parser.add_argument("--grace-seconds", type=float, default=deletion.GC_GRACE_SECONDS,
+                        help="leave files younger than this alone (default: %(default)s)")
+    collect_garbage(parser.parse_args())
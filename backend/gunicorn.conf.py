@@ -0,0 +1,30 @@
+"""
+Gunicorn settings for the multi-process deployment:
+
+    python prestart.py && gunicorn -c gunicorn.conf.py main:app
+
+One Uvicorn worker per core by default (WEB_CONCURRENCY overrides it). Text
+extraction is CPU-bound, so more workers than cores only adds contention.
+"""
+
+import multiprocessing
+import os
+
+bind = os.getenv("LEXIBOX_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+
+# Uploads with an OCR fallback can take a while
+timeout = int(os.getenv("LEXIBOX_WORKER_TIMEOUT", "180"))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth from PDF libraries
+max_requests = int(os.getenv("LEXIBOX_MAX_REQUESTS", "2000"))
+max_requests_jitter = max_requests // 10
+
+accesslog = None  # the app writes its own access log
+errorlog = "-"
+
+# Lets per-process pools (OCR) size themselves to their share of the machine
+os.environ.setdefault("LEXIBOX_WEB_WORKERS", str(workers))
@@ -1,16 +1,27 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine
-from app.models import Base, Document, User
-from app.routes import documents_router, search_router, upload_router, auth_router, admin_router, organization_router
+from app.log import configure_logging, RequestContextMiddleware
+from app.metrics import MetricsMiddleware
+from app.profiling import ProfilingMiddleware
+from app.serialization import ORJSONResponse
+from app.services.reextraction import runner as reextraction_runner
+from app.services.deletion import runner as deletion_runner
+from app.services.maintenance import runner as maintenance_runner
+from app.services import ocr, upload_jobs
+from app.database import SessionLocal
+from app.services.extraction_pool import pool as extraction_pool
+from app.services.storage import get_storage
+from app.routes import documents_router, search_router, upload_router, auth_router, admin_router, organization_router, metrics_router, health_router
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+configure_logging()
+
+# Tables are created by prestart.py, once, before any worker starts
 
 app = FastAPI(
     title="LexiBox API",
     description="PDF Text Extraction and Search API",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -27,6 +38,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Opt-in stack profiles for sampled or slow requests
+app.add_middleware(ProfilingMiddleware)
+
+# Latency, size and DB metrics, exposed at /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Request ids and access logging
+app.add_middleware(RequestContextMiddleware)
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(upload_router)
@@ -34,11 +54,42 @@ app.include_router(documents_router)
 app.include_router(search_router)
 app.include_router(admin_router)
 app.include_router(organization_router)
+app.include_router(metrics_router)
+app.include_router(health_router)
+
+@app.on_event("startup")
+def check_storage():
+    # Fail at startup, not on the first upload, if the storage backend is misconfigured
+    get_storage()
+
+@app.on_event("startup")
+def fail_stale_uploads():
+    # Uploads whose process died stop making progress; report them as failed.
+    # The deletion runner repeats this, and the retention prune, on its schedule.
+    db = SessionLocal()
+    try:
+        upload_jobs.expire_stale(db)
+        upload_jobs.prune(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def resume_background_jobs():
+    # Pick up a re-extraction job interrupted by a restart
+    reextraction_runner.ensure_running()
+    # Queued deletions and the periodic garbage collection of stored files
+    deletion_runner.ensure_running()
+    # Vacuum, ANALYZE and WAL checkpoints in short slices
+    maintenance_runner.ensure_running()
+
+@app.on_event("shutdown")
+def stop_background_jobs():
+    reextraction_runner.stop()
+    deletion_runner.stop()
+    maintenance_runner.stop()
+    extraction_pool.shutdown()
+    ocr.shutdown()
 
 @app.get("/")
 async def root():
-    return {"message": "Welcome to LexiBox API"}
-
-@app.get("/health")
-async def health_check():
-    return {"status": "healthy"} 
\ No newline at end of file
+    return {"message": "Welcome to LexiBox API"} 
\ No newline at end of file
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Run one database maintenance pass in the foreground: prune unused search terms,
+incremental vacuum, ANALYZE / PRAGMA optimize, WAL checkpoint and an integrity
+check. The API runs the same pass on a schedule (LEXIBOX_MAINTENANCE_INTERVAL).
+
+    python maintain_database.py --budget 300
+
+Databases created before incremental auto-vacuum was enabled need one full
+VACUUM to switch. It rewrites the whole file and blocks writers while it runs,
+so stop the API first:
+
+    python maintain_database.py --enable-incremental-vacuum
+"""
+
+import argparse
+from app.database import engine
+from app.models import Base
+from app.services import maintenance
+
+def enable_incremental_vacuum():
+    with engine.connect() as conn:
+        conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            print("✓ Incremental auto-vacuum is already enabled")
+            return
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+        mode = maintenance.database_status(conn)["auto_vacuum"]
+    print(f"✓ Database rebuilt, auto_vacuum: {mode}")
+
+def maintain_database(args):
+    if engine.dialect.name != "sqlite":
+        print("✓ Nothing to do: maintenance is for SQLite databases")
+        return
+    Base.metadata.create_all(bind=engine)
+    if args.enable_incremental_vacuum:
+        enable_incremental_vacuum()
+    with maintenance.exclusive(maintenance.LOCK_PATH) as acquired:
+        if not acquired:
+            print("✓ Another process is running maintenance; it runs every "
+                  f"{maintenance.INTERVAL:.0f} seconds")
+            return
+        # No user traffic to make way for in the foreground
+        result = maintenance.run_maintenance(budget=args.budget, check_integrity=not args.skip_integrity,
+                                             slice_seconds=args.budget, pause=0)
+    for name, task in result["tasks"].items():
+        details = ", ".join(f"{key}={value}" for key, value in task.items() if key not in ("slices", "seconds", "finished"))
+        print(f"✓ {name}: {'done' if task['finished'] else 'unfinished'} in {task['seconds']}s"
+              + (f" ({details})" if details else ""))
+    print(f"✓ Run {result['id']} {result['status']} in {result['seconds']}s, reclaimed "
+          f"{result['reclaimed_bytes'] / 1024 / 1024:.1f} MB; integrity: {result['integrity'] or 'not checked'}")
+    if result["error"]:
+        print(f"Maintenance failed: {result['error']}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=maintenance.BUDGET,
+                        help="stop after this many seconds (default: %(default)s)")
+    parser.add_argument("--skip-integrity", action="store_true", help="skip PRAGMA quick_check")
+    parser.add_argument("--enable-incremental-vacuum", action="store_true",
+                        help="convert the database to incremental auto-vacuum with a full VACUUM first")
+    maintain_database(parser.parse_args())
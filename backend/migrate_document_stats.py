@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Migration script to add size_bytes and page_count to documents, filled in
+from the stored PDFs, and to recount the admin stat counters afterwards.
+Documents whose file is missing keep NULL (counted as 0).
+"""
+import os
+from sqlalchemy import inspect
+from app.database import SessionLocal, engine
+from app.models import Base, Document
+from app.services import stats
+from app.services.storage import get_storage
+
+def page_count(file_path):
+    import pypdfium2
+    pdf = pypdfium2.PdfDocument(file_path)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+def add_columns():
+    """Add the nullable size_bytes and page_count columns if missing; returns the added ones (also run by prestart.py)"""
+    added = []
+    with engine.begin() as conn:
+        columns = [column["name"] for column in inspect(conn).get_columns("documents")]
+        for column in ("size_bytes", "page_count"):
+            if column not in columns:
+                conn.exec_driver_sql(f"ALTER TABLE documents ADD COLUMN {column} INTEGER")
+                added.append(column)
+    return added
+
+def migrate_document_stats():
+    Base.metadata.create_all(bind=engine)
+    added = add_columns()
+    for column in ("size_bytes", "page_count"):
+        if column in added:
+            print(f"✓ Added {column} to documents")
+        else:
+            print(f"✓ {column} already exists in documents")
+
+    db = SessionLocal()
+    storage = get_storage()
+    try:
+        filled = 0
+        missing = db.query(Document).filter((Document.size_bytes == None) | (Document.page_count == None))  # noqa: E711
+        for document in missing.yield_per(200):
+            try:
+                with storage.local_path(document.file_path) as path:
+                    document.size_bytes = os.path.getsize(path)
+                    document.page_count = page_count(path)
+                filled += 1
+            except Exception as e:
+                print(f"  skipped document {document.id} ({document.file_path}): {e}")
+        db.commit()
+        print(f"✓ Filled in size and page count for {filled} documents")
+        result = stats.reconcile(db)
+        print(f"✓ Stat counters recounted ({result['corrections']} corrected)")
+        print("✓ Migration completed successfully!")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    migrate_document_stats()
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the extractor_version column to documents.
+Documents extracted before this column existed keep NULL (unknown engine).
+"""
+from sqlalchemy import inspect
+from app.database import engine
+
+def add_column():
+    """Add the nullable extractor_version column and its index if missing; True when added (also run by prestart.py)"""
+    with engine.begin() as conn:
+        columns = [column["name"] for column in inspect(conn).get_columns("documents")]
+        added = "extractor_version" not in columns
+        if added:
+            conn.exec_driver_sql("ALTER TABLE documents ADD COLUMN extractor_version VARCHAR")
+        conn.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_documents_extractor_version ON documents (extractor_version)")
+    return added
+
+def migrate_extractor_version():
+    if not inspect(engine).has_table("documents"):
+        print("Database not initialized. Please run prestart.py first to create the database.")
+        return
+    try:
+        if add_column():
+            print("✓ Added extractor_version to documents")
+        else:
+            print("✓ extractor_version already exists in documents")
+        print("✓ ix_documents_extractor_version index ensured")
+        print("✓ Migration completed successfully!")
+    except Exception as e:
+        print(f"Error during migration: {e}")
+
+if __name__ == "__main__":
+    migrate_extractor_version()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Migration script to move uploads stored flat as uploads/<filename> into the
+configured storage: the hash-sharded local layout, or S3 when
+LEXIBOX_STORAGE=s3 (see app/services/storage.py). Each file is stored once
+under a new key, every document that referred to it is updated, and the old
+file is removed. Running it again only picks up what is left.
+
+    python migrate_storage.py
+    python migrate_storage.py --keep    # copy, and leave uploads/ as it is
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+from sqlalchemy import select, update
+from app.database import SessionLocal, engine
+from app.models import Base, Document
+from app.services.storage import LEGACY_DIR, discard, get_storage, new_key
+
+def migrate_storage(args):
+    Base.metadata.create_all(bind=engine)
+    storage = get_storage()
+    db = SessionLocal()
+    try:
+        paths = list(db.execute(
+            select(Document.file_path).where(Document.file_path.startswith(f"{LEGACY_DIR}/")).distinct()
+        ).scalars())
+        print(f"✓ {len(paths)} flat uploads to move into {storage.name} storage")
+        os.makedirs(storage.spool_dir(), exist_ok=True)
+        moved = 0
+        for path in paths:
+            if not os.path.isfile(path):
+                print(f"  skipped {path}: file not found")
+                continue
+            # put() consumes its source, so it gets a copy; a crash leaves at worst an unreferenced file
+            fd, spool_path = tempfile.mkstemp(suffix=".pdf", dir=storage.spool_dir())
+            os.close(fd)
+            try:
+                shutil.copyfile(path, spool_path)
+                key = new_key(path)
+                storage.put(spool_path, key)
+            finally:
+                discard(spool_path)
+            db.execute(update(Document).where(Document.file_path == path).values(file_path=key))
+            db.commit()
+            if not args.keep:
+                discard(path)
+            moved += 1
+        print(f"✓ Moved {moved} files")
+        print("✓ Migration completed successfully!")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keep", action="store_true", help="copy files instead of moving them")
+    migrate_storage(parser.parse_args())
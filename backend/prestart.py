@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+One-time setup to run before starting the API workers.
+
+Creates missing tables and switches SQLite to write-ahead logging, so readers
+in one worker do not block a writer in another. Seeds the admin stat counters
+and the search suggestions on a database that has none yet. New SQLite
+databases are created with incremental auto-vacuum (see maintain_database.py).
+Run it once per deployment, before uvicorn/gunicorn starts (the Dockerfile
+does). Concurrent runs are serialized with a lock file, so running it from
+every container is safe.
+"""
+
+import fcntl
+import os
+from sqlalchemy import inspect
+from app.database import SessionLocal, engine
+from app.models import Base, Document
+from app.services import stats, suggest, vector_index
+from migrate_document_stats import add_columns
+from migrate_extractor_version import add_column as add_extractor_version
+
+LOCK_PATH = os.getenv("LEXIBOX_PRESTART_LOCK", "prestart.lock")
+
+def prestart():
+    with open(LOCK_PATH, "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if engine.dialect.name == "sqlite":
+                with engine.connect() as conn:
+                    # Only takes effect before the first table is created; see maintain_database.py
+                    conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+            Base.metadata.create_all(bind=engine)
+            # create_all does not add columns to existing tables; the stat counters below need these
+            if add_extractor_version():
+                print("✓ Added extractor_version to documents")
+            added = add_columns()
+            if added:
+                print(f"✓ Added {', '.join(added)} to documents; run migrate_document_stats.py to fill them in")
+            # create_all skips tables that exist; indexes added to them later are created here,
+            # once the migrations have added the columns they cover
+            existing = {column["name"] for column in inspect(engine).get_columns("documents")}
+            for index in sorted(Document.__table__.indexes, key=lambda index: index.name):
+                missing = [column.name for column in index.columns if column.name not in existing]
+                if missing:
+                    print(f"Skipped index {index.name}: documents has no {', '.join(missing)} column yet "
+                          "(run the migrate_*.py scripts, then prestart.py again)")
+                    continue
+                index.create(bind=engine, checkfirst=True)
+            print("✓ Database schema up to date")
+            if engine.dialect.name == "sqlite" and os.getenv("LEXIBOX_SQLITE_WAL", "1") != "0":
+                with engine.connect() as conn:
+                    mode = conn.exec_driver_sql("PRAGMA journal_mode=WAL").scalar()
+                print(f"✓ SQLite journal mode: {mode}")
+            db = SessionLocal()
+            try:
+                if not stats.initialized(db):
+                    result = stats.reconcile(db)
+                    print(f"✓ Stat counters seeded ({result['counters']} counters)")
+                elif stats.totals(db)["documents"] and not stats.extractor_versions(db):
+                    # Counters seeded before documents were counted per extractor version
+                    result = stats.reconcile(db)
+                    print(f"✓ Stat counters recounted ({result['corrections']} corrected)")
+                if not suggest.initialized(db):
+                    result = suggest.rebuild(db)
+                    print(f"✓ Search suggestions built ({result['terms']} terms, {result['filenames']} filenames)")
+                dropped = vector_index.reconcile(db)
+                if dropped:
+                    print(f"✓ Semantic index is missing vectors; dropped {dropped} chunk rows "
+                          "(run build_semantic_index.py to embed the documents again)")
+            finally:
+                db.close()
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+if __name__ == "__main__":
+    prestart()
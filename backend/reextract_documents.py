@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Re-extract documents whose extractor version is outdated, in the foreground.
+Continues the active job if there is one, otherwise starts a new job.
+
+    python reextract_documents.py --extractor pypdfium2 --cpu-budget 0.5 --io-budget-mb 10
+"""
+
+import argparse
+from app.database import SessionLocal, engine
+from app.models import Base, ReextractionJob
+from app.services import reextraction
+
+def reextract_documents(args):
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        job = reextraction.active_job(db)
+        if job is None:
+            job = reextraction.start_job(db, extractor=args.extractor, cpu_budget=args.cpu_budget,
+                                         io_budget_mb=args.io_budget_mb, batch_size=args.batch_size)
+            print(f"✓ Started job {job.id}: {job.total} documents to re-extract with {job.target_version}")
+        elif job.status == "paused":
+            job = reextraction.set_status(db, job.id, "running")
+            print(f"✓ Resumed job {job.id}")
+        job_id = job.id
+    finally:
+        db.close()
+
+    with reextraction.exclusive() as acquired:
+        if not acquired:
+            print(f"✓ Job {job_id} is being run by another process; follow it in /admin/stats")
+            return
+        try:
+            status = reextraction.run_job(job_id)
+        except KeyboardInterrupt:
+            print(f"Interrupted; run again to continue job {job_id}")
+            return
+
+    db = SessionLocal()
+    try:
+        summary = reextraction.job_summary(db.get(ReextractionJob, job_id))
+    finally:
+        db.close()
+    print(f"✓ Job {job_id} {status}: {summary['processed']} re-extracted, {summary['failed']} failed")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--extractor", help="target extractor (default: LEXIBOX_PDF_EXTRACTOR)")
+    parser.add_argument("--cpu-budget", type=float, default=reextraction.CPU_BUDGET,
+                        help="fraction of one core to use (default: %(default)s)")
+    parser.add_argument("--io-budget-mb", type=float, default=reextraction.IO_BUDGET_MB,
+                        help="MB/s to read from uploads/ (default: %(default)s)")
+    parser.add_argument("--batch-size", type=int, default=reextraction.BATCH_SIZE)
+    reextract_documents(parser.parse_args())
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Build search index postings for documents stored before the index existed,
+and count them into the search suggestions.
+Safe to re-run: only documents without postings are processed.
+"""
+
+from sqlalchemy import exists, select
+from app.database import SessionLocal, engine
+from app.models import Base, Document, DocumentTerm
+from app.services.search_index import index_document
+from app.services import suggest
+
+BATCH_SIZE = 100
+
+def reindex_search():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    indexed = 0
+    last_id = 0
+    try:
+        while True:
+            documents = db.execute(
+                select(Document)
+                .where(Document.id > last_id, ~exists().where(DocumentTerm.document_id == Document.id))
+                .order_by(Document.id)
+                .limit(BATCH_SIZE)
+            ).scalars().all()
+            if not documents:
+                break
+            for document in documents:
+                index_document(db, document)
+            suggest.add_documents(db, [document.id for document in documents])
+            db.commit()
+            last_id = documents[-1].id
+            indexed += len(documents)
+            print(f"✓ Indexed {indexed} documents")
+    except Exception as e:
+        print(f"Error during reindex: {e}")
+        db.rollback()
+    finally:
+        db.close()
+    print(f"✓ Search index up to date ({indexed} documents indexed)")
+
+if __name__ == "__main__":
+    reindex_search()
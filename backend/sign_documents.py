@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Compute MinHash signatures for documents stored before near-duplicate
+detection existed. Safe to re-run: only unsigned documents are processed.
+"""
+
+from sqlalchemy import exists, select
+from app.database import SessionLocal, engine
+from app.models import Base, Document, DocumentSignature
+from app.services.near_duplicates import sign_document
+
+BATCH_SIZE = 200
+
+def sign_documents():
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    signed = 0
+    last_id = 0
+    try:
+        while True:
+            documents = db.execute(
+                select(Document)
+                .where(Document.id > last_id, ~exists().where(DocumentSignature.document_id == Document.id))
+                .order_by(Document.id)
+                .limit(BATCH_SIZE)
+            ).scalars().all()
+            if not documents:
+                break
+            for document in documents:
+                sign_document(db, document)
+            db.commit()
+            last_id = documents[-1].id
+            signed += len(documents)
+            print(f"✓ Signed {signed} documents")
+    except Exception as e:
+        print(f"Error while signing documents: {e}")
+        db.rollback()
+    finally:
+        db.close()
+    print(f"✓ Near-duplicate index up to date ({signed} documents signed)")
+
+if __name__ == "__main__":
+    sign_documents()
@@ -0,0 +1,83 @@
+"""
+Shared fixtures: the app runs in-process against a scratch SQLite database.
+
+The app keeps `lexibox.db`, `uploads/` and its other state relative to the
+cwd and reads its settings at import time, so the workspace and environment
+are set up here, before anything under app/ is imported. Every test signs up
+its own users, so tests share one database without seeing each other's
+documents.
+"""
+
+import os
+import tempfile
+import uuid
+
+import pytest
+
+WORKDIR = tempfile.mkdtemp(prefix="lexibox-tests-")
+os.chdir(WORKDIR)
+os.environ.setdefault("LEXIBOX_LOG_LEVEL", "WARNING")
+# Tests send requests faster than any tenant would; admission has its own tests
+for operation in ("SEARCH", "UPLOAD"):
+    for setting in ("USER_RATE", "ORG_RATE", "USER_CONCURRENCY", "ORG_CONCURRENCY"):
+        os.environ.setdefault(f"LEXIBOX_{operation}_{setting}", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+# Import the app before the first connection: routes register SQL functions on connect
+import main  # noqa: E402
+import prestart  # noqa: E402
+from benchmarks.corpus import make_pdf  # noqa: E402
+
+prestart.prestart()
+
+ADMIN_EMAIL = "cmcginley@gmail.com"
+
+
+@pytest.fixture(scope="session")
+def client():
+    # Without the context manager: startup hooks would start the background runners
+    return TestClient(main.app)
+
+
+@pytest.fixture
+def signup(client):
+    """signup(org=True) -> auth headers for a new user, in a new organization unless org=False"""
+    def signup(org: bool = True, email: str = None) -> dict:
+        name = uuid.uuid4().hex[:12]
+        response = client.post("/auth/signup", json={
+            "name": name,
+            "email": email or f"{name}@example.com",
+            "password": "secret123",
+            **({"org_name": f"org-{name}"} if org else {}),
+        })
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+    return signup
+
+
+@pytest.fixture(scope="session")
+def admin(client):
+    response = client.post("/auth/signup", json={"name": "Admin", "email": ADMIN_EMAIL, "password": "secret123"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def user(signup):
+    return signup()
+
+
+@pytest.fixture
+def upload(client):
+    """upload(headers, pages, filename=..., **params) -> the 200 response JSON"""
+    def upload(headers: dict, pages, filename: str = None, **params) -> dict:
+        response = client.post(
+            "/upload/",
+            params=params,
+            files={"file": (filename or f"{uuid.uuid4().hex[:8]}.pdf", make_pdf(pages), "application/pdf")},
+            headers=headers,
+        )
+        assert response.status_code in (200, 202), response.text
+        return response.json()
+    return upload
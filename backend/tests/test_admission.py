@@ -0,0 +1,50 @@
+import threading
+
+from app.admission import SEARCH, AdmissionController, Policy
+from app.models import User
+from app.services.extraction_pool import ExtractionPool
+
+
+def test_rate_limit_per_user():
+    controller = AdmissionController()
+    policy = Policy("test", user_rate="2/60", org_rate="0", user_concurrency=0, org_concurrency=0)
+    user = User(id=1, organization_id=None)
+    assert controller.acquire(policy, user) is None
+    assert controller.acquire(policy, user) is None
+    scope, reason, retry_after = controller.acquire(policy, user)
+    assert (scope, reason) == ("user", "rate")
+    assert 0 < retry_after <= 30
+    assert controller.acquire(policy, User(id=2, organization_id=None)) is None
+
+
+def test_concurrency_is_shared_by_an_organization():
+    controller = AdmissionController()
+    policy = Policy("test", user_rate="0", org_rate="0", user_concurrency=2, org_concurrency=2)
+    alice, bob = User(id=1, organization_id=7), User(id=2, organization_id=7)
+    assert controller.acquire(policy, alice) is None
+    assert controller.acquire(policy, bob) is None
+    assert controller.acquire(policy, bob)[:2] == ("org", "concurrency")
+    controller.release(policy, alice)
+    assert controller.acquire(policy, bob) is None
+    assert controller.in_flight() == {"test": {"user:2": 2, "org:7": 2}}
+
+
+def test_throttled_requests_get_429(client, user, monkeypatch):
+    monkeypatch.setitem(SEARCH.rates, "user", (1.0, 60.0))
+    assert client.get("/search/", params={"q": "lease"}, headers=user).status_code == 200
+    response = client.get("/search/", params={"q": "lease"}, headers=user)
+    assert response.status_code == 429
+    assert int(response.headers["retry-after"]) >= 1
+
+
+def test_extraction_is_shared_round_robin_by_weight():
+    pool = ExtractionPool(workers=1, weights={"org:1": 2})
+    gate, order = threading.Event(), []
+    pool.submit("blocker", gate.wait)
+    futures = [pool.submit(tenant, order.append, f"{tenant}#{n}")
+               for tenant, n in [("org:1", 1), ("org:1", 2), ("org:1", 3), ("org:1", 4), ("org:2", 1), ("org:2", 2)]]
+    gate.set()
+    for future in futures:
+        future.result(timeout=10)
+    pool.shutdown()
+    assert order == ["org:1#1", "org:1#2", "org:2#1", "org:1#3", "org:1#4", "org:2#2"]
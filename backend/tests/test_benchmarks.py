@@ -0,0 +1,38 @@
+import asyncio
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks import harness
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_failed_requests_are_counted_not_timed():
+    async def request(index):
+        return 429 if index % 2 else 200
+    summary = asyncio.run(harness.drive(request, 10, 2))
+    assert summary["count"] == 5
+    assert summary["errors"] == 5
+    assert summary["error_statuses"] == {"429": 5}
+
+
+def test_benchmark_run_is_not_throttled(tmp_path):
+    # In a subprocess, since the suite drops the database it runs against, and
+    # without the test environment, so the run has to turn admission off itself
+    env = {key: value for key, value in os.environ.items() if not key.startswith("LEXIBOX_")}
+    output = tmp_path / "bench.json"
+    # Sized past the default limits: 200 /search/ requests from one user (120 a
+    # minute allowed) and 12 concurrent uploads from two users (4 each)
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.run", "--suites", "search,upload", "--sizes", "20",
+         "--requests", "20", "--concurrency", "12", "--users", "2", "--pages", "1",
+         "--workdir", str(tmp_path / "work"), "--output", str(output)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, timeout=600,
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    report = json.loads(output.read_text())
+    rows = [row for rows in report["results"].values() for row in rows]
+    assert rows
+    assert all(row["errors"] == 0 and row["count"] == 20 for row in rows)
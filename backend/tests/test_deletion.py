@@ -0,0 +1,60 @@
+import os
+import time
+
+from app.database import SessionLocal
+from app.models import Document, User
+from app.services import deletion
+from app.services.storage import LocalStorage, get_storage
+
+
+def _me(client, headers):
+    return client.get("/auth/me", headers=headers).json()
+
+
+def test_deleting_a_user_removes_documents_and_files(client, admin, signup, upload, monkeypatch):
+    # Run the job in the test instead of on the runner thread
+    monkeypatch.setattr(deletion.runner, "wake", lambda: None)
+    doomed, kept = signup(), signup()
+    user_id = _me(client, doomed)["id"]
+    documents = [upload(doomed, [f"page {n} to delete"]) for n in range(3)]
+    survivor = upload(kept, ["page to keep"])
+    db = SessionLocal()
+    try:
+        paths = [db.get(Document, document["id"]).file_path for document in documents]
+    finally:
+        db.close()
+    storage = get_storage()
+    assert all(os.path.exists(storage.path(path)) for path in paths)
+
+    response = client.delete(f"/admin/users/{user_id}", headers=admin)
+    assert response.status_code == 202
+    job = response.json()["job"]
+    assert client.delete(f"/admin/users/{user_id}", headers=admin).json()["job"]["id"] == job["id"]
+    monkeypatch.setattr(deletion, "BATCH_SIZE", 2)
+    assert deletion.run_job(job["id"]) == "completed"
+
+    db = SessionLocal()
+    try:
+        assert db.get(User, user_id) is None
+        assert db.query(Document).filter(Document.user_id == user_id).count() == 0
+        assert db.get(Document, survivor["id"]) is not None
+    finally:
+        db.close()
+    assert not any(os.path.exists(storage.path(path)) for path in paths)
+    finished = client.get("/admin/deletions", headers=admin).json()[0]
+    assert (finished["status"], finished["documents_deleted"], finished["files_deleted"]) == ("completed", 3, 3)
+
+
+def test_garbage_collection_removes_old_unreferenced_files(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    for key in ("aa/bb/orphan.pdf", "cc/dd/new.pdf"):
+        os.makedirs(tmp_path / os.path.dirname(key), exist_ok=True)
+        (tmp_path / key).write_bytes(b"%PDF-1.4")
+    old = time.time() - 7200
+    os.utime(tmp_path / "aa/bb/orphan.pdf", (old, old))
+
+    result = deletion.collect_garbage(storage=storage, grace_seconds=3600)
+    assert result["orphaned_files"] == 1
+    assert not (tmp_path / "aa/bb/orphan.pdf").exists()
+    # Younger than the grace period: its document row may not be committed yet
+    assert (tmp_path / "cc/dd/new.pdf").exists()
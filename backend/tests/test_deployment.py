@@ -0,0 +1,41 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from sqlalchemy import create_engine
+
+from app.routes import health
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_readiness_needs_a_migrated_database(client, monkeypatch, tmp_path):
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json()["checks"]["database"]["ready"]
+
+    monkeypatch.setattr(health, "engine", create_engine(f"sqlite:///{tmp_path / 'empty.db'}"))
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "not ready"
+    assert client.get("/health").status_code == 200
+
+
+def test_concurrent_prestarts_are_serialized(tmp_path):
+    # As when every container of a deployment runs it at once on a shared volume
+    env = {key: value for key, value in os.environ.items() if not key.startswith("LEXIBOX_")}
+    env.update(PYTHONPATH=BACKEND_DIR, LEXIBOX_LOG_LEVEL="WARNING")
+    processes = [
+        subprocess.Popen([sys.executable, os.path.join(BACKEND_DIR, "prestart.py")], cwd=tmp_path, env=env,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for _ in range(3)
+    ]
+    for process in processes:
+        stdout, stderr = process.communicate(timeout=120)
+        assert process.returncode == 0, stderr
+        assert "Database schema up to date" in stdout
+
+    with sqlite3.connect(tmp_path / "lexibox.db") as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
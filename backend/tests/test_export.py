@@ -0,0 +1,42 @@
+import csv
+import io
+import json
+
+from app.services import export
+
+
+def test_user_export_streams_only_their_documents(client, signup, upload):
+    owner, other = signup(), signup()
+    documents = [upload(owner, [f"export page {n}"]) for n in range(3)]
+    upload(other, ["someone else's page"])
+
+    response = client.get("/documents/export", params={"fields": "id,filename"}, headers=owner)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert rows == [{"id": document["id"], "filename": document["filename"]} for document in documents]
+
+    assert client.get("/documents/export", params={"fields": "id,user_id"}, headers=owner).status_code == 400
+
+
+def test_admin_csv_export_filters_by_user(client, admin, signup, upload):
+    owner = signup()
+    user_id = client.get("/auth/me", headers=owner).json()["id"]
+    document = upload(owner, ["the only matching indemnity page"])
+    upload(owner, ["nothing to see"])
+
+    response = client.get("/admin/documents/export", headers=admin,
+                          params={"format": "csv", "fields": "id,user_id", "user_id": user_id, "q": "indemnity"})
+    assert response.status_code == 200
+    assert list(csv.reader(io.StringIO(response.text))) == [["id", "user_id"], [str(document["id"]), str(user_id)]]
+
+
+def test_stream_is_chunked_and_complete(client, user, upload, monkeypatch):
+    for n in range(5):
+        upload(user, [f"chunked page {n} " * 20])
+    user_id = client.get("/auth/me", headers=user).json()["id"]
+    monkeypatch.setattr(export, "CHUNK_BYTES", 100)
+    query = export.build_query(["id", "content"], user_id=user_id)
+    chunks = list(export.stream(query, ["id", "content"], batch_size=2))
+    assert len(chunks) > 1
+    assert len(b"".join(chunks).decode().splitlines()) == 5
@@ -0,0 +1,43 @@
+import pytest
+
+from app.database import SessionLocal
+from app.models import Document
+from app.services.extractors import ExtractorUnavailable, available_extractors, get_extractor
+from benchmarks.corpus import make_pdf
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = tmp_path / "sample.pdf"
+    path.write_bytes(make_pdf(["first page text", "second page text"]))
+    return str(path)
+
+
+@pytest.mark.parametrize("name", available_extractors())
+def test_every_installed_backend_extracts_pages(name, pdf_path):
+    progress = []
+    result = get_extractor(name).extract(pdf_path, lambda done, total: progress.append((done, total)))
+    assert [" ".join(page.split()) for page in result.pages] == ["first page text", "second page text"]
+    assert result.extractor_version.startswith(f"{name}-")
+    assert progress[-1] == (2, 2)
+
+
+def test_auto_prefers_pypdfium2():
+    assert get_extractor("auto").name == "pypdfium2"
+
+
+def test_unknown_backends_are_rejected(client, user):
+    with pytest.raises(ExtractorUnavailable):
+        get_extractor("tesseract")
+    response = client.post("/upload/", params={"extractor": "nope"},
+                           files={"file": ("a.pdf", make_pdf(["text"]), "application/pdf")}, headers=user)
+    assert response.status_code == 400
+
+
+def test_uploads_record_the_extractor_version(user, upload):
+    document = upload(user, ["versioned text"], extractor="pypdf2")
+    db = SessionLocal()
+    try:
+        assert db.get(Document, document["id"]).extractor_version.startswith("pypdf2-")
+    finally:
+        db.close()
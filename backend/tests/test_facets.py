@@ -0,0 +1,49 @@
+from datetime import datetime
+
+from app.services.facets import filename_pattern
+
+
+def _ids(response):
+    assert response.status_code == 200, response.text
+    return [document["id"] for document in response.json()]
+
+
+def test_filename_patterns_are_escaped():
+    assert filename_pattern("lease") == "%lease%"
+    assert filename_pattern("contract*.pdf") == "contract%.pdf"
+    assert filename_pattern("50%_off?") == "50\\%\\_off_"
+
+
+def test_filters_sorting_and_facets(client, user, upload):
+    # Too little text for a text layer: counted as a scan
+    one = upload(user, ["short lease"], filename="b-lease.pdf")
+    three = upload(user, ["the long lease, page one", "the long lease, page two", "the long lease, page three"],
+                   filename="a-lease.pdf")
+    two = upload(user, ["the medium memo, page one", "the medium memo, page two"], filename="c-memo.pdf")
+
+    assert _ids(client.get("/documents/", params={"sort": "pages"}, headers=user)) == [one["id"], two["id"], three["id"]]
+    assert _ids(client.get("/documents/", params={"sort": "-filename"}, headers=user)) == [two["id"], one["id"], three["id"]]
+    assert _ids(client.get("/documents/", params={"min_pages": 2, "filename": "*lease*", "sort": "size"},
+                           headers=user)) == [three["id"]]
+
+    response = client.get("/documents/", params={"facets": "true", "max_pages": 2}, headers=user)
+    body = response.json()
+    assert body["total"] == 2 and len(body["documents"]) == 2
+    assert body["facets"]["month"] == [{"value": datetime.utcnow().strftime("%Y-%m"), "documents": 2}]
+    assert sorted(body["facets"]["file_type"], key=lambda entry: entry["value"]) == \
+        [{"value": "scanned", "documents": 1}, {"value": "text", "documents": 1}]
+    assert [owner["documents"] for owner in body["facets"]["owner"]] == [2]
+    assert _ids(client.get("/documents/", params={"file_type": "scanned"}, headers=user)) == [one["id"]]
+
+
+def test_search_order_is_deterministic(client, user, upload):
+    documents = [upload(user, [f"renewal clause {n}"])["id"] for n in range(4)]
+    # Substring matches come in upload order, query matches newest first, unless sorted
+    assert _ids(client.get("/search/", params={"q": "renewal"}, headers=user)) == documents
+    assert _ids(client.get("/search/", params={"q": "renewal", "mode": "query"}, headers=user)) == documents[::-1]
+    assert _ids(client.get("/search/", params={"q": "renewal", "sort": "-upload_date"}, headers=user)) == documents[::-1]
+
+
+def test_organization_scope_needs_an_org_admin(client, signup):
+    member = signup(org=False)
+    assert client.get("/documents/", params={"scope": "organization"}, headers=member).status_code == 403
@@ -0,0 +1,30 @@
+from app.services.search_index import edit_distance, tokenize
+
+
+def test_tokenize_rejoins_hyphenated_line_breaks():
+    assert tokenize("Indemni-\nfication ﬁnal X") == ["indemnification", "final"]
+
+
+def test_edit_distance_gives_up_past_the_limit():
+    assert edit_distance("indemnity", "indemnty", 2) == 1
+    assert edit_distance("kitten", "sitting", 2) == 3
+    assert edit_distance("contract", "agreement", 1) == 2
+
+
+def _search(client, headers, q, **params):
+    response = client.get("/search/", params={"q": q, "mode": "fuzzy", **params}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [document["id"] for document in response.json()]
+
+
+def test_misspelled_words_match_own_documents(client, signup, upload):
+    owner, other = signup(), signup()
+    match = upload(owner, ["mutual indemnification clause", "governing law"])
+    upload(owner, ["termination for convenience"])
+    upload(other, ["mutual indemnification clause"])
+
+    assert _search(client, owner, "indemnificaton clause") == [match["id"]]
+    assert _search(client, owner, "mutal indemnificaton") == [match["id"]]
+    assert _search(client, owner, "indemnificaton", max_distance=0) == []
+    # Every word has to match
+    assert _search(client, owner, "indemnificaton arbitration") == []
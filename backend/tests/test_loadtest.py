@@ -0,0 +1,39 @@
+import argparse
+import asyncio
+
+import pytest
+
+import main
+from benchmarks import harness, loadtest
+
+
+def test_mix_rejects_unknown_operations():
+    assert loadtest.parse_mix("search=3,list=1") == {"search": 3.0, "list": 1.0}
+    with pytest.raises(argparse.ArgumentTypeError):
+        loadtest.parse_mix("search=1,explode=2")
+
+
+def test_stats_count_lock_failures_separately():
+    stats = loadtest.Stats()
+    stats.record("upload", 0.01, 200)
+    stats.record("upload", 0.02, 500, "sqlite3.OperationalError: database is locked")
+    stats.record("upload", 0.03, 0, "connection reset")
+    report = stats.report(1.0)["operations"]["upload"]
+    assert report["errors"] == 2
+    assert report["database_locked"] == 1
+    assert report["statuses"] == {"200": 1, "500": 1, "0": 1}
+
+
+def test_one_level_of_mixed_traffic():
+    args = loadtest.parse_args(["--users", "4", "--orgs", "2", "--pages", "1", "--duration", "1"])
+
+    async def run():
+        async with harness.asgi_client(main.app) as client:
+            test = loadtest.LoadTest(client, args)
+            await test.setup()
+            return await test.run_level(4)
+
+    report = asyncio.run(run())
+    assert report["concurrency"] == 4
+    assert report["overall"]["count"] > 0
+    assert report["overall"]["errors"] == 0, report["operations"]
@@ -0,0 +1,36 @@
+import json
+import logging
+
+from app.log import JsonFormatter, RequestIdFilter, SamplingFilter, request_id_var
+
+
+def _record(level=logging.INFO, **extra):
+    record = logging.LogRecord("lexibox.test", level, __file__, 1, "hello %s", ("world",), None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_json_lines_carry_request_id_and_extras():
+    token = request_id_var.set("req-1")
+    try:
+        record = _record(document_id=7)
+        RequestIdFilter().filter(record)
+    finally:
+        request_id_var.reset(token)
+    line = json.loads(JsonFormatter().format(record))
+    assert line["message"] == "hello world"
+    assert line["level"] == "INFO"
+    assert line["request_id"] == "req-1"
+    assert line["document_id"] == 7
+
+
+def test_sampling_never_drops_warnings():
+    sampler = SamplingFilter(0.0)
+    assert not sampler.filter(_record(logging.INFO))
+    assert sampler.filter(_record(logging.WARNING))
+
+
+def test_request_id_is_echoed(client):
+    response = client.get("/health", headers={"X-Request-ID": "abc123"})
+    assert response.headers["x-request-id"] == "abc123"
+    assert client.get("/health").headers["x-request-id"]
@@ -0,0 +1,64 @@
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime
+
+from app.database import SessionLocal
+from app.models import SearchTerm
+from app.services import maintenance
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _term_exists(term):
+    db = SessionLocal()
+    try:
+        return db.query(SearchTerm).filter(SearchTerm.term == term).first() is not None
+    finally:
+        db.close()
+
+
+def test_windows_can_wrap_past_midnight():
+    assert maintenance.in_window(datetime(2024, 1, 1, 3, 30), "01:00-05:00")
+    assert not maintenance.in_window(datetime(2024, 1, 1, 5, 0), "01:00-05:00")
+    assert maintenance.in_window(datetime(2024, 1, 1, 23, 0), "22:00-04:00")
+    assert maintenance.in_window(datetime(2024, 1, 1, 12, 0), "")
+
+
+def test_run_prunes_unused_terms_and_is_recorded(client, admin, user, upload, monkeypatch):
+    monkeypatch.setattr(maintenance, "MAX_RPS", 0)
+    document = upload(user, ["zygomorphic estoppel"])
+    assert client.delete(f"/documents/{document['id']}", headers=user).status_code == 200
+    assert _term_exists("zygomorphic")
+
+    result = maintenance.run_maintenance(budget=30, check_integrity=True, pause=0)
+    assert result["status"] == "completed", result
+    assert result["tasks"]["prune_terms"]["terms_removed"] >= 1
+    assert result["integrity"] == "ok"
+    assert not _term_exists("zygomorphic")
+    runs = client.get("/admin/maintenance/runs", headers=admin).json()
+    assert runs[0]["id"] == result["id"]
+
+
+def test_busy_traffic_defers_slices(monkeypatch):
+    monkeypatch.setattr(maintenance._Traffic, "busy", lambda self: True)
+    result = maintenance.run_maintenance(budget=0.2, check_integrity=False, pause=0.01)
+    assert result["status"] == "partial"
+    assert result["tasks"]["prune_terms"]["deferred"] > 0
+    assert not result["tasks"]["prune_terms"]["finished"]
+
+
+def test_existing_database_is_switched_to_incremental_vacuum(tmp_path):
+    with sqlite3.connect(tmp_path / "lexibox.db") as conn:
+        conn.execute("CREATE TABLE legacy (id INTEGER PRIMARY KEY)")
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+    env = {key: value for key, value in os.environ.items() if not key.startswith("LEXIBOX_")}
+    env.update(PYTHONPATH=BACKEND_DIR, LEXIBOX_LOG_LEVEL="WARNING")
+    result = subprocess.run([sys.executable, os.path.join(BACKEND_DIR, "maintain_database.py"),
+                             "--enable-incremental-vacuum", "--budget", "30"],
+                            cwd=tmp_path, env=env, capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert "completed" in result.stdout
+    with sqlite3.connect(tmp_path / "lexibox.db") as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
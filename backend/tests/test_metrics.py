@@ -0,0 +1,35 @@
+from app.metrics import Histogram
+
+
+def _sample(text: str, name: str, **labels) -> float:
+    """Value of the first `name{...}` line whose labels include `labels`"""
+    for line in text.splitlines():
+        if line.startswith(name + "{") and all(f'{key}="{value}"' in line for key, value in labels.items()):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+def test_requests_are_counted_per_route_template(client, user, upload):
+    document = upload(user, ["metrics page"])
+    before = _sample(client.get("/metrics").text, "lexibox_http_requests_total", method="GET",
+                     route="/documents/{document_id}", status="200")
+    assert client.get(f"/documents/{document['id']}", headers=user).status_code == 200
+    text = client.get("/metrics").text
+    after = _sample(text, "lexibox_http_requests_total", method="GET", route="/documents/{document_id}", status="200")
+    assert after == before + 1
+    # The path parameter must not leak into label values
+    assert f'route="/documents/{document["id"]}"' not in text
+    assert _sample(text, "lexibox_db_queries_per_request_count", route="/documents/{document_id}") >= 1
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("lexibox_test_latency_seconds", "test", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+    assert histogram._samples() == [
+        'lexibox_test_latency_seconds_bucket{le="0.1"} 1',
+        'lexibox_test_latency_seconds_bucket{le="1"} 2',
+        'lexibox_test_latency_seconds_bucket{le="+Inf"} 3',
+        "lexibox_test_latency_seconds_sum 5.55",
+        "lexibox_test_latency_seconds_count 3",
+    ]
@@ -0,0 +1,32 @@
+from app.services.near_duplicates import minhash, similarity
+
+CONTRACT = (
+    "This agreement is made between the landlord and the tenant for the lease of the premises "
+    "described below. The tenant shall pay the monthly rent on the first day of each month and "
+    "shall keep the premises in good repair. The landlord shall maintain the roof, the structure "
+    "and the common areas. Either party may terminate this agreement with ninety days written notice."
+)
+
+
+def test_similarity_estimates_shingle_overlap():
+    assert similarity(minhash(CONTRACT), minhash(CONTRACT)) == 1.0
+    edited = CONTRACT.replace("ninety", "sixty")
+    assert 0.7 < similarity(minhash(CONTRACT), minhash(edited)) < 1.0
+    assert similarity(minhash(CONTRACT), minhash("an unrelated memo about the office party")) < 0.1
+
+
+def test_uploads_report_near_duplicates_of_the_same_user(client, signup, upload):
+    owner, other = signup(), signup()
+    original = upload(owner, [CONTRACT])
+    upload(other, [CONTRACT])
+    upload(owner, ["a short unrelated memo about parking spaces"])
+
+    revised = upload(owner, [CONTRACT.replace("ninety", "sixty")])
+    assert [duplicate["id"] for duplicate in revised["near_duplicates"]] == [original["id"]]
+
+    response = client.get(f"/documents/{original['id']}/similar", params={"threshold": 0.5}, headers=owner)
+    assert response.status_code == 200
+    assert [duplicate["id"] for duplicate in response.json()] == [revised["id"]]
+
+    unchecked = upload(owner, [CONTRACT], check_duplicates="false")
+    assert unchecked["near_duplicates"] == []
@@ -0,0 +1,63 @@
+import os
+
+import pytest
+
+from app.database import SessionLocal
+from app.models import Document
+from app.services import ocr
+
+FAKE_TESSERACT = """#!/bin/sh
+if [ "$1" = "--version" ]; then echo "tesseract 5.9.9"; exit 0; fi
+cat > /dev/null
+echo run >> "$(dirname "$0")/runs"
+echo "recognized scanned indemnity text"
+"""
+
+
+def _stored(document_id):
+    db = SessionLocal()
+    try:
+        document = db.get(Document, document_id)
+        return document.content, document.extractor_version
+    finally:
+        db.close()
+
+
+def test_only_pages_without_text_need_ocr():
+    assert ocr.needs_ocr(["", "  ", "a full page of extracted text here", "short"]) == [0, 1, 3]
+
+
+@pytest.fixture
+def fake_tesseract(tmp_path, monkeypatch):
+    """A `tesseract` on PATH that counts its runs; the workers inherit the environment"""
+    binary = tmp_path / "bin" / "tesseract"
+    binary.parent.mkdir()
+    binary.write_text(FAKE_TESSERACT)
+    binary.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{binary.parent}:{os.environ['PATH']}")
+    monkeypatch.setenv("LEXIBOX_OCR_CACHE_DIR", str(tmp_path / "cache"))
+    ocr.shutdown()
+    ocr.tesseract_version.cache_clear()
+    yield binary.parent / "runs"
+    ocr.shutdown()
+    ocr.tesseract_version.cache_clear()
+
+
+def test_scanned_pages_are_recognized_once(user, upload, fake_tesseract):
+    assert ocr.available()
+    first = upload(user, ["", "a page that already has a text layer"])
+    content, version = _stored(first["id"])
+    assert "recognized scanned indemnity text" in content
+    assert "already has a text layer" in content
+    assert version.endswith("+tesseract-5.9.9")
+
+    # The same scan again is answered from the page cache
+    second = upload(user, ["", "a page that already has a text layer"])
+    assert "recognized scanned indemnity text" in _stored(second["id"])[0]
+    assert fake_tesseract.read_text().split() == ["run"]
+
+
+def test_missing_tesseract_is_recorded(user, upload, monkeypatch):
+    monkeypatch.setattr(ocr, "available", lambda: False)
+    document = upload(user, [""])
+    assert _stored(document["id"])[1].endswith(f"+{ocr.UNAVAILABLE}")
@@ -0,0 +1,39 @@
+from collections import Counter
+
+from app import profiling
+from app.profiling import PROFILE_ID_PATTERN, ProfileStore
+
+
+def test_profile_ids_ignore_the_client_request_id(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=10)
+    profile_id = store.save({"request_id": "../../etc/passwd"}, Counter({"main;handler": 3}))
+    assert PROFILE_ID_PATTERN.match(profile_id)
+    assert store.path_for(profile_id) == str(tmp_path / f"{profile_id}.folded")
+    assert store.list()[0]["request_id"] == "../../etc/passwd"
+    assert store.path_for("../../etc/passwd") is None
+
+
+def test_old_profiles_are_pruned(tmp_path):
+    store = ProfileStore(str(tmp_path), max_files=2)
+    for _ in range(4):
+        store.save({}, Counter({"main": 1}))
+    assert len(store.list()) == 2
+    assert len(list(tmp_path.glob("*.folded"))) == 2
+
+
+def test_sampled_requests_are_captured(client, admin, user, upload, monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling.config, "sample_rate", 1.0)
+    monkeypatch.setattr(profiling.store, "directory", str(tmp_path))
+    # A request shorter than one sampling interval may finish before the first sample
+    for _ in range(5):
+        upload(user, ["profiled upload"] * 5)
+        if profiling.store.list():
+            break
+    monkeypatch.setattr(profiling.config, "sample_rate", 0.0)
+
+    profiles = client.get("/admin/profiles", headers=admin).json()
+    assert profiles and profiles[0]["route"] == "/upload/"
+    response = client.get(f"/admin/profiles/{profiles[0]['id']}", headers=admin)
+    assert response.status_code == 200
+    assert response.text.strip()
+    assert client.get("/admin/profiles", headers=user).status_code == 403
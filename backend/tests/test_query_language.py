@@ -0,0 +1,38 @@
+import pytest
+
+from app.services.query_parser import And, Not, Or, Phrase, QuerySyntaxError, Term, parse_query
+
+
+def test_parse_precedence_and_negation():
+    node = parse_query('(termination OR renewal) -draft "force majeure"')
+    assert isinstance(node, And)
+    assert any(isinstance(child, Or) for child in node.children)
+    assert Not(Term("draft")) in node.children
+    assert Phrase(["force", "majeure"]) in node.children
+
+
+@pytest.mark.parametrize("query", ["(lease OR loan", "lease AND", "lease)", "OR", '""', "filename:"])
+def test_syntax_errors(query):
+    with pytest.raises(QuerySyntaxError):
+        parse_query(query)
+
+
+def _search(client, headers, q):
+    response = client.get("/search/", params={"q": q, "mode": "query"}, headers=headers)
+    assert response.status_code == 200, response.text
+    return {document["filename"] for document in response.json()}
+
+
+def test_boolean_and_phrase_queries(client, user, upload):
+    upload(user, ["the force majeure clause", "indemnification by the tenant"], filename="lease.pdf")
+    upload(user, ["majeure force is not a phrase", "arbitration in london"], filename="loan.pdf")
+    upload(user, ["indemnification draft"], filename="draft-lease.pdf")
+
+    assert _search(client, user, '"force majeure"') == {"lease.pdf"}
+    assert _search(client, user, "indemnification AND NOT draft") == {"lease.pdf"}
+    assert _search(client, user, "arbitration OR draft") == {"loan.pdf", "draft-lease.pdf"}
+    assert _search(client, user, "indemn* filename:*lease*") == {"lease.pdf", "draft-lease.pdf"}
+    assert _search(client, user, "nonexistentword OR arbitration") == {"loan.pdf"}
+
+    response = client.get("/search/", params={"q": "(lease OR", "mode": "query"}, headers=user)
+    assert response.status_code == 400
@@ -0,0 +1,62 @@
+import pytest
+
+from app.database import SessionLocal
+from app.services import quotas
+from benchmarks.corpus import make_pdf
+
+
+def _post(client, headers, text):
+    return client.post("/upload/", files={"file": ("quota.pdf", make_pdf([text]), "application/pdf")}, headers=headers)
+
+
+def _limit(client, headers, monkeypatch, **limits):
+    scope = f"user:{client.get('/auth/me', headers=headers).json()['id']}"
+    monkeypatch.setitem(quotas.OVERRIDES, scope, limits)
+    return scope
+
+
+def test_amounts_and_overrides_are_parsed():
+    assert quotas.parse_amount("2G") == 2 * 1024 ** 3
+    assert quotas.parse_amount("1.5kb") == 1536
+    assert quotas._parse_overrides("org:3:bytes=50M, user:12:documents=10") == \
+        {"org:3": {"bytes": 50 * 1024 ** 2}, "user:12": {"documents": 10}}
+    with pytest.raises(ValueError):
+        quotas._parse_overrides("team:3:bytes=1G")
+
+
+def test_document_limit_refuses_further_uploads(client, user, upload, monkeypatch):
+    scope = _limit(client, user, monkeypatch, documents=2)
+    upload(user, ["first document within the quota"])
+    upload(user, ["second document within the quota"])
+    response = _post(client, user, "one document too many")
+    assert response.status_code == 403
+    assert "2 documents of 2 documents used" in response.json()["detail"]
+
+    db = SessionLocal()
+    try:
+        assert quotas.usage(db, scope)["documents"] == {"used": 2, "limit": 2}
+        near = [entry for entry in quotas.near_limit(db) if entry["scope"] == scope]
+    finally:
+        db.close()
+    assert near == [{"scope": scope, "resource": "documents", "used": 2, "limit": 2, "share": 1.0}]
+
+
+def test_oversized_upload_is_cut_off(client, user, monkeypatch):
+    _limit(client, user, monkeypatch, bytes=100)
+    response = _post(client, user, "larger than a hundred bytes once it is a PDF")
+    assert response.status_code == 413
+    assert client.get("/documents/", headers=user).json() == []
+
+
+def test_near_limit_reads_default_limits(client, user, upload, monkeypatch):
+    upload(user, ["the organization's only document"])
+    scope = f"org:{client.get('/auth/me', headers=user).json()['organization_id']}"
+    monkeypatch.setitem(quotas.DEFAULTS["org"], "documents", 1)
+    db = SessionLocal()
+    try:
+        near = quotas.near_limit(db)
+    finally:
+        db.close()
+    assert {"scope": scope, "resource": "documents", "used": 1, "limit": 1, "share": 1.0} in near
+    # Users have no default limit, so none of their counters are read
+    assert not any(entry["scope"].startswith("user:") for entry in near)
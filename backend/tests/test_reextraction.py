@@ -0,0 +1,49 @@
+import pytest
+
+from app.database import SessionLocal
+from app.models import Document
+from app.services import reextraction
+from app.services.extractors import get_extractor
+from app.services.reextraction import Throttle, is_current
+
+
+def test_throttle_keeps_work_under_budget():
+    throttle = Throttle(cpu_budget=0.25, io_budget_mb=1)
+    assert throttle.delay(cpu_seconds=0.1, elapsed=0.1, bytes_read=0) == pytest.approx(0.3)
+    assert throttle.delay(cpu_seconds=0.0, elapsed=0.5, bytes_read=2 * 1024 * 1024) == pytest.approx(1.5)
+    assert throttle.delay(cpu_seconds=0.01, elapsed=1.0, bytes_read=0) == 0.0
+
+
+def test_current_versions_include_the_ocr_suffix():
+    assert is_current("pypdfium2-4.30.0+tesseract-5.3.0", "pypdfium2-4.30.0")
+    assert not is_current("pypdf2-3.0.1", "pypdfium2-4.30.0")
+    assert not is_current(None, "pypdfium2-4.30.0")
+
+
+def test_outdated_documents_are_reextracted(client, admin, user, upload, monkeypatch):
+    # Run the job in the test instead of on the runner thread
+    monkeypatch.setattr(reextraction.runner, "ensure_running", lambda: None)
+    document = upload(user, ["text from an older engine"], extractor="pypdf2")
+    assert client.get("/admin/stats", headers=admin).json()["reextraction"]["outdated_documents"] >= 1
+
+    response = client.post("/admin/reextraction", json={"cpu_budget": 16, "io_budget_mb": 0}, headers=admin)
+    assert response.status_code == 200, response.text
+    job = response.json()
+    assert client.post("/admin/reextraction", json={}, headers=admin).status_code == 409
+
+    assert client.post(f"/admin/reextraction/{job['id']}/pause", headers=admin).json()["status"] == "paused"
+    assert reextraction.run_job(job["id"]) == "paused"
+    assert client.post(f"/admin/reextraction/{job['id']}/resume", headers=admin).json()["status"] == "running"
+    assert reextraction.run_job(job["id"]) == "completed"
+
+    db = SessionLocal()
+    try:
+        stored = db.get(Document, document["id"])
+        assert stored.extractor_version == get_extractor().version
+        assert "older engine" in stored.content
+    finally:
+        db.close()
+    summary = client.get("/admin/stats", headers=admin).json()["reextraction"]
+    assert summary["outdated_documents"] == 0
+    assert summary["job"]["status"] == "completed"
+    assert summary["job"]["processed"] == job["total"]
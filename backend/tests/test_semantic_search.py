@@ -0,0 +1,49 @@
+from app.database import SessionLocal
+from app.models import DocumentChunk
+from app.services import vector_index
+
+
+def _search(client, headers, q):
+    response = client.get("/search/", params={"q": q, "mode": "semantic", "limit": 5}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [document["id"] for document in response.json()]
+
+
+def test_semantic_results_are_ranked_and_scoped(client, signup, upload):
+    owner, other = signup(), signup()
+    lease = upload(owner, ["the landlord leases the apartment to the tenant for monthly rent"])
+    upload(owner, ["the borrower repays the loan with interest to the bank"])
+    copy = upload(other, ["the landlord leases the apartment to the tenant for monthly rent"])
+
+    results = _search(client, owner, "tenant rent apartment landlord")
+    assert results[0] == lease["id"]
+    assert copy["id"] not in results
+
+
+def test_index_survives_a_restart(client, user, upload):
+    document = upload(user, ["shipment of perishable cargo by refrigerated container"])
+    # A new process opens the vector files from disk
+    vector_index._store = None
+    assert _search(client, user, "refrigerated cargo shipment")[0] == document["id"]
+
+
+def test_lost_index_is_detected_and_repaired(client, user, upload, monkeypatch, tmp_path):
+    upload(user, ["copyright license for the software source code"])
+    # Restart against an empty index directory, as with an unpersisted volume
+    monkeypatch.setattr(vector_index, "INDEX_DIR", str(tmp_path / "semantic_index"))
+    monkeypatch.setattr(vector_index, "_store", None)
+
+    # Chunk ids would collide with the rows already in the database
+    stored = upload(user, ["uploaded while the index is behind"])
+    assert stored["id"]
+
+    db = SessionLocal()
+    try:
+        assert vector_index.reconcile(db) > 0
+        assert db.query(DocumentChunk).count() == 0
+        assert vector_index.reconcile(db) == 0
+    finally:
+        db.close()
+
+    document = upload(user, ["trademark registration for the brand name"])
+    assert _search(client, user, "trademark brand registration") == [document["id"]]
@@ -0,0 +1,19 @@
+from app import serialization
+
+
+def _bodies(client, headers, document_id):
+    listing = client.get("/documents/", headers=headers)
+    single = client.get(f"/documents/{document_id}", headers=headers)
+    assert listing.status_code == single.status_code == 200
+    return listing.json(), single.json()
+
+
+def test_fast_path_matches_validated_responses(client, user, upload, monkeypatch):
+    document = upload(user, ["café clause § 4.2", "second page"])
+    upload(user, ["another document"])
+    fast = _bodies(client, user, document["id"])
+
+    monkeypatch.setattr(serialization, "FAST_PATH", False)
+    monkeypatch.setattr(serialization, "USE_ORJSON", False)
+    assert _bodies(client, user, document["id"]) == fast
+    assert list(fast[1]) == list(serialization.DocumentResponse.model_fields)
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import subprocess
+import sys
+
+from app.database import SessionLocal
+from app.models import StatCounter
+from app.services import stats
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _reconcile(client, admin):
+    response = client.post("/admin/stats/reconcile", headers=admin)
+    assert response.status_code == 200
+    return response.json()["corrections"]
+
+
+def test_counters_follow_uploads_and_deletes(client, admin, user, upload):
+    _reconcile(client, admin)
+    me = client.get("/auth/me", headers=user).json()
+    before = client.get("/admin/stats", headers=admin).json()
+
+    first = upload(user, ["one", "two", "three"])
+    upload(user, ["four"])
+    assert client.delete(f"/documents/{first['id']}", headers=user).status_code == 200
+
+    after = client.get("/admin/stats", headers=admin).json()
+    assert after["total_documents"] == before["total_documents"] + 1
+    assert after["total_pages"] == before["total_pages"] + 1
+    org = client.get(f"/admin/stats/organizations/{me['organization_id']}", headers=admin).json()
+    assert (org["users"], org["documents"], org["pages"]) == (1, 1, 1)
+    assert org["daily"][-1]["uploads"] == 2
+    assert org["daily"][-1]["deletions"] == 1
+    # Nothing for a full recount to correct
+    assert _reconcile(client, admin) == 0
+
+
+def test_reconcile_corrects_drift(client, admin, user, upload):
+    upload(user, ["drifting"])
+    scope = stats.user_scope(client.get("/auth/me", headers=user).json()["id"])
+    db = SessionLocal()
+    try:
+        db.get(StatCounter, (scope, "", "documents")).value += 5
+        db.commit()
+        assert stats.totals(db, scope)["documents"] == 6
+        assert _reconcile(client, admin) > 0
+        db.expire_all()
+        assert stats.totals(db, scope)["documents"] == 1
+    finally:
+        db.close()
+
+
+# The tables as they were before documents had sizes, page counts or extractor versions
+LEGACY_SCHEMA = """
+CREATE TABLE organizations (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL UNIQUE,
+                            created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), updated_at DATETIME);
+CREATE TABLE users (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, email VARCHAR NOT NULL UNIQUE,
+                    hashed_password VARCHAR NOT NULL, is_admin BOOLEAN, is_org_admin BOOLEAN,
+                    organization_id INTEGER REFERENCES organizations (id),
+                    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP), updated_at DATETIME);
+CREATE TABLE documents (id INTEGER PRIMARY KEY, filename VARCHAR NOT NULL, file_path VARCHAR NOT NULL,
+                        content TEXT NOT NULL, upload_date DATETIME DEFAULT (CURRENT_TIMESTAMP),
+                        user_id INTEGER NOT NULL REFERENCES users (id));
+INSERT INTO users (id, name, email, hashed_password, is_admin) VALUES (1, 'Old', 'old@example.com', 'x', 0);
+INSERT INTO documents (id, filename, file_path, content, user_id)
+    VALUES (1, 'old.pdf', 'uploads/old.pdf', 'old text', 1);
+"""
+
+
+def test_prestart_upgrades_a_legacy_database(tmp_path):
+    with sqlite3.connect(tmp_path / "lexibox.db") as conn:
+        conn.executescript(LEGACY_SCHEMA)
+    env = {key: value for key, value in os.environ.items() if not key.startswith("LEXIBOX_")}
+    env.update(PYTHONPATH=BACKEND_DIR, LEXIBOX_LOG_LEVEL="WARNING")
+    result = subprocess.run([sys.executable, os.path.join(BACKEND_DIR, "prestart.py")], cwd=tmp_path, env=env,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert "Added extractor_version to documents" in result.stdout
+
+    with sqlite3.connect(tmp_path / "lexibox.db") as conn:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+        assert {"extractor_version", "size_bytes", "page_count"} <= columns
+        counters = dict(conn.execute("SELECT scope || '/' || name, value FROM stat_counters WHERE day = ''"))
+    assert counters["all/documents"] == 1
+    assert counters["extractor/unknown"] == 1
@@ -0,0 +1,85 @@
+import argparse
+import os
+import re
+import time
+
+from app.database import SessionLocal
+from app.models import Document
+from app.services import deletion
+from app.services.storage import SPOOL_DIR, LocalStorage, get_storage
+
+from migrate_storage import migrate_storage
+
+
+def _age(path, seconds=7200):
+    old = time.time() - seconds
+    os.utime(path, (old, old))
+
+
+def test_keys_are_sharded_by_their_leading_digits(user, upload):
+    document = upload(user, ["sharded page"])
+    db = SessionLocal()
+    try:
+        key = db.get(Document, document["id"]).file_path
+    finally:
+        db.close()
+    match = re.fullmatch(r"([0-9a-f]{2})/([0-9a-f]{2})/([0-9a-f]{32})\.pdf", key)
+    assert match and match.group(3).startswith(match.group(1) + match.group(2))
+    assert os.path.isfile(get_storage().path(key))
+
+
+def test_listing_skips_uploads_still_being_received(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    source = tmp_path / "source.pdf"
+    source.write_bytes(b"%PDF-1.4")
+    storage.put(str(source), "ab/cd/stored.pdf")
+    (tmp_path / SPOOL_DIR).mkdir()
+    (tmp_path / SPOOL_DIR / "partial.pdf").write_bytes(b"%PDF-1.4 half")
+
+    assert [stored.key for stored in storage.list()] == ["ab/cd/stored.pdf"]
+    with storage.local_path("ab/cd/stored.pdf") as path:
+        assert open(path, "rb").read() == b"%PDF-1.4"
+    assert storage.delete("ab/cd/stored.pdf")
+    assert not storage.delete("ab/cd/stored.pdf")
+
+
+def test_garbage_collection_keeps_spool_files(tmp_path):
+    storage = LocalStorage(str(tmp_path))
+    (tmp_path / SPOOL_DIR).mkdir()
+    spooled = tmp_path / SPOOL_DIR / "upload-in-progress.pdf"
+    spooled.write_bytes(b"%PDF-1.4 still arriving")
+    (tmp_path / "ef" / "01").mkdir(parents=True)
+    orphan = tmp_path / "ef" / "01" / "orphan.pdf"
+    orphan.write_bytes(b"%PDF-1.4")
+    # A stalled upload can be older than any grace period
+    _age(spooled)
+    _age(orphan)
+
+    result = deletion.collect_garbage(storage=storage, grace_seconds=0)
+    assert result["orphaned_files"] == 1
+    assert not orphan.exists()
+    assert spooled.exists()
+
+
+def test_flat_uploads_are_migrated_to_sharded_keys(user, upload):
+    document = upload(user, ["legacy page"])
+    storage = get_storage()
+    db = SessionLocal()
+    try:
+        row = db.get(Document, document["id"])
+        legacy = f"uploads/legacy-{document['id']}.pdf"
+        os.replace(storage.path(row.file_path), legacy)
+        row.file_path = legacy
+        db.commit()
+    finally:
+        db.close()
+
+    migrate_storage(argparse.Namespace(keep=False))
+    db = SessionLocal()
+    try:
+        key = db.get(Document, document["id"]).file_path
+    finally:
+        db.close()
+    assert not key.startswith("uploads/")
+    assert os.path.isfile(storage.path(key))
+    assert not os.path.exists(legacy)
@@ -0,0 +1,50 @@
+from app.database import SessionLocal
+from app.models import Suggestion
+from app.services import suggest
+
+
+def _suggest(client, headers, q, **params):
+    response = client.get("/search/suggest", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _dictionary(user_id):
+    db = SessionLocal()
+    try:
+        return sorted(db.query(Suggestion.kind, Suggestion.key, Suggestion.document_count)
+                      .filter(Suggestion.user_id == user_id).all())
+    finally:
+        db.close()
+
+
+def test_completions_are_ranked_by_document_count(client, user, signup, upload):
+    upload(user, ["mutual indemnity"], filename="Indemnity Agreement.pdf")
+    upload(user, ["indemnity cap"], filename="Lease.pdf")
+    removed = upload(user, ["indemnify the seller"], filename="Sale.pdf")
+    upload(signup(), ["indicative terms"])
+
+    body = _suggest(client, user, "mutual Ind")
+    assert [(term["term"], term["documents"]) for term in body["terms"]] == [("indemnity", 2), ("indemnify", 1)]
+    assert body["terms"][0]["query"] == "mutual indemnity"
+    assert [term["term"] for term in _suggest(client, user, "ind", limit=1)["terms"]] == ["indemnity"]
+    assert _suggest(client, user, "indemnity ")["terms"] == []
+    assert _suggest(client, user, "indem")["filenames"] == [{"filename": "Indemnity Agreement.pdf", "documents": 1}]
+
+    assert client.delete(f"/documents/{removed['id']}", headers=user).status_code == 200
+    assert [term["term"] for term in _suggest(client, user, "indem")["terms"]] == ["indemnity"]
+
+
+def test_rebuild_matches_the_incremental_dictionary(client, user, upload):
+    upload(user, ["rent review clause"], filename="Rent.pdf")
+    upload(user, ["rent deposit"], filename="Rent.pdf")
+    user_id = client.get("/auth/me", headers=user).json()["id"]
+    incremental = _dictionary(user_id)
+    assert ("filename", "rent.pdf", 2) in incremental
+
+    db = SessionLocal()
+    try:
+        suggest.rebuild(db)
+    finally:
+        db.close()
+    assert _dictionary(user_id) == incremental
@@ -0,0 +1,63 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+
+import main
+from app.database import SessionLocal
+from app.models import UploadJob
+from app.services import upload_jobs
+from benchmarks.corpus import make_pdf
+
+
+def _job(user_id, status, age):
+    return UploadJob(user_id=user_id, filename="old.pdf", size_bytes=1, status=status,
+                     updated_at=datetime.utcnow() - timedelta(seconds=age))
+
+
+def test_upload_without_waiting_reports_progress(user):
+    async def run():
+        # One event loop for the request and the processing it leaves running
+        async with httpx.AsyncClient(app=main.app, base_url="http://test") as client:
+            response = await client.post("/upload/", params={"wait": "false"}, headers=user,
+                                         files={"file": ("later.pdf", make_pdf(["processed later"]), "application/pdf")})
+            assert response.status_code == 202
+            job = response.json()
+            assert (job["status"], job["document_id"]) == ("queued", None)
+            for _ in range(200):
+                job = (await client.get(f"/upload/jobs/{job['id']}", headers=user)).json()
+                if job["status"] in upload_jobs.FINAL:
+                    break
+                await asyncio.sleep(0.05)
+            listed = (await client.get("/upload/jobs", headers=user)).json()
+            document = (await client.get(f"/documents/{job['document_id']}", headers=user)).json()
+        return job, listed, document
+
+    job, listed, document = asyncio.run(run())
+    assert job["status"] == "completed", job
+    assert job["pages_done"] == job["pages_total"] == 1
+    assert [item["id"] for item in listed] == [job["id"]]
+    assert "processed later" in document["content"]
+
+
+def test_stale_jobs_fail_and_old_ones_are_pruned(client, user):
+    user_id = client.get("/auth/me", headers=user).json()["id"]
+    db = SessionLocal()
+    try:
+        stuck = _job(user_id, "extracting", upload_jobs.STALE_SECONDS + 60)
+        old = _job(user_id, "completed", upload_jobs.RETENTION_SECONDS + 60)
+        recent = _job(user_id, "completed", 60)
+        db.add_all([stuck, old, recent])
+        db.commit()
+        stuck_id, old_id, recent_id = stuck.id, old.id, recent.id
+        assert upload_jobs.expire_stale(db) >= 1
+        assert upload_jobs.prune(db) >= 1
+        db.expire_all()
+        failed = db.get(UploadJob, stuck_id)
+        assert (failed.status, failed.error) == ("failed", "Upload was interrupted")
+        assert db.get(UploadJob, old_id) is None
+        assert db.get(UploadJob, recent_id) is not None
+    finally:
+        db.close()
+    # Not yet past the retention period: failing it just now refreshed it
+    assert client.get(f"/upload/jobs/{stuck_id}", headers=user).json()["status"] == "failed"
@@ -58,20 +58,20 @@ const AdminPanel = ({ onClose }) => {
     try {
       await adminAPI.deleteUser(userId);
       setUsers(users.filter(user => user.id !== userId));
-      alert('User deleted successfully');
+      alert('User deletion scheduled; their documents are being removed');
     } catch (err) {
       alert('Failed to delete user: ' + (err.response?.data?.detail || err.message));
     }
   };
 
   const handleDeleteOrganization = async (orgId, orgName) => {
-    if (!window.confirm(`Are you sure you want to delete organization '${orgName}'? This will delete all users and invitations in the org.`)) {
+    if (!window.confirm(`Are you sure you want to delete organization '${orgName}'? This will delete all users, documents and invitations in the org.`)) {
       return;
     }
     try {
       await adminAPI.deleteOrganization(orgId);
       setOrganizations(organizations.filter(org => org.id !== orgId));
-      alert('Organization deleted successfully');
+      alert('Organization deletion scheduled; its users and documents are being removed');
     } catch (err) {
       alert('Failed to delete organization: ' + (err.response?.data?.detail || err.message));
     }
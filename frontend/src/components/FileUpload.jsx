@@ -5,6 +5,7 @@ const FileUpload = ({ onUploadSuccess }) => {
   const [isDragOver, setIsDragOver] = useState(false);
   const [isUploading, setIsUploading] = useState(false);
   const [error, setError] = useState('');
+  const [progress, setProgress] = useState(null);
   const fileInputRef = useRef(null);
 
   const handleFileUpload = async (file) => {
@@ -15,9 +16,10 @@ const FileUpload = ({ onUploadSuccess }) => {
 
     setIsUploading(true);
     setError('');
+    setProgress(null);
 
     try {
-      const result = await uploadPDF(file);
+      const result = await uploadPDF(file, setProgress);
       onUploadSuccess(result);
     } catch (err) {
       const detail = err.response?.data?.detail || err.message || 'Upload failed';
@@ -28,9 +30,24 @@ const FileUpload = ({ onUploadSuccess }) => {
       }
     } finally {
       setIsUploading(false);
+      setProgress(null);
     }
   };
 
+  const progressText = () => {
+    if (!progress || progress.status === 'queued') {
+      return 'Waiting for a free extraction worker...';
+    }
+    const pages = progress.pages_total ? ` (page ${progress.pages_done} of ${progress.pages_total})` : '';
+    if (progress.status === 'extracting') {
+      return `Extracting text from your document${pages}...`;
+    }
+    if (progress.status === 'ocr') {
+      return `Running OCR on scanned pages${pages}...`;
+    }
+    return 'Indexing your document...';
+  };
+
   const handleDragOver = (e) => {
     e.preventDefault();
     setIsDragOver(true);
@@ -90,7 +107,7 @@ const FileUpload = ({ onUploadSuccess }) => {
           </h3>
           <p className="text-gray-600 text-sm">
             {isUploading 
-              ? 'Extracting text from your document...'
+              ? progressText()
               : 'Drag and drop your PDF here, or click to browse'
             }
           </p>
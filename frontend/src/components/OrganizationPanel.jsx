@@ -1,6 +1,17 @@
 import React, { useState, useEffect } from 'react';
 import { orgAPI } from '../services/api';
 
+const formatBytes = (bytes) => {
+  const units = ['bytes', 'KB', 'MB', 'GB', 'TB'];
+  let value = bytes;
+  let unit = 0;
+  while (value >= 1024 && unit < units.length - 1) {
+    value /= 1024;
+    unit += 1;
+  }
+  return unit === 0 ? `${value} bytes` : `${value.toFixed(1)} ${units[unit]}`;
+};
+
 const OrganizationPanel = ({ onClose }) => {
   const [org, setOrg] = useState(null);
   const [users, setUsers] = useState([]);
@@ -115,6 +126,35 @@ const OrganizationPanel = ({ onClose }) => {
           </div>
         )}
 
+        {/* Storage usage */}
+        {org?.usage && (
+          <div className="p-6 border-b border-gray-100">
+            <h3 className="text-sm font-medium text-gray-700 mb-3">Storage usage</h3>
+            <div className="grid grid-cols-1 md:grid-cols-3 gap-4">
+              {['documents', 'bytes', 'pages'].map(resource => {
+                const { used, limit } = org.usage[resource];
+                const format = value => (resource === 'bytes' ? formatBytes(value) : value.toLocaleString());
+                return (
+                  <div key={resource}>
+                    <div className="flex justify-between text-sm text-gray-600 mb-1">
+                      <span className="capitalize">{resource === 'bytes' ? 'Storage' : resource}</span>
+                      <span>{format(used)}{limit ? ` of ${format(limit)}` : ''}</span>
+                    </div>
+                    {limit && (
+                      <div className="h-2 bg-gray-100 rounded-full overflow-hidden">
+                        <div
+                          className={`h-full rounded-full ${used >= limit * 0.9 ? 'bg-red-500' : 'bg-purple-500'}`}
+                          style={{ width: `${Math.min(100, (used / limit) * 100)}%` }}
+                        ></div>
+                      </div>
+                    )}
+                  </div>
+                );
+              })}
+            </div>
+          </div>
+        )}
+
         {/* Invite Form */}
         <div className="p-6 border-b border-gray-100">
           <form onSubmit={handleInvite} className="flex flex-col md:flex-row md:items-end gap-4">
@@ -1,8 +1,37 @@
-import { useState } from 'react';
+import { useEffect, useState } from 'react';
+import { suggestSearch } from '../services/api';
 
 const SearchBar = ({ onSearch }) => {
   const [query, setQuery] = useState('');
   const [isFocused, setIsFocused] = useState(false);
+  const [suggestions, setSuggestions] = useState([]);
+
+  // Suggest completions once typing pauses
+  useEffect(() => {
+    if (!query.trim()) {
+      setSuggestions([]);
+      return;
+    }
+    let cancelled = false;
+    const timer = setTimeout(async () => {
+      try {
+        const data = await suggestSearch(query);
+        if (!cancelled) {
+          const completions = [
+            ...data.terms.map((term) => term.query),
+            ...data.filenames.map((file) => file.filename),
+          ];
+          setSuggestions([...new Set(completions)].filter((text) => text !== query));
+        }
+      } catch (error) {
+        if (!cancelled) setSuggestions([]);
+      }
+    }, 150);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [query]);
 
   const handleSubmit = (e) => {
     e.preventDefault();
@@ -57,9 +86,17 @@ const SearchBar = ({ onSearch }) => {
               onFocus={() => setIsFocused(true)}
               onBlur={() => setIsFocused(false)}
               placeholder="Search through your documents..."
+              list="search-suggestions"
+              autoComplete="off"
               className="flex-1 bg-transparent text-gray-900 placeholder-gray-500 focus:outline-none text-base"
             />
             
+            <datalist id="search-suggestions">
+              {suggestions.map((text) => (
+                <option key={text} value={text} />
+              ))}
+            </datalist>
+            
             {/* Search button */}
             <button
               type="submit"
@@ -104,16 +104,60 @@ export const authAPI = {
 };
 
 // Document API functions
-export const uploadPDF = async (file) => {
+// Resolves with the finished upload job; onProgress gets every update along the way
+export const uploadPDF = async (file, onProgress) => {
   const formData = new FormData();
   formData.append('file', file);
   
   const response = await api.post('/upload/', formData, {
+    params: { wait: false },
     headers: {
       'Content-Type': 'multipart/form-data',
     },
   });
-  return response.data;
+  return watchUpload(response.data, onProgress);
+};
+
+// Follows one upload job on the /upload/events stream until it completes or fails.
+// EventSource cannot send the Authorization header, so the stream is read with fetch.
+export const watchUpload = async (job, onProgress) => {
+  onProgress?.(job);
+  const controller = new AbortController();
+  const response = await fetch(`${API_BASE_URL}/upload/events`, {
+    headers: { Authorization: `Bearer ${localStorage.getItem('authToken')}` },
+    signal: controller.signal,
+  });
+  if (!response.ok) {
+    throw new Error(`Could not follow upload progress (${response.status})`);
+  }
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = '';
+  try {
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) {
+        throw new Error('Upload progress stream closed');
+      }
+      buffer += value;
+      const events = buffer.split('\n\n');
+      buffer = events.pop();
+      for (const event of events) {
+        const data = event.split('\n').find((line) => line.startsWith('data: '));
+        if (!data) continue;
+        const update = JSON.parse(data.slice(6));
+        if (update.id !== job.id) continue;
+        onProgress?.(update);
+        if (update.status === 'failed') {
+          throw new Error(update.error || 'Upload failed');
+        }
+        if (update.status === 'completed') {
+          return update;
+        }
+      }
+    }
+  } finally {
+    controller.abort();
+  }
 };
 
 export const getDocuments = async () => {
@@ -157,6 +201,13 @@ export const searchDocuments = async (query) => {
 };
 
 // Admin API functions
+export const suggestSearch = async (query) => {
+  const response = await api.get('/search/suggest', {
+    params: { q: query }
+  });
+  return response.data;
+};
+
 export const adminAPI = {
   // Get all users (admin only)
   getAllUsers: async () => {
@@ -56,6 +56,7 @@ echo ""
 echo "🔧 Starting FastAPI backend on http://localhost:8000"
 cd ../backend
 source venv/bin/activate
+python prestart.py
 python -m uvicorn main:app --reload --host 0.0.0.0 --port 8000 &
 BACKEND_PID=$!
 